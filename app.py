@@ -1,7 +1,27 @@
 import streamlit as st
 import pandas as pd
-import io
-import re
+import datetime
+import functools
+import uuid
+
+from coupang_report.compact import compact_report
+from coupang_report.engine import ReportInputs, compute_report, report_from_aggregates
+from coupang_report.export import multishop_to_bytes, report_to_bytes
+from coupang_report.history_store import DEFAULT_HISTORY_PATH, HistoryStore
+from coupang_report.ingest import ingest_files, ingest_inputs
+from coupang_report.instrumentation import DEFAULT_RUN_LOG, RunTracker, count_rows, read_run_log, track, tracked_call
+from coupang_report.jobs import JobQueue, snapshot_file
+from coupang_report.metrics import report_kpis
+from coupang_report.multishop import consolidate, run_shops, unique_shop_names
+from coupang_report.parse_cache import ParseCache, file_digest
+from coupang_report.reference_cache import ReferenceCache
+from coupang_report.report_index import ReportIndex
+from coupang_report.snapshots import (
+    DEFAULT_SNAPSHOT_DIR, DELTA_STATUS_GONE, DELTA_STATUS_NEW, SnapshotStore, delta_report, snapshot_frames,
+)
+from coupang_report.table_render import (
+    PAGE_SIZE, bar_ranges, page_count, page_slice, styled_page,
+)
 
 # ==========================================
 # 1. 页面配置 (宽屏)
@@ -9,33 +29,6 @@ import re
 st.set_page_config(layout="wide", page_title="Coupang 经营看板 Pro (最终版)")
 st.title("📊 Coupang 经营分析看板 (全功能·稳定版)")
 
-# --- 列号配置 ---
-# Master表 (基础表)
-IDX_M_CODE   = 0    # A列: 内部编码
-IDX_M_SKU    = 3    # D列: SKU ID (用于匹配火箭仓)
-IDX_M_COST   = 6    # G列: 采购价格 (RMB)
-IDX_M_PROFIT = 10   # K列: 单品毛利
-IDX_M_BAR    = 12   # M列: ID号码 (用于匹配极风库存)
-
-# Sales表 (销售表)
-IDX_S_ID     = 0    # A列
-IDX_S_QTY    = 8    # I列
-
-# Ads表 (广告表)
-IDX_A_CAMPAIGN = 5  # F列
-IDX_A_GROUP    = 6  # G列
-IDX_A_SPEND    = 15 # P列
-IDX_A_SALES    = 29 # AD列 (30列)
-
-# Inventory Rocket (火箭仓)
-IDX_I_R_ID   = 2    # C列: ID
-IDX_I_R_QTY  = 7    # H列: 库存数量
-
-# Inventory Jifeng (极风)
-IDX_I_J_BAR  = 2    # C列: 产品条码
-IDX_I_J_QTY  = 10   # K列: 数值
-# -----------------
-
 # ==========================================
 # 2. 侧边栏 (含筛选 & 上传)
 # ==========================================
@@ -49,410 +42,576 @@ with st.sidebar:
     st.info("请按顺序上传以下文件：")
     
     file_master = st.file_uploader("1. 基础信息表 (Master)", type=['csv', 'xlsx', 'xlsm'])
+    # 未上传时可直接使用其他会话最近上传的基础表 (见下方共享缓存)
+    shared_master_slot = st.empty()
     files_sales = st.file_uploader("2. 销售表 (Sales - 近1周数据)", type=['csv', 'xlsx', 'xlsm'], accept_multiple_files=True)
     files_ads = st.file_uploader("3. 广告表 (Ads)", type=['csv', 'xlsx', 'xlsm'], accept_multiple_files=True)
     files_inv = st.file_uploader("4. 库存信息表 (火箭仓 Rocket)", type=['csv', 'xlsx', 'xlsm'], accept_multiple_files=True)
     files_inv_j = st.file_uploader("5. 极风库存表 (极风 Jifeng)", type=['csv', 'xlsx', 'xlsm'], accept_multiple_files=True)
 
+    # 报表常驻会话: 多人同时使用时可压缩内存 (显示/导出结果不变)
+    low_memory = st.checkbox("💾 低内存模式 (压缩会话中的报表)")
+
+    st.divider()
+
+    # 多店铺: 上方文件为店铺 1, 其他店铺各上传一组文件; 各店铺并行计算后合并
+    st.header("🏪 多店铺")
+    multi_shop = st.checkbox("多店铺合并报表 (各店铺并行计算)")
+    shop_uploads = []
+    if multi_shop:
+        shop_names = [st.text_input("店铺 1 名称 (上方上传的文件)", value="店铺1", key='shop_name_1')]
+        n_shops = st.number_input("店铺数量", min_value=2, max_value=10, value=2, step=1)
+        for i in range(2, n_shops + 1):
+            with st.expander(f"店铺 {i}", expanded=True):
+                shop_names.append(st.text_input("店铺名称", value=f"店铺{i}", key=f'shop_name_{i}'))
+                shop_uploads.append(dict(
+                    master=st.file_uploader("基础信息表 (Master)", type=['csv', 'xlsx', 'xlsm'], key=f'shop_{i}_master'),
+                    sales=st.file_uploader("销售表", type=['csv', 'xlsx', 'xlsm'], accept_multiple_files=True, key=f'shop_{i}_sales'),
+                    ads=st.file_uploader("广告表", type=['csv', 'xlsx', 'xlsm'], accept_multiple_files=True, key=f'shop_{i}_ads'),
+                    rocket=st.file_uploader("火箭仓库存表", type=['csv', 'xlsx', 'xlsm'], accept_multiple_files=True, key=f'shop_{i}_rocket'),
+                    jifeng=st.file_uploader("极风库存表", type=['csv', 'xlsx', 'xlsm'], accept_multiple_files=True, key=f'shop_{i}_jifeng'),
+                ))
+
+    st.divider()
+
+    st.header("🗄️ 历史数据")
+    today = datetime.date.today()
+    history_save = st.checkbox("生成报表时写入历史库 (同内容文件只入库一次)")
+    history_period = st.date_input("本次上传数据所属周 (周一)", value=today - datetime.timedelta(days=today.weekday()))
+    # 快照按上面的周保存, 对比上周时直接读快照
+    snapshot_save = st.checkbox("保存报表快照 (按所属周, 用于周环比)")
+    history_mode = st.checkbox("按日期区间从历史库生成 (只需上传基础表)")
+    history_start = history_end = None
+    if history_mode:
+        history_range = st.date_input("历史区间 (按周起始日)", value=(today - datetime.timedelta(weeks=4), today))
+        # 区间选择到一半时只有一个日期
+        history_start, history_end = history_range if len(history_range) == 2 else (history_range[0], history_range[0])
+
+    st.divider()
+
+    # 分阶段耗时/内存 (生成报表时实时刷新), 每次运行追加到本地日志
+    with st.expander("⏱️ 运行监控"):
+        trace_memory = st.checkbox("统计各阶段内存峰值 (tracemalloc, 计算会变慢)")
+        perf_live = st.empty()
+        perf_recent = st.empty()
+
+STAGE_LABELS = {
+    'stage': '阶段', 'status': '状态', 'seconds': '耗时(秒)', 'rows_in': '输入行数', 'rows_out': '输出行数',
+    'rss_mb': '内存(MB)', 'rss_delta_mb': '内存变化(MB)', 'peak_mb': '内存峰值(MB)', 'error': '错误',
+}
+# 每个文件的解析记录 (格式/编码为按内容探测的结果, 命中缓存时为空)
+FILE_TIMING_LABELS = {
+    'kind': '类型', 'name': '文件', 'format': '格式', 'encoding': '编码',
+    'seconds': '耗时(秒)', 'rows': '行数', 'cached': '缓存命中',
+}
+STATUS_ICONS = {'running': '⏳', 'ok': '✅', 'error': '❌', 'cancelled': '⏹️'}
+
+def show_kpis(kpis):
+    k1, k2, k3, k4, k5 = st.columns(5)
+    k1.metric("💰 最终净利润", f"{kpis['最终净利润']:,.0f}")
+    k2.metric("📦 总销售数量", f"{kpis['总销售数量']:,.0f}")
+    k3.metric("🏭 库存总货值", f"¥ {kpis['库存总货值']:,.0f}")
+    k4.metric("🔴 滞销资金占用", f"¥ {kpis['滞销资金占用']:,.0f}", delta="需重点清理", delta_color="inverse")
+    k5.metric("🚨 建议补货量", f"{kpis['建议补货量']:,.0f}")
+
+def show_stages(placeholder, tracker):
+    df = pd.DataFrame(tracker.to_dict()['stages'], columns=list(STAGE_LABELS) + ['peak_rss_mb'])
+    df['status'] = df['status'].map(STATUS_ICONS)
+    if not tracker.trace_memory:
+        df = df.drop(columns=['peak_mb'])
+    placeholder.dataframe(
+        df.drop(columns=['peak_rss_mb']).rename(columns=STAGE_LABELS),
+        use_container_width=True, hide_index=True,
+    )
+
 # ==========================================
-# 3. 清洗工具函数
+# 3. 解析缓存
 # ==========================================
-def clean_for_match(series):
-    return series.astype(str).str.replace(r'\.0$', '', regex=True).str.replace('"', '').str.strip().str.upper()
-
-def clean_num(series):
-    return pd.to_numeric(series.astype(str).str.replace(',', ''), errors='coerce').fillna(0)
-
-def extract_code_from_text(text):
-    if pd.isna(text): return None
-    match = re.search(r'([Cc]\d+)', str(text))
-    if match: return match.group(1).upper()
-    return None
-
-def read_file_strict(file):
-    try:
-        file.seek(0)
-        if file.name.endswith('.csv'):
-            return pd.read_csv(file, dtype=str)
+@st.cache_resource
+def get_parse_cache():
+    # 进程级共享: 同样的文件再次上传/重跑时直接复用已清洗的数据帧
+    return ParseCache()
+
+parse_cache = get_parse_cache()
+
+@st.cache_resource
+def get_history_store():
+    return HistoryStore(DEFAULT_HISTORY_PATH)
+
+history_store = get_history_store()
+
+@st.cache_resource
+def get_snapshot_store():
+    return SnapshotStore(DEFAULT_SNAPSHOT_DIR)
+
+snapshot_store = get_snapshot_store()
+
+@st.cache_resource
+def get_reference_cache():
+    # 进程级共享: 基础表按内容哈希常驻, 各会话不必每次上传/解析
+    return ReferenceCache()
+
+reference_cache = get_reference_cache()
+
+shared_master = None
+if file_master is None:
+    latest_master = reference_cache.latest('master')
+    if latest_master is not None and shared_master_slot.checkbox(
+        f"📌 使用共享基础表: {latest_master.name} ({latest_master.loaded_at:%m-%d %H:%M} 载入)", value=True,
+    ):
+        shared_master = latest_master
+
+# ==========================================
+# 4. 后台报表任务
+# ==========================================
+@st.cache_resource
+def get_job_queue():
+    # 进程级共享: 多个会话提交的任务在同一个线程池中执行, 相同请求合并
+    return JobQueue()
+
+job_queue = get_job_queue()
+session_token = st.session_state.setdefault('session_token', uuid.uuid4().hex)
+
+def expected_stages(history_mode, history_save, snapshot_save, low_memory, **_):
+    if history_mode:
+        stages = ['历史库入库'] if history_save else []
+        stages += ['Step 1 基础表', 'Step 2~4 历史聚合']
+    else:
+        stages = ['Step 1 读取/清洗', 'Step 2 销售表', 'Step 3 广告表', 'Step 4 库存表']
+    stages += ['Step 5 关联计算', 'Step 6 业务报表', 'Step 7 库存分析']
+    if history_save and not history_mode:
+        stages.append('历史库入库')
+    if snapshot_save:
+        stages.append('快照保存')
+    if low_memory:
+        stages.append('低内存压缩')
+    return stages + ['Step 8 筛选索引']
+
+def build_report_job(job, inputs, history_mode, history_save, history_period, history_start, history_end, snapshot_save, low_memory):
+    """在后台线程中执行 (不能调用 st.*): Step 1~8, 返回要写入会话的结果。"""
+    tracker = job.tracker
+    history_results = []
+    if history_mode:
+        # 本次上传的新文件先入库 (库中已有的不再解析), 再按区间取预聚合结果
+        if history_save:
+            history_jobs = [('sales', f) for f in inputs.sales] + [('ads', f) for f in inputs.ads] \
+                + [('rocket', f) for f in inputs.rocket] + [('jifeng', f) for f in inputs.jifeng]
+            with track(tracker, '历史库入库', rows_in=len(history_jobs)):
+                history_results = history_store.ingest(history_jobs, history_period, cache=parse_cache)
+        with track(tracker, 'Step 1 基础表', rows_in=1) as s:
+            master_frames, ingest_timings = ingest_files(
+                [('master', inputs.master if inputs.master is not None else inputs.master_digest)],
+                cache=parse_cache, reference=reference_cache,
+            )
+            s.rows_out = len(master_frames[0])
+        with track(tracker, 'Step 2~4 历史聚合') as s:
+            history_aggs = history_store.report_aggregates(history_start, history_end)
+            s.rows_out = count_rows(history_aggs)
+        df_final, df_sheet2, df_sheet3 = report_from_aggregates(master_frames[0], *history_aggs, tracker=tracker)
+    else:
+        # 全部上传文件并行解析 (进程池), 再进入计算
+        loaded, ingest_timings = ingest_inputs(inputs, cache=parse_cache, tracker=tracker, reference=reference_cache)
+        df_final, df_sheet2, df_sheet3 = compute_report(loaded, tracker=tracker)
+        if history_save:
+            with track(tracker, '历史库入库', rows_in=len(ingest_timings) - 1):
+                history_results = history_store.add_loaded(loaded, ingest_timings, history_period)
+
+    if snapshot_save:
+        with track(tracker, '快照保存', rows_in=len(df_sheet2) + len(df_sheet3)):
+            snapshot_store.save(history_period, df_final, df_sheet2, df_sheet3, name=tracker.name)
+
+    memory_report = None
+    if low_memory:
+        with track(tracker, '低内存压缩', rows_in=len(df_final)) as s:
+            (df_final, df_sheet2, df_sheet3), memory_report = compact_report(df_final, df_sheet2, df_sheet3)
+            s.rows_out = len(df_final)
+        tracker.extra['memory'] = {'before_bytes': memory_report.before_bytes, 'after_bytes': memory_report.after_bytes}
+
+    with track(tracker, 'Step 8 筛选索引', rows_in=len(df_final)) as s:
+        # 看板样式 (斑马纹/高亮) 在这里对整表算一次, 之后筛选、翻页只取子集
+        report_index = ReportIndex(df_final, df_sheet2, df_sheet3, with_styles=True)
+        s.rows_out = len(report_index.codes)
+
+    tracker.extra['files'] = [{k: t[k] for k in FILE_TIMING_LABELS} for t in ingest_timings]
+    return {
+        'report_index': report_index, 'ingest_timings': ingest_timings,
+        'history_results': history_results, 'memory_report': memory_report,
+        'snapshot_period': history_period if snapshot_save else None,
+    }
+
+def build_multishop_job(job, shops, trace_memory):
+    """后台线程: 各店铺 Step 1~7 并行 (进程池), 每个店铺建筛选索引。"""
+    tracker = job.tracker
+    reports = run_shops(shops, tracker=tracker, trace_memory=trace_memory)
+    with track(tracker, 'Step 8 筛选索引', rows_in=sum(len(r.frames[0]) for r in reports)) as s:
+        shop_indexes = [(r.name, ReportIndex(*r.frames)) for r in reports]
+        s.rows_out = sum(len(index.codes) for _, index in shop_indexes)
+    tracker.extra['files'] = [
+        dict({k: t[k] for k in FILE_TIMING_LABELS}, shop=r.name) for r in reports for t in r.timings
+    ]
+    return {
+        'shop_indexes': shop_indexes,
+        'shop_seconds': {r.name: r.seconds for r in reports},
+        'seconds': tracker.records[0].seconds,
+    }
+
+def collect_report_job():
+    """后台任务结束时取回结果 (或错误) 写入会话; 返回任务是否仍在运行。"""
+    pending = st.session_state.get('report_job')
+    if not pending:
+        return False
+    job = job_queue.get(pending[0])
+    if job is not None and not job.finished:
+        return True
+
+    notes = []
+    if job is None:
+        notes.append(('warning', "⚠️ 任务已失效, 请重新生成"))
+    elif job.status == 'done':
+        result = job.result
+        if 'shop_indexes' in result:
+            # 多店铺: 各店铺的索引存入会话, 筛选/合并在展示时做
+            st.session_state['multishop_result'] = result
+            st.session_state['multishop_sig'] = pending[1]
         else:
-            return pd.read_excel(file, dtype=str, engine='openpyxl')
-    except:
-        file.seek(0)
-        return pd.read_csv(file, dtype=str, encoding='gbk')
+            # 未筛选报表连同编码索引存入会话, 之后修改筛选只做切片, 不再重算
+            st.session_state['report_index'] = result['report_index']
+            st.session_state['report_sig'] = pending[1]
+            st.session_state['ingest_timings'] = result['ingest_timings']
+            memory_report = result['memory_report']
+            if memory_report is not None:
+                notes.append(('caption',
+                    f"💾 低内存模式: 报表占用 {memory_report.after_bytes / 1024 ** 2:.1f} MB "
+                    f"(原 {memory_report.before_bytes / 1024 ** 2:.1f} MB, 节省 {memory_report.saved_ratio:.0%})"))
+            if result['snapshot_period'] is not None:
+                notes.append(('caption', f"📸 已保存 {result['snapshot_period']:%Y-%m-%d} 周的报表快照 (用于周环比)"))
+            if result['history_results']:
+                n_added = sum(r['added'] for r in result['history_results'])
+                notes.append(('caption', f"🗄️ 历史库: 新增 {n_added} 个文件, 跳过 {len(result['history_results']) - n_added} 个已入库文件"))
+    elif job.status == 'error':
+        # 指明出错的阶段, 详细信息见侧边栏「运行监控」
+        stage = job.tracker.failed_stage
+        notes.append(('error', f"❌ 运行出错{f' ({stage})' if stage else ''}: {job.error}"))
+    else:
+        notes.append(('warning', "⏹️ 已取消生成"))
+    if job is not None:
+        job_queue.release(job.id, session_token)
+    del st.session_state['report_job']
+    st.session_state['report_notes'] = st.session_state.get('report_notes', []) + notes
+    return False
+
+@st.fragment(run_every=1.0)
+def job_progress(job_id):
+    # 只刷新进度区域 (不重跑整页), 任务结束后整页重跑取回结果
+    job = job_queue.get(job_id)
+    if job is None or job.finished:
+        st.rerun()
+    done, total = job.progress()
+    label = '排队中' if job.status == 'queued' else (job.current_stage() or '计算中')
+    st.progress(done / total, text=f"⏳ 正在进行多维数据计算: {label} ({done}/{total})")
+    show_stages(st, job.tracker)
+    if st.button("⏹️ 取消生成", key='cancel_report_job'):
+        # 合并的任务在所有会话都取消后才真正停止
+        job_queue.cancel(job.id, session_token)
+        del st.session_state['report_job']
+        st.session_state['report_notes'] = [('warning', "⏹️ 已取消生成")]
+        st.rerun()
+
+def report_job_panel():
+    running = collect_report_job()
+    for kind, message in st.session_state.pop('report_notes', []):
+        getattr(st, kind)(message)
+    if running:
+        job_progress(st.session_state['report_job'][0])
 
 # ==========================================
-# 4. 主逻辑
+# 5. 主逻辑
 # ==========================================
-if file_master and files_sales and files_ads:
+if multi_shop:
+    shop_bundles = [dict(master=file_master, sales=files_sales, ads=files_ads, rocket=files_inv, jifeng=files_inv_j), *shop_uploads]
+    shops_ready = all(b['master'] and b['sales'] and b['ads'] for b in shop_bundles)
+
+if multi_shop and shops_ready:
+    st.divider()
+    names = unique_shop_names(shop_names)
+    upload_sig = ('multishop',) + tuple(
+        (name, tuple(getattr(f, 'file_id', None) or (f.name, f.size)
+                     for f in [b['master'], *b['sales'], *b['ads'], *(b['rocket'] or []), *(b['jifeng'] or [])]))
+        for name, b in zip(names, shop_bundles)
+    )
+
+    if st.button(f"🚀 生成多店铺合并报表 ({len(names)} 个店铺)", type="primary", use_container_width=True):
+        shops = [(name, ReportInputs(
+            master=snapshot_file(b['master']),
+            sales=[snapshot_file(f) for f in b['sales']],
+            ads=[snapshot_file(f) for f in b['ads']],
+            rocket=[snapshot_file(f) for f in b['rocket'] or []],
+            jifeng=[snapshot_file(f) for f in b['jifeng'] or []],
+        )) for name, b in zip(names, shop_bundles)]
+        job_key = ('multishop', tuple(
+            (name, tuple(file_digest(f) for f in [inputs.master, *inputs.sales, *inputs.ads, *inputs.rocket, *inputs.jifeng]))
+            for name, inputs in shops
+        ), trace_memory)
+        tracker = RunTracker(name=f"多店铺 ({', '.join(names)})", trace_memory=trace_memory, log_path=DEFAULT_RUN_LOG)
+        job = job_queue.submit(
+            job_key, functools.partial(build_multishop_job, shops=shops, trace_memory=trace_memory),
+            subscriber=session_token, tracker=tracker, expected_stages=['Step 1~7 多店铺并行', 'Step 8 筛选索引'],
+        )
+        if job.tracker is not tracker:
+            st.session_state['report_notes'] = [('info', "🔗 相同的报表正在生成, 已合并到同一任务")]
+        st.session_state['report_job'] = (job.id, upload_sig)
+        st.session_state['run_tracker'] = job.tracker
+
+    report_job_panel()
+
+    multishop_result = st.session_state.get('multishop_result') if st.session_state.get('multishop_sig') == upload_sig else None
+    if multishop_result is not None:
+        # 各店铺分别筛选 (切片) 后再合并, 汇总表首列为店铺
+        shop_frames = [(name, index.filter(filter_code)) for name, index in multishop_result['shop_indexes']]
+        consolidated = consolidate(shop_frames)
+        df_kpi, df_sheet2_all, df_sheet3_all = consolidated
+
+        if df_sheet2_all.empty:
+            st.warning(f"⚠️ 未找到包含 '{filter_code}' 的产品。")
+        else:
+            st.subheader(f"📈 多店铺经营概览 ({len(shop_frames)} 个店铺) {'(筛选结果)' if filter_code else ''}")
+            show_kpis(df_kpi.iloc[-1])
+            st.caption(
+                "⏱️ 各店铺计算耗时: " + " · ".join(f"{name} {sec:.2f}s" for name, sec in multishop_result['shop_seconds'].items())
+                + f" (并行总耗时 {multishop_result['seconds']:.2f}s)"
+            )
+
+            st.divider()
+
+            tab_shops, tab_sheet2, tab_sheet3 = st.tabs(["🏪 店铺对比", "📊 汇总业务报表", "🏭 汇总库存分析"])
+            with tab_shops:
+                st.dataframe(df_kpi, use_container_width=True, hide_index=True)
+            with tab_sheet2:
+                st.dataframe(df_sheet2_all, use_container_width=True, height=600, hide_index=True)
+            with tab_sheet3:
+                st.dataframe(df_sheet3_all, use_container_width=True, height=600, hide_index=True)
+
+            build_multishop_bytes = functools.partial(
+                tracked_call, functools.partial(multishop_to_bytes, shop_frames, consolidated), 'Excel 导出',
+                parent=st.session_state.get('run_tracker'), log_path=DEFAULT_RUN_LOG,
+                rows_in=sum(len(df) for _, frames in shop_frames for df in frames) + len(df_sheet2_all) + len(df_sheet3_all),
+            )
+
+            st.divider()
+            st.success(f"✅ 多店铺报表生成完毕！{' (已应用筛选: ' + filter_code + ')' if filter_code else ''}")
+
+            st.download_button(
+                label="📥 下载 Excel (汇总概览/汇总业务报表/汇总库存分析 + 各店铺3个Sheet)",
+                data=build_multishop_bytes,
+                file_name=f"Coupang_Report_MultiShop_{filter_code if filter_code else 'All'}.xlsx",
+                mime="application/vnd.ms-excel",
+                type="primary",
+                use_container_width=True,
+                on_click="ignore"
+            )
+elif multi_shop:
+    st.info("👈 多店铺模式下每个店铺都需要上传基础表、销售表和广告表")
+elif (file_master or shared_master) and (history_mode or (files_sales and files_ads)):
     st.divider()
     
-    btn_label = "🚀 生成规范报表"
-    if filter_code:
-        btn_label += f" (筛选: {filter_code})"
-    
-    if st.button(btn_label, type="primary", use_container_width=True):
+    # 上传文件签名: 文件变化后会话中的旧报表失效 (共享基础表按内容哈希)
+    all_uploads = [*(files_sales or []), *(files_ads or []), *(files_inv or []), *(files_inv_j or [])]
+    upload_sig = (('shared', shared_master.digest) if shared_master else getattr(file_master, 'file_id', None) or (file_master.name, file_master.size),)
+    upload_sig += tuple(getattr(f, 'file_id', None) or (f.name, f.size) for f in all_uploads)
+    if history_mode:
+        upload_sig += (('history', history_start, history_end),)
+
+    if st.button("🚀 生成规范报表", type="primary", use_container_width=True):
+        # 上传文件拷贝一份交给后台任务; 相同文件内容 + 相同选项的任务运行中时直接合并
+        # (筛选在结果上做切片, 不影响任务, 筛选条件不同的请求也会合并)
+        inputs = ReportInputs(
+            master=snapshot_file(file_master) if file_master else None,
+            # 共享基础表按提交时选中的版本 (内容哈希) 取, 不随其他会话的使用而变化
+            master_digest=shared_master.digest if shared_master else None,
+            sales=[snapshot_file(f) for f in files_sales or []],
+            ads=[snapshot_file(f) for f in files_ads or []],
+            rocket=[snapshot_file(f) for f in files_inv or []],
+            jifeng=[snapshot_file(f) for f in files_inv_j or []],
+        )
+        options = dict(
+            history_mode=history_mode, history_save=history_save, history_period=history_period,
+            history_start=history_start, history_end=history_end, snapshot_save=snapshot_save, low_memory=low_memory,
+        )
+        job_key = (
+            ('master', shared_master.digest if shared_master else file_digest(inputs.master)),
+            tuple((kind, file_digest(f)) for kind, files in (
+                ('sales', inputs.sales), ('ads', inputs.ads), ('rocket', inputs.rocket), ('jifeng', inputs.jifeng),
+            ) for f in files),
+            tuple(sorted(options.items())), trace_memory,
+        )
+        master_name = shared_master.name if shared_master else file_master.name
+        tracker = RunTracker(name=master_name, trace_memory=trace_memory, log_path=DEFAULT_RUN_LOG)
+        job = job_queue.submit(
+            job_key, functools.partial(build_report_job, inputs=inputs, **options),
+            subscriber=session_token, tracker=tracker, expected_stages=expected_stages(**options),
+        )
+        if job.tracker is not tracker:
+            st.session_state['report_notes'] = [('info', "🔗 相同的报表正在生成, 已合并到同一任务")]
+        st.session_state['report_job'] = (job.id, upload_sig)
+        st.session_state['run_tracker'] = job.tracker
+
+    report_job_panel()
+
+    report_index = st.session_state.get('report_index') if st.session_state.get('report_sig') == upload_sig else None
+    if report_index is not None:
         try:
-            with st.spinner("正在进行多维数据计算..."):
-                
-                # --- Step 1: 基础表 ---
-                df_master = read_file_strict(file_master)
-                col_code_name = df_master.columns[IDX_M_CODE]
-
-                df_master['_MATCH_SKU'] = clean_for_match(df_master.iloc[:, IDX_M_SKU])
-                df_master['_MATCH_BAR'] = clean_for_match(df_master.iloc[:, IDX_M_BAR])
-                df_master['_MATCH_CODE'] = clean_for_match(df_master.iloc[:, IDX_M_CODE])
-                df_master['_VAL_PROFIT'] = clean_num(df_master.iloc[:, IDX_M_PROFIT])
-                df_master['_VAL_COST'] = clean_num(df_master.iloc[:, IDX_M_COST])
-
-                # --- Step 2: 销售表 ---
-                sales_list = [read_file_strict(f) for f in files_sales]
-                df_sales_all = pd.concat(sales_list, ignore_index=True)
-                
-                df_sales_all['_MATCH_SKU'] = clean_for_match(df_sales_all.iloc[:, IDX_S_ID])
-                df_sales_all['销量'] = clean_num(df_sales_all.iloc[:, IDX_S_QTY])
-                
-                sales_agg = df_sales_all.groupby('_MATCH_SKU')['销量'].sum().reset_index()
-                sales_agg.rename(columns={'销量': 'SKU销量'}, inplace=True) 
-
-                # --- Step 3: 广告表 ---
-                ads_list = [read_file_strict(f) for f in files_ads]
-                df_ads_all = pd.concat(ads_list, ignore_index=True)
-
-                df_ads_all['含税广告费'] = clean_num(df_ads_all.iloc[:, IDX_A_SPEND]) * 1.1
-                df_ads_all['广告销量'] = clean_num(df_ads_all.iloc[:, IDX_A_SALES])
+            # --- Step 8: 筛选 ---
+            (df_final, df_sheet2, df_sheet3), style_plans = report_index.select(filter_code)
+            plan_final, plan_sheet2, plan_sheet3 = style_plans
+
+            # ==========================================
+            # 🔥 看板展示
+            # ==========================================
+            
+            if df_sheet2.empty:
+                st.warning(f"⚠️ 未找到包含 '{filter_code}' 的产品。")
+            else:
+                st.subheader(f"📈 经营概览 {'(筛选结果)' if filter_code else ''}")
+                show_kpis(report_kpis(df_sheet2, df_sheet3))
+
+                st.divider()
+
+                tab1, tab2, tab3, tab4 = st.tabs(["📝 1. 利润分析", "📊 2. 业务报表", "🏭 3. 库存分析", "📅 4. 周环比"])
                 
-                df_ads_all['Code_Group'] = df_ads_all.iloc[:, IDX_A_GROUP].apply(extract_code_from_text)
-                df_ads_all['Code_Campaign'] = df_ads_all.iloc[:, IDX_A_CAMPAIGN].apply(extract_code_from_text)
-                df_ads_all['_MATCH_CODE'] = df_ads_all['Code_Group'].fillna(df_ads_all['Code_Campaign'])
-
-                valid_ads = df_ads_all.dropna(subset=['_MATCH_CODE'])
-                ads_agg = valid_ads.groupby('_MATCH_CODE')[['含税广告费', '广告销量']].sum().reset_index()
-                ads_agg.rename(columns={'含税广告费': 'R列_产品总广告费', '广告销量': '产品广告销量'}, inplace=True)
-
-                # --- Step 4.1: 火箭仓库存 ---
-                if files_inv:
-                    inv_list = [read_file_strict(f) for f in files_inv]
-                    df_inv_all = pd.concat(inv_list, ignore_index=True)
-                    df_inv_all['_MATCH_SKU'] = clean_for_match(df_inv_all.iloc[:, IDX_I_R_ID])
-                    df_inv_all['火箭仓库存'] = clean_num(df_inv_all.iloc[:, IDX_I_R_QTY])
-                    inv_agg = df_inv_all.groupby('_MATCH_SKU')['火箭仓库存'].sum().reset_index()
-                else:
-                    inv_agg = pd.DataFrame(columns=['_MATCH_SKU', '火箭仓库存'])
-
-                # --- Step 4.2: 极风库存 ---
-                if files_inv_j:
-                    inv_j_list = [read_file_strict(f) for f in files_inv_j]
-                    df_inv_j_all = pd.concat(inv_j_list, ignore_index=True)
-                    df_inv_j_all['_MATCH_BAR'] = clean_for_match(df_inv_j_all.iloc[:, IDX_I_J_BAR])
-                    df_inv_j_all['极风库存'] = clean_num(df_inv_j_all.iloc[:, IDX_I_J_QTY])
-                    inv_j_agg = df_inv_j_all.groupby('_MATCH_BAR')['极风库存'].sum().reset_index()
-                else:
-                    inv_j_agg = pd.DataFrame(columns=['_MATCH_BAR', '极风库存'])
-
-                # --- Step 5: 关联 & 计算 ---
-                # 5.1 基础 + 销售
-                df_final = pd.merge(df_master, sales_agg, on='_MATCH_SKU', how='left', sort=False)
-                df_final['SKU销量'] = df_final['SKU销量'].fillna(0).astype(int)
+                def render_table(df, plan, key, bars=None):
+                    # 斑马纹/高亮已随索引算好; 超过一页时分页, 只为当前页算渐变色并生成 Styler
+                    n_pages = page_count(len(df))
+                    page = 1
+                    if n_pages > 1:
+                        # 行数变化 (如修改筛选) 时换新 key, 页码回到第 1 页
+                        page = st.number_input(f"页码 (共 {n_pages} 页, 每页 {PAGE_SIZE} 行)", min_value=1, max_value=n_pages, value=1, step=1, key=f"{key}:{len(df)}")
+                    start, stop = page_slice(len(df), page)
+                    column_config = {
+                        col: st.column_config.ProgressColumn(col, format='localized', min_value=0.0, max_value=col_max, color=color)
+                        for col, (color, col_max) in (bars or {}).items()
+                    }
+                    try:
+                        data = styled_page(df, plan, start, stop, plain_cols=tuple(column_config))
+                    except:
+                        data = df.iloc[start:stop]
+                    st.dataframe(data, use_container_width=True, height=600, column_config=column_config)
+                    if n_pages > 1:
+                        st.caption(f"第 {start + 1:,} – {stop:,} 行 / 共 {len(df):,} 行")
+
+                with tab1:
+                    st.caption("利润明细 (Sheet1)")
+                    render_table(df_final, plan_final, key='page_sheet1')
                 
-                # 5.2 关联库存
-                df_final = pd.merge(df_final, inv_agg, on='_MATCH_SKU', how='left', sort=False)
-                df_final['火箭仓库存'] = df_final['火箭仓库存'].fillna(0).astype(int)
+                with tab2:
+                    st.caption("业务汇总 (Sheet2)")
+                    render_table(df_sheet2, plan_sheet2, key='page_sheet2')
                 
-                df_final = pd.merge(df_final, inv_j_agg, on='_MATCH_BAR', how='left', sort=False)
-                df_final['极风库存'] = df_final['极风库存'].fillna(0).astype(int)
+                with tab3:
+                    st.caption("库存分析 (Sheet3)")
+                    render_table(df_sheet3, plan_sheet3, key='page_sheet3', bars=bar_ranges(df_sheet3))
+
+                with tab4:
+                    # 本期 = 当前报表 (未筛选), 上期读快照中需要的列; 按编码关联后再按筛选条件过滤
+                    periods = snapshot_store.periods()[::-1]
+                    if not periods:
+                        st.info("暂无报表快照: 生成报表时勾选侧边栏「保存报表快照」, 之后即可与该周对比")
+                    else:
+                        default_period = snapshot_store.previous(history_period) or periods[0]
+                        prior_period = st.selectbox(
+                            "对比的快照 (上期)", periods, index=periods.index(default_period),
+                            format_func=lambda p: f"{p:%Y-%m-%d} 周", key='delta_prior_period',
+                        )
+                        current = snapshot_frames(report_index.df_final, report_index.df_sheet2, report_index.df_sheet3)
+                        df_delta = delta_report(current, snapshot_store.load_delta_basis(prior_period))
+                        if filter_code:
+                            df_delta = df_delta[df_delta.index.str.contains(filter_code, regex=False)]
+                        st.caption(
+                            f"与 {prior_period:%Y-%m-%d} 周对比: 净利润 {df_delta['最终净利润变化'].sum():+,.0f} · "
+                            f"总库存 {df_delta['总库存变化'].sum():+,.0f} · 待补数量 {df_delta['待补数量变化'].sum():+,.0f} · "
+                            f"{DELTA_STATUS_NEW} {(df_delta['状态'] == DELTA_STATUS_NEW).sum()} / {DELTA_STATUS_GONE} {(df_delta['状态'] == DELTA_STATUS_GONE).sum()} 个产品"
+                        )
+                        st.dataframe(df_delta, use_container_width=True, height=600, hide_index=True, column_config={
+                            col: st.column_config.NumberColumn(format='percent')
+                            for col in df_delta.columns if col.startswith(('广告/毛利比', '自然销量占比'))
+                        })
 
-                # 5.3 利润
-                df_final['P列_SKU总毛利'] = df_final['SKU销量'] * df_final['_VAL_PROFIT']
-                df_final['Q列_产品总利润'] = df_final.groupby('_MATCH_CODE', sort=False)['P列_SKU总毛利'].transform('sum')
-                df_final['产品总销量'] = df_final.groupby('_MATCH_CODE', sort=False)['SKU销量'].transform('sum')
-                
-                # 5.4 广告
-                df_final = pd.merge(df_final, ads_agg, on='_MATCH_CODE', how='left', sort=False)
-                df_final['R列_产品总广告费'] = df_final['R列_产品总广告费'].fillna(0)
-                df_final['产品广告销量'] = df_final['产品广告销量'].fillna(0)
-                
-                # 5.5 净利
-                df_final['S列_最终净利润'] = df_final['Q列_产品总利润'] - df_final['R列_产品总广告费']
-
-                # --- Step 6: 报表生成 ---
-                
-                # Sheet2: 业务报表
-                df_final['产品_火箭仓库存'] = df_final.groupby('_MATCH_CODE', sort=False)['火箭仓库存'].transform('sum')
-                df_final['产品_极风库存'] = df_final.groupby('_MATCH_CODE', sort=False)['极风库存'].transform('sum')
-                df_final['产品_总库存'] = df_final['产品_火箭仓库存'] + df_final['产品_极风库存']
-
-                df_sheet2 = df_final[[col_code_name, 'Q列_产品总利润', 'R列_产品总广告费', 'S列_最终净利润', '产品总销量', '产品广告销量', '产品_火箭仓库存', '产品_极风库存', '产品_总库存']].copy()
-                df_sheet2 = df_sheet2.drop_duplicates(subset=[col_code_name], keep='first')
-                
-                df_sheet2.rename(columns={
-                    '产品_火箭仓库存': '火箭仓库存', 
-                    '产品_极风库存': '极风库存',
-                    '产品_总库存': '总库存'
-                }, inplace=True)
-
-                df_sheet2['广告/毛利比'] = df_sheet2.apply(
-                    lambda x: x['R列_产品总广告费'] / x['Q列_产品总利润'] if x['Q列_产品总利润'] != 0 else 0, axis=1
-                )
-                df_sheet2['自然销量'] = df_sheet2['产品总销量'] - df_sheet2['产品广告销量']
-                df_sheet2['自然销量占比'] = df_sheet2.apply(
-                    lambda x: x['自然销量'] / x['产品总销量'] if x['产品总销量'] != 0 else 0, axis=1
-                )
-                
-                cols_order_s2 = [
-                    col_code_name, 'Q列_产品总利润', 'R列_产品总广告费', 'S列_最终净利润', 
-                    '广告/毛利比', '产品总销量', '产品广告销量', '自然销量', '自然销量占比',
-                    '火箭仓库存', '极风库存', '总库存'
-                ]
-                df_sheet2 = df_sheet2[cols_order_s2]
-
-                # --- Step 7: 库存分析表 (Sheet3) ---
-                
-                df_final['火箭仓库存数量'] = df_final['火箭仓库存']
-                df_final['总库存'] = df_final['火箭仓库存数量'] + df_final['极风库存']
-                df_final['库存货值'] = df_final['总库存'] * df_final['_VAL_COST'] * 1.2
-                df_final['安全库存'] = df_final['SKU销量'] * 3
-                df_final['冗余标准'] = df_final['SKU销量'] * 8
-                
-                df_final['待补数量'] = df_final.apply(
-                    lambda x: (x['安全库存'] - x['总库存']) if x['总库存'] < x['安全库存'] else 0,
-                    axis=1
+                # ==========================================
+                # 📥 下载逻辑 (Excel 格式精细化)
+                # ==========================================
+                # 只在点击下载时才生成文件 (在独立线程中流式写出), 平时不占用渲染时间
+                # 导出耗时单独记一条日志, 并入本次运行的阶段记录 (下次刷新时显示)
+                build_report_bytes = functools.partial(
+                    tracked_call, functools.partial(report_to_bytes, df_final, df_sheet2, df_sheet3), 'Excel 导出',
+                    parent=st.session_state.get('run_tracker'), log_path=DEFAULT_RUN_LOG,
+                    rows_in=len(df_final) + len(df_sheet2) + len(df_sheet3),
                 )
 
-                def calc_dead_stock_value(row):
-                    total = row['总库存']
-                    redundant_std = row['冗余标准']
-                    if total == 0 and redundant_std == 0: return 0
-                    if total >= redundant_std: return row['库存货值']
-                    return 0
+                st.divider()
+                st.success(f"✅ 报表生成完毕！{' (已应用筛选: ' + filter_code + ')' if filter_code else ''}")
                 
-                df_final['滞销库存货值'] = df_final.apply(calc_dead_stock_value, axis=1)
-
-                cols_master_AM = df_final.columns[:13].tolist() 
-                cols_inv_final = cols_master_AM + [
-                    '火箭仓库存数量', '极风库存', '总库存', 
-                    '库存货值', '滞销库存货值', 
-                    '待补数量', 
-                    'SKU销量', '安全库存', '冗余标准'
-                ]
-                df_sheet3 = df_final[cols_inv_final].copy()
-
-                # --- Step 8: 筛选 ---
-                if filter_code:
-                    df_final = df_final[df_final[col_code_name].astype(str).str.contains(filter_code, na=False)]
-                    df_sheet2 = df_sheet2[df_sheet2[col_code_name].astype(str).str.contains(filter_code, na=False)]
-                    df_sheet3 = df_sheet3[df_sheet3[col_code_name].astype(str).str.contains(filter_code, na=False)]
+                st.download_button(
+                    label="📥 下载 Excel (含利润/业务/库存 3个Sheet)",
+                    data=build_report_bytes,
+                    file_name=f"Coupang_Report_Stable_{filter_code if filter_code else 'All'}.xlsx",
+                    mime="application/vnd.ms-excel",
+                    type="primary",
+                    use_container_width=True,
+                    on_click="ignore"
+                )
 
-                # ==========================================
-                # 🔥 看板展示
-                # ==========================================
-                
-                if df_sheet2.empty:
-                    st.warning(f"⚠️ 未找到包含 '{filter_code}' 的产品。")
-                else:
-                    total_qty = df_sheet2['产品总销量'].sum()
-                    net_profit = df_sheet2['S列_最终净利润'].sum()
-                    inv_value_total = df_sheet3['库存货值'].sum()
-                    dead_stock_value = df_sheet3['滞销库存货值'].sum()
-                    total_restock = df_sheet3['待补数量'].sum()
-                    
-                    st.subheader(f"📈 经营概览 {'(筛选结果)' if filter_code else ''}")
-                    k1, k2, k3, k4, k5 = st.columns(5)
-                    k1.metric("💰 最终净利润", f"{net_profit:,.0f}")
-                    k2.metric("📦 总销售数量", f"{total_qty:,.0f}") 
-                    k3.metric("🏭 库存总货值", f"¥ {inv_value_total:,.0f}")
-                    k4.metric("🔴 滞销资金占用", f"¥ {dead_stock_value:,.0f}", delta="需重点清理", delta_color="inverse")
-                    k5.metric("🚨 建议补货量", f"{total_restock:,.0f}")
-
-                    st.divider()
-
-                    tab1, tab2, tab3 = st.tabs(["📝 1. 利润分析", "📊 2. 业务报表", "🏭 3. 库存分析"])
-                    
-                    # 定义格式：安全函数 (修复 Unknown format code '%' error)
-                    def safe_pct(x):
-                        try:
-                            # 尝试转浮点再格式化
-                            return "{:.1%}".format(float(x))
-                        except:
-                            # 失败则返回原值(如是文字)
-                            return str(x)
-
-                    fmt_money_int = "{:,.0f}"
-                    
-                    # 动态生成格式化规则
-                    def get_format_dict(df):
-                        format_dict = {}
-                        for col in df.columns:
-                            c_str = str(col)
-                            if any(x in c_str for x in ['利润', '费用', '货值', '金额', '毛利']):
-                                if '率' not in c_str and '比' not in c_str:
-                                    format_dict[col] = fmt_money_int
-                            elif any(x in c_str for x in ['销量', '库存', '数量', '标准', '待补']):
-                                if '比' not in c_str:
-                                    format_dict[col] = fmt_money_int
-                            elif any(x in c_str for x in ['比', '率', '占比']):
-                                # 使用安全百分比函数，而不是直接字符串
-                                format_dict[col] = safe_pct
-                        return format_dict
-
-                    def apply_visual_style(df, cols_to_color, is_sheet2=False):
-                        try:
-                            styler = df.style.format(get_format_dict(df))
-                            
-                            def zebra_rows(x):
-                                codes = x.iloc[:, 0].astype(str)
-                                groups = (codes != codes.shift()).cumsum()
-                                is_odd = groups % 2 != 0
-                                styles = pd.DataFrame('', index=x.index, columns=x.columns)
-                                styles.loc[is_odd, :] = 'background-color: #f0f2f6' 
-                                return styles
-                            
-                            styler = styler.apply(zebra_rows, axis=None)
-                            if not df.empty and 'S列_最终净利润' in df.columns:
-                                styler = styler.background_gradient(subset=['S列_最终净利润'], cmap='RdYlGn', vmin=-10000, vmax=10000)
-                            return styler
-                        except: return df
-                    
-                    def apply_inventory_style(df):
-                        try:
-                            styler = df.style.format(get_format_dict(df))
-                            
-                            def zebra_rows(x):
-                                codes = x.iloc[:, 0].astype(str)
-                                groups = (codes != codes.shift()).cumsum()
-                                is_odd = groups % 2 != 0
-                                styles = pd.DataFrame('', index=x.index, columns=x.columns)
-                                styles.loc[is_odd, :] = 'background-color: #f0f2f6' 
-                                return styles
-                            styler = styler.apply(zebra_rows, axis=None)
-
-                            def highlight_logic(x):
-                                styles = []
-                                for col in x.index:
-                                    style = ''
-                                    if col == '待补数量' and x['待补数量'] > 0:
-                                        style += 'background-color: #fff3cd; color: #e65100; font-weight: bold;'
-                                    if col == '滞销库存货值' and x['滞销库存货值'] > 0:
-                                        style += 'color: #880e4f; font-weight: bold;'
-                                    if col == '总库存':
-                                        try:
-                                            total = x['总库存']
-                                            safe = x['安全库存']
-                                            redundant = x['冗余标准']
-                                            if total == 0 and redundant == 0: pass 
-                                            elif total < safe: style += 'background-color: #ffcccc; color: #cc0000; font-weight: bold;'
-                                            elif total >= redundant: style += 'background-color: #e1bee7; color: #4a148c; font-weight: bold;'
-                                        except: pass
-                                    styles.append(style)
-                                return styles
-
-                            styler = styler.apply(highlight_logic, axis=1)
-                            return styler
-                        except: return df
-
-                    with tab1:
-                        st.caption("利润明细 (Sheet1)")
-                        st.dataframe(apply_visual_style(df_final, ['S列_最终净利润']), use_container_width=True, height=600)
-                    
-                    with tab2:
-                        st.caption("业务汇总 (Sheet2)")
-                        st.dataframe(apply_visual_style(df_sheet2, ['S列_最终净利润'], is_sheet2=True), use_container_width=True, height=600)
-                    
-                    with tab3:
-                        st.caption("库存分析 (Sheet3)")
-                        try:
-                            st_inv = apply_inventory_style(df_sheet3)
-                            st_inv = st_inv.bar(subset=['总库存'], color='#800080')\
-                                           .bar(subset=['库存货值'], color='#2ca02c')\
-                                           .bar(subset=['滞销库存货值'], color='#880e4f')
-                            st.dataframe(st_inv, use_container_width=True, height=600)
-                        except:
-                            st.dataframe(df_sheet3, use_container_width=True)
-
-                    # ==========================================
-                    # 📥 下载逻辑 (Excel 格式精细化)
-                    # ==========================================
-                    output = io.BytesIO()
-                    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-                        df_final.to_excel(writer, index=False, sheet_name='利润分析')
-                        df_sheet2.to_excel(writer, index=False, sheet_name='业务报表')
-                        df_sheet3.to_excel(writer, index=False, sheet_name='库存分析')
-                        
-                        wb = writer.book
-                        fmt_header = wb.add_format({'bold': True, 'bg_color': '#4472C4', 'font_color': 'white', 'border': 1, 'align': 'center'})
-                        
-                        fmt_int = wb.add_format({'num_format': '#,##0', 'align': 'center'})
-                        fmt_pct = wb.add_format({'num_format': '0.0%', 'align': 'center'})
-                        
-                        # 斑马纹
-                        base_font = {'font_name': 'Microsoft YaHei', 'bold': True, 'border': 1, 'align': 'center', 'valign': 'vcenter'}
-                        fmt_grey = wb.add_format(dict(base_font, bg_color='#BFBFBF'))
-                        fmt_white = wb.add_format(dict(base_font, bg_color='#FFFFFF'))
-                        # 给 Sheet2 的百分比列单独准备“带底色的百分比格式”，避免被整行格式覆盖后显示成小数
-                        fmt_grey_pct = wb.add_format(dict(base_font, bg_color='#BFBFBF', num_format='0.0%'))
-                        fmt_white_pct = wb.add_format(dict(base_font, bg_color='#FFFFFF', num_format='0.0%'))
-
-                        def set_sheet_format(sheet_name, df_obj, group_col_idx):
-                            ws = writer.sheets[sheet_name]
-                            raw_codes = df_obj.iloc[:, group_col_idx].astype(str).tolist()
-                            clean_codes = [str(x).replace('.0','').replace('"','').strip().upper() for x in raw_codes]
-                            is_grey = False
-                            for i in range(len(raw_codes)):
-                                if i > 0 and clean_codes[i] != clean_codes[i-1]:
-                                    is_grey = not is_grey
-                                ws.set_row(i + 1, None, fmt_grey if is_grey else fmt_white)
-
-                            for i, col in enumerate(df_obj.columns):
-                                c_str = str(col)
-                                width = 12
-                                cell_fmt = None
-                                if any(x in c_str for x in ['利润', '费用', '货值', '金额', '毛利', '销量', '库存', '数量', '标准', '待补']):
-                                    if '率' not in c_str and '比' not in c_str:
-                                        cell_fmt = fmt_int
-                                        width = 15
-                                elif any(x in c_str for x in ['比', '率', '占比']):
-                                    cell_fmt = fmt_pct
-                                    width = 12
-                                if cell_fmt:
-                                    ws.set_column(i, i, width, cell_fmt)
-                                else:
-                                    ws.set_column(i, i, width)
-                                ws.write(0, i, col, fmt_header)
-
-                        set_sheet_format('利润分析', df_final, IDX_M_CODE)
-                        set_sheet_format('业务报表', df_sheet2, IDX_M_CODE)
-                        set_sheet_format('库存分析', df_sheet3, IDX_M_CODE)
-
-                        # 强制把 Sheet2 的“广告费占比/广告毛利比”列按百分比格式写回，避免出现部分单元格显示成小数
-                        ws_sheet2 = writer.sheets['业务报表']
-                        pct_col_candidates = ['广告费占比', '广告/毛利比']
-                        pct_col_name = next((c for c in pct_col_candidates if c in df_sheet2.columns), None)
-                        if pct_col_name is not None:
-                            pct_col_idx = df_sheet2.columns.get_loc(pct_col_name)
-                            raw_codes = df_sheet2.iloc[:, 0].astype(str).tolist()
-                            clean_codes = [str(x).replace('.0','').replace('"','').strip().upper() for x in raw_codes]
-                            is_grey = False
-                            for row_idx, val in enumerate(df_sheet2[pct_col_name].tolist(), start=1):
-                                if row_idx > 1 and clean_codes[row_idx - 1] != clean_codes[row_idx - 2]:
-                                    is_grey = not is_grey
-                                cell_fmt = fmt_grey_pct if is_grey else fmt_white_pct
-                                try:
-                                    ws_sheet2.write_number(row_idx, pct_col_idx, float(val), cell_fmt)
-                                except:
-                                    ws_sheet2.write(row_idx, pct_col_idx, val, cell_fmt)
-
-                    st.divider()
-                    st.success(f"✅ 报表生成完毕！{' (已应用筛选: ' + filter_code + ')' if filter_code else ''}")
-                    
-                    st.download_button(
-                        label="📥 下载 Excel (含利润/业务/库存 3个Sheet)",
-                        data=output.getvalue(),
-                        file_name=f"Coupang_Report_Stable_{filter_code if filter_code else 'All'}.xlsx",
-                        mime="application/vnd.ms-excel",
-                        type="primary",
-                        use_container_width=True
-                    )
+            with st.expander("⏱️ 文件解析耗时"):
+                df_timings = pd.DataFrame(st.session_state['ingest_timings'], columns=list(FILE_TIMING_LABELS))
+                st.dataframe(df_timings.rename(columns=FILE_TIMING_LABELS), use_container_width=True, hide_index=True)
 
         except Exception as e:
             st.error(f"❌ 运行出错: {e}")
 else:
     st.info("👈 请上传文件")
+
+# 解析缓存统计 (放在脚本末尾, 反映本次运行后的命中情况)
+cache_stats = parse_cache.stats()
+st.sidebar.caption(
+    f"🗂️ 解析缓存: {cache_stats['entries']} 个文件 · {cache_stats['bytes'] / 1024 ** 2:.1f} MB · "
+    f"命中 {cache_stats['hits']} / 未命中 {cache_stats['misses']}"
+)
+job_stats = job_queue.stats()
+st.sidebar.caption(
+    f"🧵 后台任务: 运行 {job_stats['running']} · 排队 {job_stats['queued']} · 合并请求 {job_stats['merged']}"
+)
+
+# 运行监控: 本会话最近一次运行的各阶段 + 日志中最近几次运行
+if st.session_state.get('run_tracker') is not None:
+    show_stages(perf_live, st.session_state['run_tracker'])
+recent_runs = read_run_log(DEFAULT_RUN_LOG, limit=200)
+recent_runs = [r for r in recent_runs if 'parent_run_id' not in r][-10:]
+if recent_runs:
+    perf_recent.dataframe(pd.DataFrame([{
+        '时间': r['started_at'], '基础表': r['name'], '耗时(秒)': r['seconds'],
+        '状态': STATUS_ICONS.get(r['status'], r['status']), '出错阶段': r.get('failed_stage'),
+    } for r in reversed(recent_runs)]), use_container_width=True, hide_index=True)
+
+# 共享基础表: 占用内存 + 手动移除/全部失效 (其他会话下次生成报表需重新上传)
+reference_stats = reference_cache.stats()
+with st.sidebar.expander(f"📌 共享基础表 ({reference_stats['entries']} 个 · {reference_stats['bytes'] / 1024 ** 2:.1f} MB)"):
+    reference_entries = reference_cache.entries()
+    if reference_entries:
+        st.dataframe(pd.DataFrame([{
+            '文件': e['name'], '行数': e['rows'], '内存(MB)': round(e['bytes'] / 1024 ** 2, 2),
+            '载入时间': e['loaded_at'], '命中': e['hits'], '最新': '✅' if e['latest'] else '',
+        } for e in reference_entries]), use_container_width=True, hide_index=True)
+        evict_target = st.selectbox(
+            "选择要移除的文件", reference_entries,
+            format_func=lambda e: f"{e['name']} ({e['digest'][:8]})", key='reference_evict_target',
+        )
+        col_evict, col_clear = st.columns(2)
+        if col_evict.button("移除", key='reference_evict'):
+            reference_cache.evict(evict_target['kind'], evict_target['digest'])
+            st.rerun()
+        if col_clear.button("全部失效", key='reference_invalidate'):
+            reference_cache.invalidate()
+            st.rerun()
+    else:
+        st.caption("暂无 (上传基础表并生成报表后自动加入)")
+
+with st.sidebar.expander("🗄️ 已入库文件"):
+    st.dataframe(history_store.list_files().drop(columns=['digest']), use_container_width=True, hide_index=True)
@@ -0,0 +1,199 @@
+"""生成与真实导出列布局一致的模拟数据 (Master / Sales / Ads / Rocket / Jifeng)。
+
+列位置与 coupang_report.columns 中的 IDX_* 常量对应, 并包含真实数据里的脏数据:
+``.0`` 结尾的 ID、带引号的条码、千分位逗号数字、大小写混杂的 C 编码、无编码的广告组等。
+
+    python benchmarks/generate_data.py --scales 1k 10k --formats csv xlsx --out bench_data
+"""
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import xlsxwriter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from coupang_report.columns import (  # noqa: E402
+    IDX_M_CODE, IDX_M_SKU, IDX_M_COST, IDX_M_PROFIT, IDX_M_BAR,
+    IDX_S_ID, IDX_S_QTY,
+    IDX_A_CAMPAIGN, IDX_A_GROUP, IDX_A_SPEND, IDX_A_SALES,
+    IDX_I_R_ID, IDX_I_R_QTY,
+    IDX_I_J_BAR, IDX_I_J_QTY,
+)
+
+SCALES = {'1k': 1_000, '10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+SKUS_PER_PRODUCT = 3
+
+# 各表列数 (至少覆盖到最大的 IDX 列)
+N_COLS_MASTER = IDX_M_BAR + 1
+N_COLS_SALES = IDX_S_QTY + 1
+N_COLS_ADS = IDX_A_SALES + 1
+N_COLS_ROCKET = IDX_I_R_QTY + 1
+N_COLS_JIFENG = IDX_I_J_QTY + 1
+
+
+def _with_commas(values, rng, share=0.2):
+    # 部分数字写成带千分位逗号的文本 (如 "1,200"), 其余保持数字
+    out = values.astype(object)
+    mask = rng.random(len(values)) < share
+    out[mask] = [f'{v:,}' for v in values[mask]]
+    return out
+
+
+def _with_dot_zero(ids, rng, share=0.3):
+    # 部分 ID 带 ".0" 结尾 (Excel 把数字 ID 存成浮点的常见情况)
+    out = ids.astype(object)
+    mask = rng.random(len(ids)) < share
+    out[mask] = [f'{v}.0' for v in ids[mask]]
+    return out
+
+
+def _frame(n_rows, n_cols, columns, prefix):
+    data = {f'{prefix}{i + 1}': columns.get(i, np.full(n_rows, '', dtype=object)) for i in range(n_cols)}
+    return pd.DataFrame(data)
+
+
+def make_master(n_skus, rng):
+    n_products = max(1, n_skus // SKUS_PER_PRODUCT)
+    product = np.sort(rng.integers(0, n_products, n_skus))
+    sku_ids = 80_000_000 + np.arange(n_skus)
+    cost = rng.integers(5, 3_000, n_skus)
+    profit = rng.integers(-500, 8_000, n_skus)
+    bars = np.array([f'880{v:010d}' for v in sku_ids])
+    # 少量条码带引号 (clean_for_match 会去掉)
+    quoted = rng.random(n_skus) < 0.05
+    bars = bars.astype(object)
+    bars[quoted] = [f'"{b}"' for b in bars[quoted]]
+    columns = {
+        IDX_M_CODE: np.array([f'C{p + 100}' for p in product], dtype=object),
+        1: np.array([f'商品{i}' for i in range(n_skus)], dtype=object),
+        IDX_M_SKU: _with_dot_zero(sku_ids, rng),
+        IDX_M_COST: _with_commas(cost, rng),
+        IDX_M_PROFIT: _with_commas(profit, rng),
+        IDX_M_BAR: bars,
+    }
+    return _frame(n_skus, N_COLS_MASTER, columns, 'M'), sku_ids, bars, n_products
+
+
+def make_sales(sku_ids, rng, rows_per_sku=1.5):
+    n_rows = int(len(sku_ids) * rows_per_sku)
+    # 约 10% 的销售行 SKU 不在基础表中
+    ids = np.where(rng.random(n_rows) < 0.9, rng.choice(sku_ids, n_rows), 90_000_000 + rng.integers(0, 10_000, n_rows))
+    qty = rng.integers(0, 2_500, n_rows)
+    columns = {IDX_S_ID: _with_dot_zero(ids, rng), IDX_S_QTY: _with_commas(qty, rng, share=0.1)}
+    return _frame(n_rows, N_COLS_SALES, columns, 'S')
+
+
+def make_ads(n_products, rng, rows_per_product=2.0):
+    n_rows = max(1, int(n_products * rows_per_product))
+    codes = rng.integers(100, 100 + n_products, n_rows)
+    kind = rng.random(n_rows)
+    # 广告组含编码 / 只有广告活动含编码 (小写 c) / 都没有编码
+    group = np.where(kind < 0.7, [f'C{c}_组{i % 7}' for i, c in enumerate(codes)], [f'自动组{i % 11}' for i in range(n_rows)])
+    campaign = np.where(kind < 0.9, [f'活动 c{c}' for c in codes], [f'品牌活动{i % 5}' for i in range(n_rows)])
+    spend = rng.integers(0, 200_000, n_rows)
+    ad_qty = rng.integers(0, 50, n_rows)
+    columns = {
+        IDX_A_CAMPAIGN: campaign.astype(object),
+        IDX_A_GROUP: group.astype(object),
+        IDX_A_SPEND: _with_commas(spend, rng, share=0.5),
+        IDX_A_SALES: ad_qty.astype(object),
+    }
+    return _frame(n_rows, N_COLS_ADS, columns, 'A')
+
+
+def make_rocket(sku_ids, rng, share=0.8):
+    ids = rng.choice(sku_ids, int(len(sku_ids) * share))
+    qty = rng.integers(0, 1_500, len(ids))
+    columns = {IDX_I_R_ID: _with_dot_zero(ids, rng, share=0.1), IDX_I_R_QTY: _with_commas(qty, rng, share=0.05)}
+    return _frame(len(ids), N_COLS_ROCKET, columns, 'R')
+
+
+def make_jifeng(bars, rng, share=0.5):
+    picked = rng.choice(np.asarray(bars, dtype=object), int(len(bars) * share))
+    # 极风条码可能是小写 / 不带引号
+    picked = np.array([str(b).strip('"').lower() if i % 3 == 0 else str(b).strip('"') for i, b in enumerate(picked)], dtype=object)
+    qty = rng.integers(0, 300, len(picked))
+    columns = {IDX_I_J_BAR: picked, IDX_I_J_QTY: qty.astype(object)}
+    return _frame(len(picked), N_COLS_JIFENG, columns, 'J')
+
+
+def write_xlsx(df, path):
+    # 流式写出: 文本写文本, 数字写数字 (与真实导出一致, 读取端会遇到数字单元格)
+    wb = xlsxwriter.Workbook(path, {'constant_memory': True})
+    ws = wb.add_worksheet('Sheet1')
+    ws.write_row(0, 0, list(df.columns))
+    columns = [df[c].tolist() for c in df.columns]
+    for r in range(len(df)):
+        for c, values in enumerate(columns):
+            v = values[r]
+            if isinstance(v, str):
+                if v:
+                    ws.write_string(r + 1, c, v)
+            else:
+                ws.write_number(r + 1, c, v)
+    wb.close()
+
+
+def write_frame(df, path, fmt):
+    if fmt == 'csv':
+        df.to_csv(path, index=False, encoding='utf-8')
+    else:
+        write_xlsx(df, path)
+
+
+def generate(out_dir, scale, fmt, seed=0):
+    """生成一套数据, 返回 {数据源: [文件路径]}。"""
+    n_skus = SCALES[scale]
+    rng = np.random.default_rng(seed)
+    df_master, sku_ids, bars, n_products = make_master(n_skus, rng)
+    frames = {
+        'master': df_master,
+        'sales': make_sales(sku_ids, rng),
+        'ads': make_ads(n_products, rng),
+        'rocket': make_rocket(sku_ids, rng),
+        'jifeng': make_jifeng(bars, rng),
+    }
+    target = os.path.join(out_dir, scale, fmt)
+    os.makedirs(target, exist_ok=True)
+    files = {}
+    for kind, df in frames.items():
+        path = os.path.join(target, f'{kind}.{fmt}')
+        write_frame(df, path, fmt)
+        files[kind] = [path]
+
+    # 与命令行 --manifest 兼容的清单
+    manifest = {'shops': [{
+        'name': f'bench-{scale}-{fmt}',
+        'master': f'master.{fmt}', 'sales': [f'sales.{fmt}'], 'ads': [f'ads.{fmt}'],
+        'rocket': [f'rocket.{fmt}'], 'jifeng': [f'jifeng.{fmt}'], 'output': 'report.xlsx',
+    }]}
+    with open(os.path.join(target, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return files
+
+
+def dataset_files(out_dir, scale, fmt):
+    target = os.path.join(out_dir, scale, fmt)
+    return {kind: [os.path.join(target, f'{kind}.{fmt}')] for kind in ('master', 'sales', 'ads', 'rocket', 'jifeng')}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='生成基准测试用的模拟数据')
+    parser.add_argument('--scales', nargs='+', default=['1k', '10k'], choices=sorted(SCALES))
+    parser.add_argument('--formats', nargs='+', default=['csv', 'xlsx'], choices=['csv', 'xlsx'])
+    parser.add_argument('--out', default='bench_data')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    for scale in args.scales:
+        for fmt in args.formats:
+            files = generate(args.out, scale, fmt, seed=args.seed)
+            print(f'{scale}/{fmt}: ' + ', '.join(os.path.basename(p[0]) for p in files.values()), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
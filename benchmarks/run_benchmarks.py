@@ -0,0 +1,262 @@
+"""报表流水线分阶段基准测试: read / clean / aggregate / merge / metrics / styling / export。
+
+每个规模 × 格式先跑一遍计时 (取 --repeat 次中最快的一次), 再在 tracemalloc 下跑一遍记录各阶段的
+Python 内存峰值; 结果写成 JSON, 可用 --compare 与旧结果对比找出退化的阶段。
+
+    python benchmarks/run_benchmarks.py --scales 1k 10k --formats csv xlsx -o bench_results.json
+    python benchmarks/run_benchmarks.py ... --compare old_results.json
+"""
+import argparse
+import datetime
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+try:
+    import resource
+except ImportError:   # Windows
+    resource = None
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from coupang_report.cleaning import SOURCE_PREPARERS  # noqa: E402
+from coupang_report.engine import (  # noqa: E402
+    aggregate_ads, aggregate_jifeng, aggregate_rocket, aggregate_sales,
+    build_sheet2, build_sheet3, merge_report, report_catalog,
+)
+from coupang_report.export import write_report_xlsx  # noqa: E402
+from coupang_report.readers import read_source  # noqa: E402
+from coupang_report.table_render import PAGE_SIZE, inventory_style_plan, styled_page, visual_style_plan  # noqa: E402
+
+from generate_data import SCALES, dataset_files, generate  # noqa: E402
+
+STAGES = ('read', 'clean', 'aggregate', 'merge', 'metrics', 'styling', 'export')
+KINDS = ('master', 'sales', 'ads', 'rocket', 'jifeng')
+RESULTS_VERSION = 1
+
+
+def _rss_peak_mb():
+    # 进程 RSS 高水位 (单调不减); Linux 单位为 KB, macOS 为字节
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def _rows(obj):
+    if isinstance(obj, pd.DataFrame):
+        return len(obj)
+    if isinstance(obj, dict):
+        return sum(_rows(v) for v in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return sum(_rows(v) for v in obj)
+    return 0
+
+
+def _read(files):
+    frames = {}
+    for kind in KINDS:
+        frames[kind] = []
+        for path in files[kind]:
+            with open(path, 'rb') as f:
+                frames[kind].append(read_source(f, kind))
+    return frames
+
+
+def _clean(raw):
+    return {kind: [SOURCE_PREPARERS[kind](df) for df in dfs] for kind, dfs in raw.items()}
+
+
+def _aggregate(cleaned):
+    return (
+        aggregate_sales(cleaned['sales']),
+        aggregate_ads(cleaned['ads']),
+        aggregate_rocket(cleaned['rocket']),
+        aggregate_jifeng(cleaned['jifeng']),
+    )
+
+
+def _merge(df_master, aggs):
+    # 与 report_from_aggregates 相同: 键目录在 Step 5 建一次, Step 6 共用
+    catalog = report_catalog(df_master, *aggs)
+    return merge_report(df_master, *aggs, catalog), catalog
+
+
+def _metrics(df_final, catalog):
+    # 与 report_from_aggregates 相同: build_sheet2/3 会往 df_final 上追加列
+    return build_sheet2(df_final, catalog), build_sheet3(df_final)
+
+
+def _styling(df_final, df_sheet2, df_sheet3):
+    # 与看板一致: 整表算斑马纹/高亮 (生成报表时一次), 只为第一页算渐变并渲染
+    pages = []
+    for df, plan_fn in ((df_final, visual_style_plan), (df_sheet2, visual_style_plan), (df_sheet3, inventory_style_plan)):
+        plan = plan_fn(df)
+        stop = min(PAGE_SIZE, len(df))
+        pages.append(styled_page(df, plan, 0, stop).to_html())
+    return pages
+
+
+def _export(export_path, df_final, df_sheet2, df_sheet3):
+    write_report_xlsx(export_path, df_final, df_sheet2, df_sheet3)
+    return os.path.getsize(export_path)
+
+
+def run_pipeline(files, measure, export_path):
+    """按阶段执行一次完整流水线; measure(stage, fn, rows_in) 负责执行并记录。
+
+    各阶段的输入用 partial 绑定, 上一阶段的中间结果用完即释放 (内存峰值按阶段统计)。
+    """
+    raw = measure('read', partial(_read, files), 0)
+    cleaned = measure('clean', partial(_clean, raw), _rows(raw))
+    del raw
+
+    aggs = measure('aggregate', partial(_aggregate, cleaned), _rows(cleaned) - _rows(cleaned['master']))
+    df_master = cleaned['master'][0]
+    del cleaned
+
+    merged = measure('merge', partial(_merge, df_master, aggs), len(df_master) + _rows(aggs))
+    df_final, catalog = merged
+    df_sheet2, df_sheet3 = measure('metrics', partial(_metrics, df_final, catalog), len(df_final))
+
+    n_rows = len(df_final) + len(df_sheet2) + len(df_sheet3)
+    measure('styling', partial(_styling, df_final, df_sheet2, df_sheet3), n_rows)
+    measure('export', partial(_export, export_path, df_final, df_sheet2, df_sheet3), n_rows)
+
+
+def bench_dataset(files, repeat=1, trace_memory=True):
+    """返回 {stage: {...}}: seconds (最快一次), rows_in/rows_out, rss_peak_mb, 以及可选的 peak_mb (tracemalloc)。"""
+    stats = {stage: {'seconds': None} for stage in STAGES}
+    with tempfile.TemporaryDirectory() as tmp:
+        export_path = os.path.join(tmp, 'report.xlsx')
+
+        def timed(stage, fn, rows_in):
+            gc.collect()
+            t0 = time.perf_counter()
+            result = fn()
+            elapsed = time.perf_counter() - t0
+            s = stats[stage]
+            if s['seconds'] is None or elapsed < s['seconds']:
+                s['seconds'] = round(elapsed, 4)
+            s['rows_in'] = rows_in
+            s['rows_out'] = _rows(result) if not isinstance(result, int) else None
+            s['rss_peak_mb'] = _rss_peak_mb()
+            return result
+
+        for _ in range(max(1, repeat)):
+            run_pipeline(files, timed, export_path)
+
+        if trace_memory:
+            def traced(stage, fn, rows_in):
+                gc.collect()
+                tracemalloc.start()
+                try:
+                    result = fn()
+                    _, peak = tracemalloc.get_traced_memory()
+                finally:
+                    tracemalloc.stop()
+                stats[stage]['peak_mb'] = round(peak / (1024 * 1024), 1)
+                return result
+
+            run_pipeline(files, traced, export_path)
+    return stats
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _meta(args):
+    return {
+        'version': RESULTS_VERSION,
+        'created_at': datetime.datetime.now().isoformat(timespec='seconds'),
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'repeat': args.repeat,
+        'seed': args.seed,
+    }
+
+
+def compare(current, baseline, threshold):
+    """打印各阶段耗时相对 baseline 的倍数, 返回超过 threshold 的退化项。"""
+    old = {(r['scale'], r['format'], r['stage']): r for r in baseline['results']}
+    regressions = []
+    print(f"{'scale':>6} {'fmt':>5} {'stage':>10} {'old s':>9} {'new s':>9} {'ratio':>7}", file=sys.stderr)
+    for r in current['results']:
+        prev = old.get((r['scale'], r['format'], r['stage']))
+        if prev is None or not prev.get('seconds') or r['seconds'] is None:
+            continue
+        ratio = r['seconds'] / prev['seconds']
+        flag = ''
+        # 太快的阶段噪声大, 不计入退化
+        if ratio > threshold and r['seconds'] >= 0.05:
+            regressions.append(r)
+            flag = '  ⚠️'
+        print(f"{r['scale']:>6} {r['format']:>5} {r['stage']:>10} {prev['seconds']:>9.3f} {r['seconds']:>9.3f} {ratio:>6.2f}x{flag}", file=sys.stderr)
+    return regressions
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='报表流水线分阶段基准测试')
+    parser.add_argument('--scales', nargs='+', default=['1k', '10k'], choices=sorted(SCALES))
+    parser.add_argument('--formats', nargs='+', default=['csv', 'xlsx'], choices=['csv', 'xlsx'])
+    parser.add_argument('--data', default='bench_data', help='模拟数据目录 (缺少的数据集会自动生成)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=1, help='计时轮数, 取最快一次')
+    parser.add_argument('--no-memory', action='store_true', help='跳过 tracemalloc 内存统计 (大规模时较慢)')
+    parser.add_argument('-o', '--output', default='bench_results.json')
+    parser.add_argument('--compare', metavar='BASELINE_JSON', help='与旧结果对比, 有退化时退出码为 1')
+    parser.add_argument('--threshold', type=float, default=1.2, help='耗时超过旧结果该倍数视为退化')
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    results = []
+    for scale in args.scales:
+        for fmt in args.formats:
+            files = dataset_files(args.data, scale, fmt)
+            if not all(os.path.exists(p) for paths in files.values() for p in paths):
+                print(f'生成 {scale}/{fmt} ...', file=sys.stderr)
+                files = generate(args.data, scale, fmt, seed=args.seed)
+
+            stats = bench_dataset(files, repeat=args.repeat, trace_memory=not args.no_memory)
+            for stage in STAGES:
+                results.append(dict(scale=scale, format=fmt, stage=stage, **stats[stage]))
+            total = sum(stats[s]['seconds'] for s in STAGES)
+            print(f'✅ {scale}/{fmt}: {total:.2f}s  ' + '  '.join(f"{s}={stats[s]['seconds']:.3f}" for s in STAGES), file=sys.stderr)
+
+    report = {'meta': _meta(args), 'results': results}
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f'结果已写入 {args.output}', file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if compare(report, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1 @@
+# Coupang 经营看板 - 报表核心模块 (与 Streamlit 界面解耦)
@@ -0,0 +1,67 @@
+import pandas as pd
+
+from .columns import (
+    IDX_M_CODE, IDX_M_SKU, IDX_M_COST, IDX_M_PROFIT, IDX_M_BAR,
+    IDX_S_ID, IDX_S_QTY,
+    IDX_A_CAMPAIGN, IDX_A_GROUP, IDX_A_SPEND, IDX_A_SALES,
+    IDX_I_R_ID, IDX_I_R_QTY,
+    IDX_I_J_BAR, IDX_I_J_QTY,
+)
+
+# ==========================================
+# 清洗工具函数
+# ==========================================
+def clean_for_match(series):
+    return series.astype(str).str.replace(r'\.0$', '', regex=True).str.replace('"', '').str.strip().str.upper()
+
+def clean_num(series):
+    return pd.to_numeric(series.astype(str).str.replace(',', ''), errors='coerce').fillna(0)
+
+def extract_codes(series):
+    # 提取文本中第一个 C+数字 编码并转大写, 缺失/无编码为 NaN
+    codes = series.astype(str).str.extract(r'([Cc]\d+)', expand=False).str.upper()
+    return codes.where(series.notna())
+
+# ==========================================
+# 各数据源的单文件清洗 (追加 _MATCH_* / 数值列)
+# ==========================================
+def prepare_master(df):
+    df['_MATCH_SKU'] = clean_for_match(df.iloc[:, IDX_M_SKU])
+    df['_MATCH_BAR'] = clean_for_match(df.iloc[:, IDX_M_BAR])
+    df['_MATCH_CODE'] = clean_for_match(df.iloc[:, IDX_M_CODE])
+    df['_VAL_PROFIT'] = clean_num(df.iloc[:, IDX_M_PROFIT])
+    df['_VAL_COST'] = clean_num(df.iloc[:, IDX_M_COST])
+    return df
+
+# 以下数据源由 readers.READER_SPECS 裁剪读取: 列名即原列号, 数量列已是数值
+def prepare_sales(df):
+    df['_MATCH_SKU'] = clean_for_match(df[IDX_S_ID])
+    df['销量'] = df[IDX_S_QTY]
+    return df
+
+def prepare_ads(df):
+    df['含税广告费'] = df[IDX_A_SPEND] * 1.1
+    df['广告销量'] = df[IDX_A_SALES]
+    df['Code_Group'] = extract_codes(df[IDX_A_GROUP])
+    df['Code_Campaign'] = extract_codes(df[IDX_A_CAMPAIGN])
+    df['_MATCH_CODE'] = df['Code_Group'].fillna(df['Code_Campaign'])
+    return df
+
+def prepare_rocket(df):
+    df['_MATCH_SKU'] = clean_for_match(df[IDX_I_R_ID])
+    df['火箭仓库存'] = df[IDX_I_R_QTY]
+    return df
+
+def prepare_jifeng(df):
+    df['_MATCH_BAR'] = clean_for_match(df[IDX_I_J_BAR])
+    df['极风库存'] = df[IDX_I_J_QTY]
+    return df
+
+# 数据源类型 -> 清洗函数
+SOURCE_PREPARERS = {
+    'master': prepare_master,
+    'sales': prepare_sales,
+    'ads': prepare_ads,
+    'rocket': prepare_rocket,
+    'jifeng': prepare_jifeng,
+}
@@ -0,0 +1,222 @@
+import argparse
+import json
+import os
+import sys
+import time
+from contextlib import ExitStack
+
+from .engine import ReportInputs, compute_report, filter_report, report_from_aggregates
+from .export import write_multishop_xlsx, write_report_xlsx
+from .history_store import HistoryStore
+from .ingest import ingest_files, ingest_inputs
+from .instrumentation import RunTracker, count_rows, track
+from .multishop import TOTAL_LABEL, consolidate, run_shops, unique_shop_names
+from .parse_cache import ParseCache
+from .snapshots import SnapshotStore
+
+# ==========================================
+# 命令行批处理 (无需启动 Streamlit)
+#   单店:  python -m coupang_report --master m.xlsx --sales s1.xlsx s2.xlsx --ads a.csv -o out.xlsx
+#   多店:  python -m coupang_report --manifest shops.json
+#   合并:  python -m coupang_report --manifest shops.json --consolidate all.xlsx  (各店并行, 汇总 + 分店表写入一个文件)
+#   历史:  ... --history-db h.sqlite3 --period 2026-10-12          (本次文件入库)
+#          ... --history-db h.sqlite3 --history-range 2026-09-01 2026-10-31  (按区间生成)
+#   快照:  ... --snapshot-dir snaps --period 2026-10-12   (保存业务报表/库存分析快照, 界面中做周环比)
+#   监控:  ... --run-log runs.jsonl [--trace-memory]   (每店一行 JSON: 分阶段耗时/内存/行数)
+# ==========================================
+
+def _open_all(stack, paths):
+    return [stack.enter_context(open(p, 'rb')) for p in paths or []]
+
+
+def run_shop(shop, cache=None, filter_code='', max_workers=None, period=None, history_range=None, tracker=None):
+    """按一个店铺的配置生成报表并写出 xlsx, 返回耗时 (秒)。
+
+    shop 含 history_db 时: 给定 period 则把本次的销售/广告/库存文件入库 (同内容只入库一次);
+    给定 history_range=(起, 止) 则销售/广告/库存改为取历史库中该区间的预聚合结果。
+    shop 含 snapshot_dir 且给定 period 时, 把 (未筛选的) 报表快照按 period 保存。
+    tracker (RunTracker) 记录各阶段耗时/内存/行数。
+    """
+    start = time.perf_counter()
+    store = HistoryStore(shop['history_db']) if shop.get('history_db') else None
+    if history_range and store is None:
+        raise ValueError('按历史区间生成需要指定历史库 (history_db)')
+    try:
+        with ExitStack() as stack:
+            inputs = ReportInputs(
+                master=stack.enter_context(open(shop['master'], 'rb')),
+                sales=_open_all(stack, shop.get('sales')),
+                ads=_open_all(stack, shop.get('ads')),
+                rocket=_open_all(stack, shop.get('rocket')),
+                jifeng=_open_all(stack, shop.get('jifeng')),
+            )
+            if history_range:
+                if period:
+                    jobs = [('sales', f) for f in inputs.sales] + [('ads', f) for f in inputs.ads] \
+                        + [('rocket', f) for f in inputs.rocket] + [('jifeng', f) for f in inputs.jifeng]
+                    with track(tracker, '历史库入库', rows_in=len(jobs)):
+                        store.ingest(jobs, period, cache=cache, max_workers=max_workers)
+                with track(tracker, 'Step 1 基础表', rows_in=1) as s:
+                    master_frames, _ = ingest_files([('master', inputs.master)], cache=cache)
+                    s.rows_out = len(master_frames[0])
+                with track(tracker, 'Step 2~4 历史聚合') as s:
+                    history_aggs = store.report_aggregates(*history_range)
+                    s.rows_out = count_rows(history_aggs)
+                frames = report_from_aggregates(master_frames[0], *history_aggs, tracker=tracker)
+            else:
+                loaded, timings = ingest_inputs(inputs, cache=cache, max_workers=max_workers, tracker=tracker)
+                if tracker is not None:
+                    # 每个文件探测到的格式/编码和解析耗时, 随本次运行写入日志
+                    tracker.extra['files'] = [
+                        {k: t[k] for k in ('kind', 'name', 'format', 'encoding', 'seconds', 'rows', 'cached')} for t in timings
+                    ]
+                if store is not None and period:
+                    with track(tracker, '历史库入库', rows_in=len(timings) - 1):
+                        store.add_loaded(loaded, timings, period)
+                frames = compute_report(loaded, tracker=tracker)
+    finally:
+        if store is not None:
+            store.close()
+    if shop.get('snapshot_dir') and period:
+        with track(tracker, '快照保存', rows_in=len(frames[1]) + len(frames[2])):
+            SnapshotStore(shop['snapshot_dir']).save(period, *frames, name=shop.get('name'))
+    with track(tracker, 'Step 8 筛选', rows_in=len(frames[0])) as s:
+        frames = filter_report(*frames, filter_code)
+        s.rows_out = len(frames[0])
+    with track(tracker, 'Excel 导出', rows_in=count_rows(frames)) as s:
+        write_report_xlsx(shop['output'], *frames)
+        s.rows_out = count_rows(frames)
+    return time.perf_counter() - start
+
+
+def load_manifest(path):
+    # 清单中的相对路径以清单文件所在目录为准
+    base = os.path.dirname(os.path.abspath(path))
+    with open(path, encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    def _abs(p):
+        return os.path.join(base, p)
+
+    shops = []
+    for shop in manifest['shops']:
+        shop = dict(shop)
+        shop['master'] = _abs(shop['master'])
+        if shop.get('output'):
+            shop['output'] = _abs(shop['output'])
+        for key in ('history_db', 'snapshot_dir'):
+            if shop.get(key):
+                shop[key] = _abs(shop[key])
+        for key in ('sales', 'ads', 'rocket', 'jifeng'):
+            shop[key] = [_abs(p) for p in shop.get(key) or []]
+        shops.append(shop)
+    return shops
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='coupang_report', description='生成 Coupang 三表报表 (利润分析/业务报表/库存分析)')
+    parser.add_argument('--manifest', help='多店铺清单 JSON: {"shops": [{"name", "master", "sales", "ads", "rocket", "jifeng", "output"}]}')
+    parser.add_argument('--master', help='基础信息表 (Master)')
+    parser.add_argument('--sales', nargs='+', default=[], help='销售表 (可多个)')
+    parser.add_argument('--ads', nargs='+', default=[], help='广告表 (可多个)')
+    parser.add_argument('--rocket', nargs='+', default=[], help='火箭仓库存表 (可多个)')
+    parser.add_argument('--jifeng', nargs='+', default=[], help='极风库存表 (可多个)')
+    parser.add_argument('-o', '--output', help='输出 xlsx 路径')
+    parser.add_argument('--filter', default='', help='产品编号筛选 (如 C123)')
+    parser.add_argument('--workers', type=int, default=None, help='并行解析进程数 (默认 CPU 核数, 1 为串行)')
+    parser.add_argument('--history-db', help='历史库路径 (SQLite); 多店铺清单中按店铺写 history_db')
+    parser.add_argument('--period', help='本次数据所属周期起始日 (YYYY-MM-DD), 指定后写入历史库')
+    parser.add_argument('--snapshot-dir', help='报表快照目录, 与 --period 一起使用; 多店铺清单中按店铺写 snapshot_dir')
+    parser.add_argument('--history-range', nargs=2, metavar=('START', 'END'), help='按历史库区间生成 (YYYY-MM-DD YYYY-MM-DD)')
+    parser.add_argument('--run-log', help='运行日志 (JSON Lines), 每个店铺追加一行分阶段耗时/内存/行数')
+    parser.add_argument('--trace-memory', action='store_true', help='用 tracemalloc 统计各阶段内存峰值 (较慢)')
+    parser.add_argument('--consolidate', metavar='OUTPUT', help='多店铺合并: 各店铺并行计算, 汇总表与各店铺表写入该 xlsx (需 --manifest)')
+    return parser
+
+
+def run_consolidated(shops, output, filter_code='', max_workers=None, tracker=None):
+    """各店铺并行计算后合并写出, 返回 (各店铺 ShopReport 列表, KPI 汇总表)。"""
+    names = unique_shop_names([shop.get('name') for shop in shops])
+    with ExitStack() as stack:
+        inputs = [(name, ReportInputs(
+            master=stack.enter_context(open(shop['master'], 'rb')),
+            sales=_open_all(stack, shop.get('sales')),
+            ads=_open_all(stack, shop.get('ads')),
+            rocket=_open_all(stack, shop.get('rocket')),
+            jifeng=_open_all(stack, shop.get('jifeng')),
+        )) for name, shop in zip(names, shops)]
+        reports = run_shops(inputs, max_workers=max_workers, tracker=tracker, trace_memory=tracker is not None and tracker.trace_memory)
+    with track(tracker, 'Step 8 筛选/合并', rows_in=sum(len(r.frames[0]) for r in reports)) as s:
+        shop_frames = [(r.name, filter_report(*r.frames, filter_code)) for r in reports]
+        consolidated = consolidate(shop_frames)
+        s.rows_out = len(consolidated[1])
+    with track(tracker, 'Excel 导出', rows_in=count_rows(consolidated)) as s:
+        write_multishop_xlsx(output, shop_frames, consolidated)
+        s.rows_out = count_rows(consolidated)
+    return reports, consolidated[0]
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.consolidate:
+        if not args.manifest:
+            parser.error('--consolidate 需要 --manifest')
+        if args.period or args.history_range:
+            parser.error('--consolidate 暂不支持历史库 (--period / --history-range)')
+        tracker = RunTracker(name=os.path.basename(args.consolidate), trace_memory=args.trace_memory, log_path=args.run_log)
+        start = time.perf_counter()
+        try:
+            reports, df_kpi = run_consolidated(
+                load_manifest(args.manifest), args.consolidate, filter_code=args.filter.strip().upper(),
+                max_workers=args.workers, tracker=tracker,
+            )
+            tracker.finish()
+        except Exception as e:
+            tracker.finish(e)
+            stage = f' [{tracker.failed_stage}]' if tracker.failed_stage else ''
+            print(f"❌ {args.consolidate}{stage}: {e}", file=sys.stderr)
+            return 1
+        for r in reports:
+            print(f"   {r.name}: {r.seconds:.2f}s, {len(r.frames[1])} 个产品", file=sys.stderr)
+        total = df_kpi[df_kpi.iloc[:, 0] == TOTAL_LABEL].iloc[0]
+        print(
+            f"✅ {args.consolidate} ({len(reports)} 个店铺, {time.perf_counter() - start:.2f}s, "
+            f"各店合计 {sum(r.seconds for r in reports):.2f}s) 净利润 {total['最终净利润']:,.0f}",
+            file=sys.stderr,
+        )
+        return 0
+
+    if args.manifest:
+        shops = load_manifest(args.manifest)
+    else:
+        if not (args.master and args.output and (args.history_range or (args.sales and args.ads))):
+            parser.error('单店模式需要 --master, --sales, --ads 和 --output (按历史区间生成时可省略 --sales/--ads)')
+        shops = [{
+            'name': os.path.basename(args.output),
+            'master': args.master, 'sales': args.sales, 'ads': args.ads,
+            'rocket': args.rocket, 'jifeng': args.jifeng, 'output': args.output,
+            'history_db': args.history_db, 'snapshot_dir': args.snapshot_dir,
+        }]
+
+    # 同一进程内多店共用解析缓存 (共用的 Master 只解析一次)
+    cache = ParseCache()
+    failed = 0
+    for shop in shops:
+        name = shop.get('name') or shop['output']
+        tracker = RunTracker(name=name, trace_memory=args.trace_memory, log_path=args.run_log)
+        try:
+            elapsed = run_shop(
+                shop, cache=cache, filter_code=args.filter.strip().upper(), max_workers=args.workers,
+                period=args.period, history_range=args.history_range, tracker=tracker,
+            )
+            tracker.finish()
+            slowest = max(tracker.records, key=lambda r: r.seconds or 0)
+            print(f"✅ {name}: {shop['output']} ({elapsed:.2f}s, 最慢: {slowest.stage} {slowest.seconds:.2f}s)", file=sys.stderr)
+        except Exception as e:
+            tracker.finish(e)
+            failed += 1
+            stage = f' [{tracker.failed_stage}]' if tracker.failed_stage else ''
+            print(f"❌ {name}{stage}: {e}", file=sys.stderr)
+    return 1 if failed else 0
@@ -0,0 +1,28 @@
+# ==========================================
+# 列号配置 (各数据源按列位置取数)
+# ==========================================
+
+# Master表 (基础表)
+IDX_M_CODE   = 0    # A列: 内部编码
+IDX_M_SKU    = 3    # D列: SKU ID (用于匹配火箭仓)
+IDX_M_COST   = 6    # G列: 采购价格 (RMB)
+IDX_M_PROFIT = 10   # K列: 单品毛利
+IDX_M_BAR    = 12   # M列: ID号码 (用于匹配极风库存)
+
+# Sales表 (销售表)
+IDX_S_ID     = 0    # A列
+IDX_S_QTY    = 8    # I列
+
+# Ads表 (广告表)
+IDX_A_CAMPAIGN = 5  # F列
+IDX_A_GROUP    = 6  # G列
+IDX_A_SPEND    = 15 # P列
+IDX_A_SALES    = 29 # AD列 (30列)
+
+# Inventory Rocket (火箭仓)
+IDX_I_R_ID   = 2    # C列: ID
+IDX_I_R_QTY  = 7    # H列: 库存数量
+
+# Inventory Jifeng (极风)
+IDX_I_J_BAR  = 2    # C列: 产品条码
+IDX_I_J_QTY  = 10   # K列: 数值
@@ -0,0 +1,138 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+# ==========================================
+# 低内存模式: 报表算完后压缩常驻会话的三张表
+#   - 匹配键 (_MATCH_*) 及重复值多的文本列 (品牌/类目/空列等) 转为 category
+#   - 数值列无损降为 int32 / float32 (值和整列合计都不变才降, 看板/导出结果一致)
+#   - Sheet3 直接从 df_final 选列 (写时复制下与 df_final 共用内存, 不再 .copy())
+# ==========================================
+KEY_COLUMNS = ('_MATCH_SKU', '_MATCH_BAR', '_MATCH_CODE')
+
+# 唯一值占比不超过该值时才转 category (几乎唯一的列转 category 反而更大)
+CATEGORY_MAX_UNIQUE_RATIO = 0.5
+
+_INT32 = np.iinfo(np.int32)
+
+
+def downcast_numeric(series):
+    """无损降精度: 整数 (含整数值的浮点) -> int32, 其余浮点 -> float32; 做不到无损时原样返回。"""
+    dtype = series.dtype
+    if not isinstance(dtype, np.dtype) or dtype.kind not in 'iuf' or dtype.itemsize <= 4:
+        return series
+    values = series.to_numpy()
+    if len(values) == 0:
+        return series
+
+    if dtype.kind == 'f':
+        if not np.isfinite(values).all():
+            return series
+        integral = np.array_equal(values, np.round(values))
+    else:
+        integral = True
+    if integral and values.min() >= _INT32.min and values.max() <= _INT32.max:
+        # int32 求和时 pandas 仍按 int64 累加, 合计不受影响
+        return series.astype(np.int32)
+
+    if dtype.kind == 'f':
+        as32 = values.astype(np.float32)
+        # float32 求和按 float32 累加, 合计也要一致 (KPI 直接对列求和)
+        if np.array_equal(as32, values) and float(as32.sum()) == float(values.sum()):
+            return series.astype(np.float32)
+    return series
+
+
+def categorize(series, max_unique_ratio=CATEGORY_MAX_UNIQUE_RATIO):
+    if isinstance(series.dtype, pd.CategoricalDtype) or len(series) == 0:
+        return series
+    if series.nunique(dropna=True) > len(series) * max_unique_ratio:
+        return series
+    return series.astype('category')
+
+
+def _is_text(series):
+    return pd.api.types.is_string_dtype(series.dtype) or series.dtype == object
+
+
+def compact_frame(df, key_cols=KEY_COLUMNS):
+    """返回压缩后的新数据帧 (未改动的列与原表共用内存); 内容相同的重复列只保留一份数据。"""
+    out = {}
+    seen = {}
+    for col in df.columns:
+        s = df[col]
+        s = categorize(s) if col in key_cols or _is_text(s) else downcast_numeric(s)
+        # 如 火箭仓库存数量 与 火箭仓库存 完全相同: 复用同一个 Series, 写时复制下共享内存
+        if isinstance(s.dtype, np.dtype) and s.dtype.kind in 'iuf':
+            sig = (s.dtype.str, len(s))
+            for other in seen.get(sig, []):
+                if s.equals(other):
+                    s = other
+                    break
+            else:
+                seen.setdefault(sig, []).append(s)
+        out[col] = s.rename(col)
+    # copy=False: 每列各自成块, 不合并成二维块 (合并会复制, 重复列/未改动列就不再共用内存)
+    return pd.DataFrame(out, index=df.index, copy=False)
+
+
+def _buffer_key(series):
+    # 底层数据缓冲区的标识, 用于识别多张表/多列共用的数据; 无法识别时返回 None
+    if isinstance(series.dtype, np.dtype) and series.dtype.kind in 'iufb':
+        arr = series.to_numpy(copy=False)
+    elif isinstance(series.dtype, pd.CategoricalDtype):
+        arr = series.array.codes
+    elif hasattr(series.array, '__arrow_array__'):
+        chunked = series.array.__arrow_array__()
+        return tuple(b.address if b is not None else None for c in chunked.chunks for b in c.buffers())
+    else:
+        return None
+    return (arr.__array_interface__['data'][0], arr.nbytes)
+
+
+def frames_nbytes(frames):
+    """多张表合计占用的字节数; 多张表/多列共用的数据只计一次。"""
+    total = 0
+    seen = set()
+    for df in frames:
+        total += int(df.index.memory_usage(deep=True))
+        for col in df.columns:
+            s = df[col]
+            key = _buffer_key(s)
+            if key is not None:
+                if key in seen:
+                    continue
+                seen.add(key)
+            total += int(s.memory_usage(index=False, deep=True))
+    return total
+
+
+@dataclass
+class MemoryReport:
+    before_bytes: int
+    after_bytes: int
+
+    @property
+    def saved_bytes(self):
+        return self.before_bytes - self.after_bytes
+
+    @property
+    def saved_ratio(self):
+        return self.saved_bytes / self.before_bytes if self.before_bytes else 0.0
+
+
+def compact_report(df_final, df_sheet2, df_sheet3):
+    """压缩 compute_report 的结果, 返回 ((df_final, df_sheet2, df_sheet3), MemoryReport)。"""
+    before = frames_nbytes((df_final, df_sheet2, df_sheet3))
+
+    compact_final = compact_frame(df_final)
+    compact_sheet2 = compact_frame(df_sheet2)
+    # Sheet3 的列都在 df_final 中 (build_sheet3 会把新增列写回 df_final), 直接选列即可
+    if df_sheet3.columns.isin(compact_final.columns).all() and df_sheet3.index.equals(compact_final.index):
+        compact_sheet3 = compact_final[list(df_sheet3.columns)]
+    else:
+        compact_sheet3 = compact_frame(df_sheet3)
+
+    frames = (compact_final, compact_sheet2, compact_sheet3)
+    return frames, MemoryReport(before, frames_nbytes(frames))
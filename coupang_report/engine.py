@@ -0,0 +1,210 @@
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+from .columns import IDX_M_CODE
+from .instrumentation import count_rows, track
+from .key_catalog import KeyCatalog
+from .metrics import ad_profit_ratio, dead_stock_value, natural_sales_share, restock_qty
+from .parse_cache import load_source
+from .report_index import ReportIndex
+
+# ==========================================
+# 报表引擎 (Step 1~7, 不依赖 Streamlit)
+# ==========================================
+
+@dataclass
+class ReportInputs:
+    """一次报表所需的上传文件 (文件对象需有 name/seek/read)。"""
+    master: object
+    sales: list
+    ads: list
+    rocket: list = field(default_factory=list)
+    jifeng: list = field(default_factory=list)
+    # master 为 None 时使用的共享基础表 (内容 sha1, 在 ReferenceCache 中查找)
+    master_digest: str = None
+
+
+@dataclass
+class LoadedInputs:
+    """已读取并清洗的各数据源 (每个文件一个数据帧)。"""
+    master: pd.DataFrame
+    sales: list
+    ads: list
+    rocket: list = field(default_factory=list)
+    jifeng: list = field(default_factory=list)
+
+
+def load_inputs(inputs, cache=None):
+    return LoadedInputs(
+        master=load_source(inputs.master, 'master', cache),
+        sales=[load_source(f, 'sales', cache) for f in inputs.sales],
+        ads=[load_source(f, 'ads', cache) for f in inputs.ads],
+        rocket=[load_source(f, 'rocket', cache) for f in inputs.rocket or []],
+        jifeng=[load_source(f, 'jifeng', cache) for f in inputs.jifeng or []],
+    )
+
+# --- Step 2: 销售表 ---
+def aggregate_sales(sales_list):
+    df_sales_all = pd.concat(sales_list, ignore_index=True)
+    sales_agg = df_sales_all.groupby('_MATCH_SKU')['销量'].sum().reset_index()
+    sales_agg.rename(columns={'销量': 'SKU销量'}, inplace=True)
+    return sales_agg
+
+# --- Step 3: 广告表 ---
+def aggregate_ads(ads_list):
+    df_ads_all = pd.concat(ads_list, ignore_index=True)
+    valid_ads = df_ads_all.dropna(subset=['_MATCH_CODE'])
+    ads_agg = valid_ads.groupby('_MATCH_CODE')[['含税广告费', '广告销量']].sum().reset_index()
+    ads_agg.rename(columns={'含税广告费': 'R列_产品总广告费', '广告销量': '产品广告销量'}, inplace=True)
+    return ads_agg
+
+# --- Step 4.1: 火箭仓库存 ---
+def aggregate_rocket(inv_list):
+    if not inv_list:
+        return pd.DataFrame(columns=['_MATCH_SKU', '火箭仓库存'])
+    df_inv_all = pd.concat(inv_list, ignore_index=True)
+    return df_inv_all.groupby('_MATCH_SKU')['火箭仓库存'].sum().reset_index()
+
+# --- Step 4.2: 极风库存 ---
+def aggregate_jifeng(inv_j_list):
+    if not inv_j_list:
+        return pd.DataFrame(columns=['_MATCH_BAR', '极风库存'])
+    df_inv_j_all = pd.concat(inv_j_list, ignore_index=True)
+    return df_inv_j_all.groupby('_MATCH_BAR')['极风库存'].sum().reset_index()
+
+# --- Step 5: 关联 & 计算 ---
+def report_catalog(df_master, sales_agg, ads_agg, inv_agg, inv_j_agg):
+    """Master 与四个聚合结果的键一起编号, Step 5/6 共用。"""
+    return KeyCatalog(df_master, {
+        'sales': ('sku', sales_agg['_MATCH_SKU']),
+        'rocket': ('sku', inv_agg['_MATCH_SKU']),
+        'jifeng': ('bar', inv_j_agg['_MATCH_BAR']),
+        'ads': ('code', ads_agg['_MATCH_CODE']),
+    })
+
+# 各聚合结果的键唯一, 左关联即按键编号查表 (行数、行顺序与 Master 相同)
+def merge_report(df_master, sales_agg, ads_agg, inv_agg, inv_j_agg, catalog=None):
+    if catalog is None:
+        catalog = report_catalog(df_master, sales_agg, ads_agg, inv_agg, inv_j_agg)
+    df_final = df_master.reset_index(drop=True)
+
+    def join(name, agg, *value_cols):
+        for col, values in catalog.lookup(name, agg, value_cols).items():
+            df_final[col] = values
+
+    # 5.1 基础 + 销售
+    join('sales', sales_agg, 'SKU销量')
+    df_final['SKU销量'] = df_final['SKU销量'].fillna(0).astype(int)
+
+    # 5.2 关联库存
+    join('rocket', inv_agg, '火箭仓库存')
+    df_final['火箭仓库存'] = df_final['火箭仓库存'].fillna(0).astype(int)
+
+    join('jifeng', inv_j_agg, '极风库存')
+    df_final['极风库存'] = df_final['极风库存'].fillna(0).astype(int)
+
+    # 5.3 利润
+    df_final['P列_SKU总毛利'] = df_final['SKU销量'] * df_final['_VAL_PROFIT']
+    df_final['Q列_产品总利润'] = catalog.group_sum('code', df_final['P列_SKU总毛利'])
+    df_final['产品总销量'] = catalog.group_sum('code', df_final['SKU销量'])
+
+    # 5.4 广告
+    join('ads', ads_agg, 'R列_产品总广告费', '产品广告销量')
+    df_final['R列_产品总广告费'] = df_final['R列_产品总广告费'].fillna(0)
+    df_final['产品广告销量'] = df_final['产品广告销量'].fillna(0)
+
+    # 5.5 净利
+    df_final['S列_最终净利润'] = df_final['Q列_产品总利润'] - df_final['R列_产品总广告费']
+    return df_final
+
+# --- Step 6: 业务报表 (Sheet2) ---
+def build_sheet2(df_final, catalog=None):
+    col_code_name = df_final.columns[IDX_M_CODE]
+    if catalog is None:
+        catalog = KeyCatalog(df_final)
+
+    df_final['产品_火箭仓库存'] = catalog.group_sum('code', df_final['火箭仓库存'])
+    df_final['产品_极风库存'] = catalog.group_sum('code', df_final['极风库存'])
+    df_final['产品_总库存'] = df_final['产品_火箭仓库存'] + df_final['产品_极风库存']
+
+    df_sheet2 = df_final[[col_code_name, 'Q列_产品总利润', 'R列_产品总广告费', 'S列_最终净利润', '产品总销量', '产品广告销量', '产品_火箭仓库存', '产品_极风库存', '产品_总库存']].copy()
+    df_sheet2 = df_sheet2.drop_duplicates(subset=[col_code_name], keep='first')
+
+    df_sheet2.rename(columns={
+        '产品_火箭仓库存': '火箭仓库存',
+        '产品_极风库存': '极风库存',
+        '产品_总库存': '总库存'
+    }, inplace=True)
+
+    df_sheet2['广告/毛利比'] = ad_profit_ratio(df_sheet2['R列_产品总广告费'], df_sheet2['Q列_产品总利润'])
+    df_sheet2['自然销量'] = df_sheet2['产品总销量'] - df_sheet2['产品广告销量']
+    df_sheet2['自然销量占比'] = natural_sales_share(df_sheet2['自然销量'], df_sheet2['产品总销量'])
+
+    cols_order_s2 = [
+        col_code_name, 'Q列_产品总利润', 'R列_产品总广告费', 'S列_最终净利润',
+        '广告/毛利比', '产品总销量', '产品广告销量', '自然销量', '自然销量占比',
+        '火箭仓库存', '极风库存', '总库存'
+    ]
+    return df_sheet2[cols_order_s2]
+
+# --- Step 7: 库存分析表 (Sheet3) ---
+def build_sheet3(df_final):
+    df_final['火箭仓库存数量'] = df_final['火箭仓库存']
+    df_final['总库存'] = df_final['火箭仓库存数量'] + df_final['极风库存']
+    df_final['库存货值'] = df_final['总库存'] * df_final['_VAL_COST'] * 1.2
+    df_final['安全库存'] = df_final['SKU销量'] * 3
+    df_final['冗余标准'] = df_final['SKU销量'] * 8
+
+    df_final['待补数量'] = restock_qty(df_final['总库存'], df_final['安全库存'])
+    df_final['滞销库存货值'] = dead_stock_value(df_final['总库存'], df_final['冗余标准'], df_final['库存货值'])
+
+    cols_master_AM = df_final.columns[:13].tolist()
+    cols_inv_final = cols_master_AM + [
+        '火箭仓库存数量', '极风库存', '总库存',
+        '库存货值', '滞销库存货值',
+        '待补数量',
+        'SKU销量', '安全库存', '冗余标准'
+    ]
+    return df_final[cols_inv_final].copy()
+
+
+def report_from_aggregates(df_master, sales_agg, ads_agg, inv_agg, inv_j_agg, tracker=None):
+    """由清洗后的 Master 和各数据源聚合结果计算三张表 (聚合可来自上传文件或历史库)。"""
+    with track(tracker, 'Step 5 关联计算', rows_in=len(df_master)) as s:
+        # 键目录建一次, Step 5/6 共用 (df_final 与 Master 行一一对应)
+        catalog = report_catalog(df_master, sales_agg, ads_agg, inv_agg, inv_j_agg)
+        df_final = merge_report(df_master, sales_agg, ads_agg, inv_agg, inv_j_agg, catalog)
+        s.rows_out = len(df_final)
+    with track(tracker, 'Step 6 业务报表', rows_in=len(df_final)) as s:
+        df_sheet2 = build_sheet2(df_final, catalog)
+        s.rows_out = len(df_sheet2)
+    with track(tracker, 'Step 7 库存分析', rows_in=len(df_final)) as s:
+        df_sheet3 = build_sheet3(df_final)
+        s.rows_out = len(df_sheet3)
+    return df_final, df_sheet2, df_sheet3
+
+
+def compute_report(loaded, tracker=None):
+    """由已清洗的数据源计算三张表: (利润分析, 业务报表, 库存分析)。"""
+    with track(tracker, 'Step 2 销售表', rows_in=count_rows(loaded.sales)) as s:
+        sales_agg = aggregate_sales(loaded.sales)
+        s.rows_out = len(sales_agg)
+    with track(tracker, 'Step 3 广告表', rows_in=count_rows(loaded.ads)) as s:
+        ads_agg = aggregate_ads(loaded.ads)
+        s.rows_out = len(ads_agg)
+    with track(tracker, 'Step 4 库存表', rows_in=count_rows(loaded.rocket) + count_rows(loaded.jifeng)) as s:
+        inv_agg = aggregate_rocket(loaded.rocket)
+        inv_j_agg = aggregate_jifeng(loaded.jifeng)
+        s.rows_out = len(inv_agg) + len(inv_j_agg)
+    return report_from_aggregates(loaded.master, sales_agg, ads_agg, inv_agg, inv_j_agg, tracker=tracker)
+
+
+def build_report(inputs, cache=None):
+    """读取 + 计算, 返回 (df_final, df_sheet2, df_sheet3), 不做筛选。"""
+    return compute_report(load_inputs(inputs, cache))
+
+# --- Step 8: 筛选 ---
+def filter_report(df_final, df_sheet2, df_sheet3, filter_code):
+    # 单次筛选 (如命令行); 界面中应保留 ReportIndex 反复筛选
+    return ReportIndex(df_final, df_sheet2, df_sheet3).filter(filter_code)
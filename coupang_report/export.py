@@ -0,0 +1,190 @@
+import io
+import math
+
+import numpy as np
+import pandas as pd
+import xlsxwriter
+
+from .columns import IDX_M_CODE
+
+# ==========================================
+# Excel 导出 (格式精细化, 3个Sheet)
+# xlsxwriter constant_memory 流式写入: 逐行写一次, 写完的行立即落盘, 不在内存中保留整本工作簿
+# ==========================================
+SHEET_NAMES = ('利润分析', '业务报表', '库存分析')
+
+# Sheet2 中需要按百分比显示的列 (取第一个存在的)
+PCT_COL_CANDIDATES = ['广告费占比', '广告/毛利比']
+
+# 多店铺合并导出: 汇总表在前, 之后每个店铺三张表 (表名为 店铺_表名)
+MULTISHOP_SHEET_NAMES = ('汇总概览', '汇总_业务报表', '汇总_库存分析')
+
+# Excel 表名: 最长 31 个字符, 不能含 []:*?/\
+_SHEET_NAME_MAX = 31
+_SHEET_NAME_INVALID = str.maketrans({c: '_' for c in '[]:*?/\\'})
+
+
+def _zebra_flags(df, group_col_idx):
+    # 斑马纹: 编码 (去 .0 / 引号 / 空白, 转大写) 变化一次切换一次底色, 首行为白色
+    codes = df.iloc[:, group_col_idx].astype(str)
+    codes = codes.str.replace('.0', '', regex=False).str.replace('"', '', regex=False).str.strip().str.upper()
+    changed = (codes != codes.shift()).to_numpy(copy=True)
+    if len(changed):
+        changed[0] = False
+    return np.cumsum(changed) % 2 == 1
+
+
+def _column_style(col, fmt_int, fmt_pct):
+    # 列宽/列格式规则 (按列名关键字)
+    c_str = str(col)
+    if any(x in c_str for x in ['利润', '费用', '货值', '金额', '毛利', '销量', '库存', '数量', '标准', '待补']):
+        if '率' not in c_str and '比' not in c_str:
+            return 15, fmt_int
+    elif any(x in c_str for x in ['比', '率', '占比']):
+        return 12, fmt_pct
+    return 12, None
+
+
+def _column_values(series):
+    # 预先转为 Python 列表; 无缺失、无 inf 的数值列走快速路径直接 write_number
+    if pd.api.types.is_numeric_dtype(series.dtype) and not pd.api.types.is_bool_dtype(series.dtype):
+        values = series.to_numpy(dtype='float64', na_value=np.nan)
+        if np.isfinite(values).all():
+            return 'number', series.tolist()
+    return 'mixed', series.astype(object).where(series.notna(), None).tolist()
+
+
+def _write_value(ws, row, col, v, fmt):
+    # 与 to_excel 一致: 缺失值/空字符串留空, inf 写为文本
+    if v is None or v is pd.NA:
+        return
+    if isinstance(v, (bool, np.bool_)):
+        ws.write_boolean(row, col, bool(v), fmt)
+    elif isinstance(v, (int, float, np.integer, np.floating)):
+        if math.isnan(v):
+            return
+        if math.isinf(v):
+            ws.write_string(row, col, 'inf' if v > 0 else '-inf', fmt)
+        else:
+            ws.write_number(row, col, v, fmt)
+    elif isinstance(v, str):
+        if v:
+            ws.write_string(row, col, v, fmt)
+    else:
+        ws.write_string(row, col, str(v), fmt)
+
+
+def _write_sheet(ws, df, formats, pct_col=None, group_col=IDX_M_CODE):
+    fmt_header, fmt_int, fmt_pct, fmt_grey, fmt_white, fmt_grey_pct, fmt_white_pct = formats
+
+    # 表头 + 列宽/列格式
+    for i, col in enumerate(df.columns):
+        width, cell_fmt = _column_style(col, fmt_int, fmt_pct)
+        if cell_fmt:
+            ws.set_column(i, i, width, cell_fmt)
+        else:
+            ws.set_column(i, i, width)
+        ws.write(0, i, col, fmt_header)
+
+    pct_idx = df.columns.get_loc(pct_col) if pct_col is not None else -1
+    columns = [_column_values(df.iloc[:, i]) for i in range(df.shape[1])]
+    is_grey = _zebra_flags(df, group_col).tolist()
+
+    for r in range(len(df)):
+        row = r + 1
+        fmt = fmt_grey if is_grey[r] else fmt_white
+        # 整行底色 (含数据区以外的单元格), 必须在写该行单元格之前设置
+        ws.set_row(row, None, fmt)
+        for c, (kind, vals) in enumerate(columns):
+            v = vals[r]
+            if c == pct_idx:
+                # 百分比列用带底色的百分比格式, 避免被整行格式覆盖后显示成小数
+                cell_fmt = fmt_grey_pct if is_grey[r] else fmt_white_pct
+                try:
+                    ws.write_number(row, c, float(v), cell_fmt)
+                except (TypeError, ValueError):
+                    _write_value(ws, row, c, v, cell_fmt)
+            elif kind == 'number':
+                ws.write_number(row, c, v, fmt)
+            else:
+                _write_value(ws, row, c, v, fmt)
+
+
+def _add_formats(wb):
+    fmt_header = wb.add_format({'bold': True, 'bg_color': '#4472C4', 'font_color': 'white', 'border': 1, 'align': 'center'})
+
+    fmt_int = wb.add_format({'num_format': '#,##0', 'align': 'center'})
+    fmt_pct = wb.add_format({'num_format': '0.0%', 'align': 'center'})
+
+    # 斑马纹
+    base_font = {'font_name': 'Microsoft YaHei', 'bold': True, 'border': 1, 'align': 'center', 'valign': 'vcenter'}
+    fmt_grey = wb.add_format(dict(base_font, bg_color='#BFBFBF'))
+    fmt_white = wb.add_format(dict(base_font, bg_color='#FFFFFF'))
+    fmt_grey_pct = wb.add_format(dict(base_font, bg_color='#BFBFBF', num_format='0.0%'))
+    fmt_white_pct = wb.add_format(dict(base_font, bg_color='#FFFFFF', num_format='0.0%'))
+    return (fmt_header, fmt_int, fmt_pct, fmt_grey, fmt_white, fmt_grey_pct, fmt_white_pct)
+
+
+def _pct_col(df_sheet2):
+    return next((c for c in PCT_COL_CANDIDATES if c in df_sheet2.columns), None)
+
+
+def _write_report_sheets(wb, formats, frames, names=SHEET_NAMES, used=None):
+    df_final, df_sheet2, df_sheet3 = frames
+    pct_col = _pct_col(df_sheet2)
+    for name, df, sheet_pct_col in zip(names, (df_final, df_sheet2, df_sheet3), (None, pct_col, None)):
+        _write_sheet(wb.add_worksheet(name if used is None else sheet_name(name, used)), df, formats, sheet_pct_col)
+
+
+def write_report_xlsx(output, df_final, df_sheet2, df_sheet3):
+    """把三张表写入 output (路径或二进制文件对象)。"""
+    wb = xlsxwriter.Workbook(output, {'constant_memory': True})
+    try:
+        _write_report_sheets(wb, _add_formats(wb), (df_final, df_sheet2, df_sheet3))
+    finally:
+        wb.close()
+
+
+def sheet_name(name, used):
+    """合法且不重复 (不区分大小写) 的 Excel 表名, 并记入 used。"""
+    base = str(name).translate(_SHEET_NAME_INVALID).strip("'")[:_SHEET_NAME_MAX] or 'Sheet'
+    name, k = base, 2
+    while name.lower() in used:
+        suffix = f'_{k}'
+        name, k = base[:_SHEET_NAME_MAX - len(suffix)] + suffix, k + 1
+    used.add(name.lower())
+    return name
+
+
+def write_multishop_xlsx(output, shop_frames, consolidated):
+    """多店铺报表: 汇总概览 (KPI) + 汇总业务报表/库存分析, 之后每个店铺三张表。
+
+    shop_frames: [(店铺名, (利润分析, 业务报表, 库存分析)), ...]; consolidated 为 multishop.consolidate 的结果。
+    """
+    df_kpi, df_sheet2_all, df_sheet3_all = consolidated
+    wb = xlsxwriter.Workbook(output, {'constant_memory': True})
+    try:
+        formats = _add_formats(wb)
+        used = set()
+        # 概览按店铺切换斑马纹; 汇总表首列为店铺, 按其后的编码列切换
+        _write_sheet(wb.add_worksheet(sheet_name(MULTISHOP_SHEET_NAMES[0], used)), df_kpi, formats, group_col=0)
+        _write_sheet(wb.add_worksheet(sheet_name(MULTISHOP_SHEET_NAMES[1], used)), df_sheet2_all, formats,
+                     _pct_col(df_sheet2_all), group_col=IDX_M_CODE + 1)
+        _write_sheet(wb.add_worksheet(sheet_name(MULTISHOP_SHEET_NAMES[2], used)), df_sheet3_all, formats,
+                     group_col=IDX_M_CODE + 1)
+        for shop, frames in shop_frames:
+            _write_report_sheets(wb, formats, frames, [f'{shop}_{name}' for name in SHEET_NAMES], used)
+    finally:
+        wb.close()
+
+
+def report_to_bytes(df_final, df_sheet2, df_sheet3):
+    output = io.BytesIO()
+    write_report_xlsx(output, df_final, df_sheet2, df_sheet3)
+    return output.getvalue()
+
+
+def multishop_to_bytes(shop_frames, consolidated):
+    output = io.BytesIO()
+    write_multishop_xlsx(output, shop_frames, consolidated)
+    return output.getvalue()
@@ -0,0 +1,178 @@
+import datetime
+import hashlib
+import sqlite3
+import threading
+
+import pandas as pd
+
+from .engine import aggregate_ads, aggregate_jifeng, aggregate_rocket, aggregate_sales
+from .ingest import ingest_files
+
+# ==========================================
+# 历史数据库 (SQLite): 每个文件只解析入库一次, 按周期保存预聚合结果
+# ==========================================
+DEFAULT_HISTORY_PATH = 'coupang_history.sqlite3'
+
+# 可入库的数据源 (Master 不入库, 每次以当前上传为准)
+HISTORY_KINDS = ('sales', 'ads', 'rocket', 'jifeng')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    digest      TEXT NOT NULL,
+    kind        TEXT NOT NULL,
+    name        TEXT,
+    period      TEXT NOT NULL,      -- 周期起始日 YYYY-MM-DD
+    rows        INTEGER,
+    ingested_at TEXT,
+    PRIMARY KEY (digest, kind)
+);
+CREATE INDEX IF NOT EXISTS idx_files_kind_period ON files (kind, period);
+
+-- 单个文件按匹配键聚合后的结果: sales/rocket/jifeng 只用 qty, ads 的 amount 为含税广告费
+CREATE TABLE IF NOT EXISTS aggregates (
+    digest TEXT NOT NULL,
+    kind   TEXT NOT NULL,
+    key    TEXT,
+    qty    REAL,
+    amount REAL
+);
+CREATE INDEX IF NOT EXISTS idx_aggregates_file ON aggregates (digest, kind);
+"""
+
+
+def _period_str(period):
+    if isinstance(period, (datetime.date, datetime.datetime)):
+        return period.strftime('%Y-%m-%d')
+    return str(period)
+
+
+def _file_aggregate(kind, df):
+    # 复用报表引擎的聚合, 统一为 (key, qty, amount)
+    if kind == 'sales':
+        agg = aggregate_sales([df])
+        return pd.DataFrame({'key': agg['_MATCH_SKU'], 'qty': agg['SKU销量'], 'amount': 0.0})
+    if kind == 'ads':
+        agg = aggregate_ads([df])
+        return pd.DataFrame({'key': agg['_MATCH_CODE'], 'qty': agg['产品广告销量'], 'amount': agg['R列_产品总广告费']})
+    if kind == 'rocket':
+        agg = aggregate_rocket([df])
+        return pd.DataFrame({'key': agg['_MATCH_SKU'], 'qty': agg['火箭仓库存'], 'amount': 0.0})
+    if kind == 'jifeng':
+        agg = aggregate_jifeng([df])
+        return pd.DataFrame({'key': agg['_MATCH_BAR'], 'qty': agg['极风库存'], 'amount': 0.0})
+    raise ValueError(f'不支持入库的数据类型: {kind}')
+
+
+class HistoryStore:
+    """销售/广告/库存的历史聚合库。线程安全, 可被多个 Streamlit 会话共用。"""
+
+    def __init__(self, path=DEFAULT_HISTORY_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def has_file(self, digest, kind):
+        with self._lock:
+            row = self._conn.execute('SELECT 1 FROM files WHERE digest = ? AND kind = ?', (digest, kind)).fetchone()
+        return row is not None
+
+    def add_frame(self, digest, kind, name, period, df):
+        """写入一个已清洗文件的聚合结果; 同内容文件已存在时跳过, 返回是否新增。"""
+        agg = _file_aggregate(kind, df)
+        rows = [(digest, kind, None if pd.isna(k) else str(k), float(q), float(a))
+                for k, q, a in zip(agg['key'], agg['qty'], agg['amount'])]
+        now = datetime.datetime.now().isoformat(timespec='seconds')
+        with self._lock, self._conn:
+            cur = self._conn.execute(
+                'INSERT OR IGNORE INTO files (digest, kind, name, period, rows, ingested_at) VALUES (?, ?, ?, ?, ?, ?)',
+                (digest, kind, name, _period_str(period), len(df), now),
+            )
+            if cur.rowcount == 0:
+                return False
+            self._conn.executemany('INSERT INTO aggregates (digest, kind, key, qty, amount) VALUES (?, ?, ?, ?, ?)', rows)
+        return True
+
+    def add_loaded(self, loaded, timings, period):
+        """把 ingest_inputs 的结果 (已解析的数据帧) 入库, 不再重复解析。返回每个文件的入库状态。"""
+        frames = [loaded.master] + loaded.sales + loaded.ads + loaded.rocket + loaded.jifeng
+        results = []
+        for df, t in zip(frames, timings):
+            if t['kind'] not in HISTORY_KINDS:
+                continue
+            added = self.add_frame(t['digest'], t['kind'], t['name'], period, df)
+            results.append({'kind': t['kind'], 'name': t['name'], 'added': added})
+        return results
+
+    def ingest(self, jobs, period, cache=None, max_workers=None):
+        """[(kind, file), ...] 入库: 只解析库中没有的文件。返回每个文件的入库状态。"""
+        results = []
+        new_jobs = []
+        for kind, file in jobs:
+            file.seek(0)
+            data = file.getvalue() if hasattr(file, 'getvalue') else file.read()
+            file.seek(0)
+            digest = hashlib.sha1(data).hexdigest()
+            if self.has_file(digest, kind):
+                results.append({'kind': kind, 'name': file.name, 'added': False})
+            else:
+                new_jobs.append((kind, file))
+
+        frames, timings = ingest_files(new_jobs, cache=cache, max_workers=max_workers)
+        for df, t in zip(frames, timings):
+            added = self.add_frame(t['digest'], t['kind'], t['name'], period, df)
+            results.append({'kind': t['kind'], 'name': t['name'], 'added': added})
+        return results
+
+    def list_files(self):
+        with self._lock:
+            return pd.read_sql_query(
+                'SELECT kind, name, period, rows, ingested_at, digest FROM files ORDER BY period DESC, kind, name',
+                self._conn,
+            )
+
+    def _sum_range(self, kind, start, end):
+        sql = """
+            SELECT a.key AS key, SUM(a.qty) AS qty, SUM(a.amount) AS amount
+            FROM aggregates a JOIN files f ON f.digest = a.digest AND f.kind = a.kind
+            WHERE f.kind = ? AND f.period BETWEEN ? AND ? AND a.key IS NOT NULL
+            GROUP BY a.key
+        """
+        with self._lock:
+            return pd.read_sql_query(sql, self._conn, params=(kind, _period_str(start), _period_str(end)))
+
+    def _latest_snapshot(self, kind, start, end):
+        # 库存是时点数据, 不能跨周累加: 取区间内最近一个周期 (同周期多个文件相加)
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT MAX(period) FROM files WHERE kind = ? AND period BETWEEN ? AND ?',
+                (kind, _period_str(start), _period_str(end)),
+            ).fetchone()
+        if row[0] is None:
+            return pd.DataFrame(columns=['key', 'qty', 'amount'])
+        return self._sum_range(kind, row[0], row[0])
+
+    # --- 与报表引擎聚合结果同结构的查询 ---
+    def sales_agg(self, start, end):
+        df = self._sum_range('sales', start, end)
+        return pd.DataFrame({'_MATCH_SKU': df['key'], 'SKU销量': df['qty']})
+
+    def ads_agg(self, start, end):
+        df = self._sum_range('ads', start, end)
+        return pd.DataFrame({'_MATCH_CODE': df['key'], 'R列_产品总广告费': df['amount'], '产品广告销量': df['qty']})
+
+    def rocket_agg(self, start, end):
+        df = self._latest_snapshot('rocket', start, end)
+        return pd.DataFrame({'_MATCH_SKU': df['key'], '火箭仓库存': df['qty']})
+
+    def jifeng_agg(self, start, end):
+        df = self._latest_snapshot('jifeng', start, end)
+        return pd.DataFrame({'_MATCH_BAR': df['key'], '极风库存': df['qty']})
+
+    def report_aggregates(self, start, end):
+        """区间内的 (sales_agg, ads_agg, inv_agg, inv_j_agg), 可直接交给 report_from_aggregates。"""
+        return self.sales_agg(start, end), self.ads_agg(start, end), self.rocket_agg(start, end), self.jifeng_agg(start, end)
@@ -0,0 +1,192 @@
+import hashlib
+import io
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from .cleaning import SOURCE_PREPARERS
+from .engine import LoadedInputs
+from .instrumentation import track
+from .parse_cache import cache_key
+from .readers import read_source_info
+from .reference_cache import REFERENCE_KINDS
+
+# ==========================================
+# 并行读取 (进程池, xlsx 解析是 CPU 密集型, 线程受 GIL 限制)
+# ==========================================
+_pool = None
+_pool_lock = threading.Lock()
+
+# 进程池不可用: 子进程异常退出 (Broken), 或池已被关闭 (RuntimeError: cannot schedule new futures / 排队的任务被取消)
+POOL_ERRORS = (BrokenProcessPool, RuntimeError, CancelledError)
+
+
+def get_pool():
+    """进程级共享进程池 (os.cpu_count() 个子进程), 避免每次生成报表都重新启动子进程。
+
+    池建好后不会因为调用方要求的并行数不同而替换 (其他线程的任务可能正在用它),
+    每次调用的并行数由 pool_map 的 workers 限制。
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: Streamlit 服务端是多线程的, fork 可能复制到被占用的锁
+            _pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 1, mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+def discard_pool(pool):
+    """丢弃已损坏的进程池 (仍是当前共享池时), 下次 get_pool 重新创建; 已被替换的池不影响新池。"""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True)
+
+
+def pool_map(pool, fn, calls, workers):
+    """在进程池中执行 fn(*args), 同时最多 workers 个在跑, 按输入顺序逐个产出结果。
+
+    进程池不可用时抛出 POOL_ERRORS 中的异常, 已产出的结果仍有效。
+    """
+    calls = iter(calls)
+    running = deque(pool.submit(fn, *args) for _, args in zip(range(workers), calls))
+    while running:
+        result = running.popleft().result()
+        for args in calls:
+            running.append(pool.submit(fn, *args))
+            break
+        yield result
+
+
+def _read_bytes(file):
+    file.seek(0)
+    data = file.getvalue() if hasattr(file, 'getvalue') else file.read()
+    file.seek(0)
+    return data
+
+
+def _parse_bytes(kind, name, data):
+    # 子进程入口: 字节 -> 带文件名的内存文件 -> 探测格式/编码 + 读取 + 清洗 (按数据源裁剪列)
+    start = time.perf_counter()
+    buf = io.BytesIO(data)
+    buf.name = name
+    df, sniffed = read_source_info(buf, kind)
+    df = SOURCE_PREPARERS[kind](df)
+    return df, time.perf_counter() - start, sniffed
+
+
+def ingest_files(jobs, cache=None, max_workers=None, reference=None):
+    """并行读取 [(kind, file), ...], 按输入顺序返回 (数据帧列表, 每个文件的耗时记录)。
+
+    耗时记录含探测到的格式 (format) 和编码 (encoding); 命中缓存的文件未重新探测, 两者为 None。
+
+    给出 reference (ReferenceCache) 时, 基础表等参考数据走共享缓存 (不进解析缓存);
+    参考数据的 file 也可以是共享缓存中某个版本的内容 sha1 (str), 直接使用该版本,
+    已被移除时抛出 ValueError (不会换用其他会话最近使用的版本)。
+    """
+    frames = [None] * len(jobs)
+    timings = [None] * len(jobs)
+    pending = []
+
+    for i, (kind, file) in enumerate(jobs):
+        shared = reference is not None and kind in REFERENCE_KINDS
+        if file is None or isinstance(file, str):
+            found = reference.lookup(kind, file) if shared and file else None
+            if found is None:
+                raise ValueError(f'共享{kind}文件 ({(file or "")[:8]}) 已被移除或不可用, 请重新上传')
+            name, df = found
+            frames[i] = df
+            timings[i] = {'kind': kind, 'name': name, 'seconds': 0.0, 'rows': len(df), 'cached': True, 'digest': file, 'format': None, 'encoding': None}
+            continue
+
+        data = _read_bytes(file)
+        digest = hashlib.sha1(data).hexdigest()
+        key = cache_key(file, kind, digest)
+        if shared:
+            df = reference.get(kind, digest)
+        else:
+            df = cache.get(key) if cache is not None else None
+        if df is not None:
+            frames[i] = df.copy(deep=False)
+            timings[i] = {'kind': kind, 'name': file.name, 'seconds': 0.0, 'rows': len(df), 'cached': True, 'digest': digest, 'format': None, 'encoding': None}
+        else:
+            pending.append((i, kind, file.name, data, key))
+
+    def _store(i, kind, name, key, df, seconds, sniffed):
+        if reference is not None and kind in REFERENCE_KINDS:
+            reference.put(kind, name, key[0], df)
+            frames[i] = df.copy(deep=False)
+        elif cache is not None:
+            cache.put(key, df)
+            frames[i] = df.copy(deep=False)
+        else:
+            frames[i] = df
+        # key[0] 即文件内容的 sha1
+        timings[i] = {
+            'kind': kind, 'name': name, 'seconds': seconds, 'rows': len(df), 'cached': False, 'digest': key[0],
+            'format': sniffed.format, 'encoding': sniffed.encoding,
+        }
+
+    workers = min(len(pending), max_workers or os.cpu_count() or 1)
+    if workers > 1:
+        pool = get_pool()
+        try:
+            results = pool_map(pool, _parse_bytes, [(kind, name, data) for _, kind, name, data, _ in pending], workers)
+            for (i, kind, name, _, key), result in zip(pending, results):
+                _store(i, kind, name, key, *result)
+            pending = []
+        except POOL_ERRORS as e:
+            # 子进程异常退出 (如内存不足) 时丢弃进程池; 池不可用时剩余文件改为串行读取
+            if isinstance(e, BrokenProcessPool):
+                discard_pool(pool)
+            pending = [p for p in pending if frames[p[0]] is None]
+
+    for i, kind, name, data, key in pending:
+        _store(i, kind, name, key, *_parse_bytes(kind, name, data))
+
+    return frames, timings
+
+
+def ingest_inputs(inputs, cache=None, max_workers=None, tracker=None, reference=None):
+    """一次性并行读取全部上传文件, 返回 (LoadedInputs, 耗时记录列表)。
+
+    inputs.master 为 None 时使用 reference 中内容哈希为 inputs.master_digest 的共享基础表。
+    """
+    groups = [
+        ('master', [inputs.master if inputs.master is not None else inputs.master_digest]),
+        ('sales', list(inputs.sales)),
+        ('ads', list(inputs.ads)),
+        ('rocket', list(inputs.rocket or [])),
+        ('jifeng', list(inputs.jifeng or [])),
+    ]
+    jobs = [(kind, f) for kind, files in groups for f in files]
+    # Step 1 基础表与各数据源在同一批并行读取, 计为一个阶段 (rows_in 为文件数)
+    with track(tracker, 'Step 1 读取/清洗', rows_in=len(jobs)) as s:
+        frames, timings = ingest_files(jobs, cache=cache, max_workers=max_workers, reference=reference)
+        s.rows_out = sum(t['rows'] for t in timings)
+
+    by_kind = {kind: [] for kind, _ in groups}
+    for (kind, _), df in zip(jobs, frames):
+        by_kind[kind].append(df)
+
+    loaded = LoadedInputs(
+        master=by_kind['master'][0],
+        sales=by_kind['sales'],
+        ads=by_kind['ads'],
+        rocket=by_kind['rocket'],
+        jifeng=by_kind['jifeng'],
+    )
+    return loaded, timings
@@ -0,0 +1,266 @@
+import datetime
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+
+try:
+    import resource
+except ImportError:   # Windows
+    resource = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# ==========================================
+# 分阶段计时 / 内存 / 行数记录, 运行结果按 JSON Lines 追加到本地日志
+# ==========================================
+DEFAULT_RUN_LOG = 'coupang_runs.jsonl'
+# 日志超过该大小时轮转: 当前文件改名为 <path>.1 (覆盖上一份), 再从空文件开始追加
+MAX_RUN_LOG_BYTES = 16 * 1024 * 1024
+_TAIL_BLOCK = 64 * 1024
+
+_log_lock = threading.Lock()
+# tracemalloc 是进程级的, 同一时间只允许一个阶段使用
+_trace_lock = threading.Lock()
+
+
+def current_rss_mb():
+    """当前进程常驻内存 (MB); 无法获取时返回 None。"""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss / 1024 ** 2
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / 1024 ** 2
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def peak_rss_mb():
+    """进程启动以来的 RSS 高水位 (MB); Linux 单位为 KB, macOS 为字节。"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024
+
+
+def _round(v, digits=1):
+    return None if v is None else round(v, digits)
+
+
+def count_rows(obj):
+    """数据帧 / 数据帧列表的总行数。"""
+    if obj is None:
+        return None
+    if isinstance(obj, (list, tuple)):
+        return sum(len(df) for df in obj)
+    return len(obj)
+
+
+@dataclass
+class StageRecord:
+    """一个阶段的记录。status: running / ok / error / cancelled。"""
+    stage: str
+    status: str = 'running'
+    seconds: float = None
+    rows_in: int = None
+    rows_out: int = None
+    rss_mb: float = None          # 阶段结束时的常驻内存
+    rss_delta_mb: float = None    # 阶段内常驻内存变化
+    peak_rss_mb: float = None     # 进程 RSS 高水位
+    peak_mb: float = None         # tracemalloc 峰值 (开启时)
+    error: str = None
+
+
+class _NullStage:
+    rows_out = None
+
+
+@contextmanager
+def _null_stage():
+    yield _NullStage()
+
+
+def track(tracker, stage, rows_in=None):
+    """tracker 为 None 时不做记录, 便于在引擎中无条件使用。"""
+    if tracker is None:
+        return _null_stage()
+    return tracker.stage(stage, rows_in)
+
+
+class RunTracker:
+    """一次报表运行的分阶段记录。
+
+    on_stage(record) 在每个阶段开始和结束时调用 (界面据此实时刷新进度);
+    trace_memory 为 True 时用 tracemalloc 统计每个阶段的 Python 内存峰值 (会明显变慢)。
+    在子进程中完成的解析不计入本进程的内存统计。
+    """
+
+    def __init__(self, name='', trace_memory=False, on_stage=None, log_path=None):
+        self.run_id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.trace_memory = trace_memory
+        self.on_stage = on_stage
+        self.log_path = log_path
+        self.started_at = datetime.datetime.now().isoformat(timespec='seconds')
+        self.records = []
+        self.failed_stage = None
+        self.status = 'running'
+        self.extra = {}
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def _notify(self, record):
+        if self.on_stage is not None:
+            self.on_stage(record)
+
+    @contextmanager
+    def stage(self, stage, rows_in=None):
+        record = StageRecord(stage=stage, rows_in=rows_in)
+        with self._lock:
+            self.records.append(record)
+        self._notify(record)
+
+        traced = self.trace_memory and not tracemalloc.is_tracing() and _trace_lock.acquire(blocking=False)
+        if traced:
+            tracemalloc.start()
+        rss_before = current_rss_mb()
+        start = time.perf_counter()
+        try:
+            yield record
+        except Exception as e:
+            record.status = 'error'
+            record.error = f'{type(e).__name__}: {e}'
+            if self.failed_stage is None:
+                self.failed_stage = stage
+            raise
+        else:
+            record.status = 'ok'
+        finally:
+            record.seconds = round(time.perf_counter() - start, 4)
+            if traced:
+                record.peak_mb = _round(tracemalloc.get_traced_memory()[1] / 1024 ** 2)
+                tracemalloc.stop()
+                _trace_lock.release()
+            rss_after = current_rss_mb()
+            record.rss_mb = _round(rss_after)
+            if rss_before is not None and rss_after is not None:
+                record.rss_delta_mb = _round(rss_after - rss_before)
+            record.peak_rss_mb = _round(peak_rss_mb())
+            self._notify(record)
+
+    @property
+    def total_seconds(self):
+        return round(sum(r.seconds or 0 for r in self.records), 4)
+
+    def to_dict(self):
+        with self._lock:
+            stages = [asdict(r) for r in self.records]
+        return {
+            'run_id': self.run_id,
+            'name': self.name,
+            'started_at': self.started_at,
+            'status': self.status,
+            'failed_stage': self.failed_stage,
+            'seconds': self.total_seconds,
+            'wall_seconds': round(time.perf_counter() - self._start, 4),
+            'stages': stages,
+            **self.extra,
+        }
+
+    def finish(self, error=None, status=None):
+        """结束本次运行并写日志 (设置了 log_path 时), 返回日志记录。status 可指定 (如 cancelled)。"""
+        self.status = status or ('error' if error is not None or self.failed_stage else 'ok')
+        if error is not None:
+            self.extra['error'] = f'{type(error).__name__}: {error}'
+        entry = self.to_dict()
+        if self.log_path:
+            append_run_log(self.log_path, entry)
+        return entry
+
+
+def append_run_log(path, entry, max_bytes=MAX_RUN_LOG_BYTES):
+    line = json.dumps(entry, ensure_ascii=False, default=str)
+    with _log_lock:
+        if max_bytes and os.path.exists(path) and os.path.getsize(path) >= max_bytes:
+            os.replace(path, path + '.1')
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
+
+
+def _tail_lines(path, limit):
+    # 从文件末尾按块往前读, 凑够 limit 行即停 (不读整个文件)
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        data = b''
+        while pos > 0 and data.count(b'\n') <= limit:
+            step = min(_TAIL_BLOCK, pos)
+            pos -= step
+            f.seek(pos)
+            data = f.read(step) + data
+    lines = data.splitlines()
+    if pos > 0:
+        lines = lines[1:]   # 第一行可能只读到一半
+    return lines[-limit:]
+
+
+def _parse_lines(lines):
+    entries = []
+    for line in lines:
+        try:
+            entries.append(json.loads(line))
+        except ValueError:
+            continue
+    return entries
+
+
+def read_run_log(path, limit=None):
+    """读取日志 (最近的在后); 文件不存在时返回空列表, 跳过损坏的行。
+
+    给出 limit 时只从文件末尾读取最近 limit 行 (当前文件不够时再从轮转的 <path>.1 末尾补)。
+    """
+    paths = [p for p in (path + '.1', path) if os.path.exists(p)]
+    if not paths:
+        return []
+    with _log_lock:
+        if not limit:
+            lines = []
+            for p in paths:
+                with open(p, encoding='utf-8') as f:
+                    lines.extend(f)
+            return _parse_lines(lines)
+        entries = []
+        for p in reversed(paths):
+            entries = _parse_lines(_tail_lines(p, limit - len(entries))) + entries
+            if len(entries) >= limit:
+                break
+    return entries[-limit:]
+
+
+def tracked_call(fn, stage, parent=None, log_path=None, rows_in=None, trace_memory=False):
+    """单独记录一次调用 (如点击下载时才生成的 Excel): 写一条独立的日志, 阶段记录并入 parent。"""
+    tracker = RunTracker(name=parent.name if parent is not None else '', trace_memory=trace_memory, log_path=log_path)
+    if parent is not None:
+        tracker.extra['parent_run_id'] = parent.run_id
+    try:
+        with tracker.stage(stage, rows_in) as record:
+            result = fn()
+            record.rows_out = rows_in
+    except Exception as e:
+        tracker.finish(e)
+        raise
+    finally:
+        if parent is not None:
+            with parent._lock:
+                parent.records.extend(tracker.records)
+    tracker.finish()
+    return result
@@ -0,0 +1,202 @@
+import datetime
+import io
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# ==========================================
+# 后台报表任务队列 (进程级共享): 生成报表不再阻塞页面
+#   - 提交后立即返回任务 (job id), 界面轮询进度/结果
+#   - 相同请求 (相同文件内容 + 相同选项) 在运行中时合并为同一个任务
+#   - 取消为协作式: 在下一个阶段开始前生效 (解析子进程中的文件会读完)
+# ==========================================
+DEFAULT_MAX_WORKERS = 2
+DEFAULT_KEEP_FINISHED = 16
+
+FINISHED = ('done', 'error', 'cancelled')
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def snapshot_file(file):
+    """上传文件 -> 独立的内存文件 (带 name/size), 后台线程读取时不受页面重跑影响。"""
+    file.seek(0)
+    data = file.getvalue() if hasattr(file, 'getvalue') else file.read()
+    file.seek(0)
+    buf = io.BytesIO(data)
+    buf.name = file.name
+    buf.size = len(data)
+    return buf
+
+
+class ReportJob:
+    """一个后台任务。status: queued / running / done / error / cancelled; 完成后 result 为任务函数的返回值。"""
+
+    def __init__(self, key, tracker=None, expected_stages=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.key = key
+        self.tracker = tracker
+        self.expected_stages = list(expected_stages or [])
+        self.status = 'queued'
+        self.result = None
+        self.error = None
+        self.subscribers = set()
+        self.submitted_at = datetime.datetime.now()
+        self.started_at = None
+        self.finished_at = None
+        self._cancel = threading.Event()
+        self._future = None
+
+        if tracker is not None:
+            # 每个阶段开始时检查是否已取消
+            on_stage = tracker.on_stage
+
+            def _on_stage(record):
+                if record.status == 'running':
+                    self.check_cancelled()
+                if on_stage is not None:
+                    on_stage(record)
+
+            tracker.on_stage = _on_stage
+
+    @property
+    def finished(self):
+        return self.status in FINISHED
+
+    @property
+    def cancel_requested(self):
+        return self._cancel.is_set()
+
+    def check_cancelled(self):
+        if self._cancel.is_set():
+            raise JobCancelled('任务已取消')
+
+    def progress(self):
+        """(已完成阶段数, 预计阶段数); 未给出预计阶段时按已开始的阶段数计。"""
+        records = list(self.tracker.records) if self.tracker is not None else []
+        done = sum(r.status == 'ok' for r in records)
+        total = max(len(self.expected_stages), len(records), 1)
+        if self.status == 'done':
+            done = total
+        return done, total
+
+    def current_stage(self):
+        records = list(self.tracker.records) if self.tracker is not None else []
+        running = [r.stage for r in records if r.status == 'running']
+        return running[-1] if running else None
+
+
+class JobQueue:
+    """线程池执行报表任务 (CPU 密集的文件解析仍交给 ingest 的进程池)。线程安全, 可被多个会话共用。"""
+
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS, keep_finished=DEFAULT_KEEP_FINISHED):
+        self.max_workers = max_workers
+        self.keep_finished = keep_finished
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='report-job')
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self._inflight = {}
+        self.merged = 0
+
+    def submit(self, key, fn, subscriber=None, tracker=None, expected_stages=None):
+        """提交任务 fn(job) -> 结果; key 相同的任务仍在排队/运行时直接返回该任务 (合并)。"""
+        with self._lock:
+            job = self._inflight.get(key)
+            if job is not None and not job.cancel_requested:
+                job.subscribers.add(subscriber)
+                self.merged += 1
+                return job
+
+            job = ReportJob(key, tracker, expected_stages)
+            job.subscribers.add(subscriber)
+            self._jobs[job.id] = job
+            self._inflight[key] = job
+            job._future = self._executor.submit(self._run, job, fn)
+            return job
+
+    def _run(self, job, fn):
+        if job.cancel_requested:
+            self._finish(job, 'cancelled')
+            return
+        job.status = 'running'
+        job.started_at = datetime.datetime.now()
+        try:
+            result = fn(job)
+        except JobCancelled as e:
+            if job.tracker is not None:
+                for r in job.tracker.records:
+                    if r.status == 'running':
+                        r.status = 'cancelled'
+                job.tracker.finish(e, status='cancelled')
+            self._finish(job, 'cancelled')
+        except Exception as e:
+            job.error = e
+            if job.tracker is not None:
+                job.tracker.finish(e)
+            self._finish(job, 'error')
+        else:
+            job.result = result
+            if job.tracker is not None:
+                job.tracker.finish()
+            self._finish(job, 'done')
+
+    def _finish(self, job, status):
+        with self._lock:
+            job.status = status
+            job.finished_at = datetime.datetime.now()
+            if self._inflight.get(job.key) is job:
+                del self._inflight[job.key]
+            self._trim()
+
+    def _trim(self):
+        # 只保留最近若干个已完成的任务 (结果可能很大)
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id, subscriber=None):
+        """某个会话取消等待; 合并的任务在所有会话都取消后才真正取消。返回是否已请求取消。"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.finished:
+                return False
+            job.subscribers.discard(subscriber)
+            if job.subscribers:
+                return False
+            job._cancel.set()
+            # 仍在排队时直接撤销
+            if job._future is not None and job._future.cancel():
+                job.status = 'cancelled'
+                job.finished_at = datetime.datetime.now()
+                if self._inflight.get(job.key) is job:
+                    del self._inflight[job.key]
+            return True
+
+    def release(self, job_id, subscriber=None):
+        """会话已取走结果; 所有会话都取走后释放该任务 (及其结果)。"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job.subscribers.discard(subscriber)
+            if job.finished and not job.subscribers:
+                del self._jobs[job_id]
+
+    def stats(self):
+        with self._lock:
+            jobs = list(self._jobs.values())
+        counts = {status: 0 for status in ('queued', 'running') + FINISHED}
+        for job in jobs:
+            counts[job.status] += 1
+        counts['merged'] = self.merged
+        return counts
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
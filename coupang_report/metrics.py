@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+
+# ==========================================
+# 派生指标 (向量化, 结果与原逐行 apply 一致)
+# ==========================================
+
+def safe_ratio(numer, denom):
+    """numer / denom, 分母为 0 时取 0。"""
+    numer = np.asarray(numer, dtype='float64')
+    denom = np.asarray(denom, dtype='float64')
+    return np.divide(numer, denom, out=np.zeros(len(numer), dtype='float64'), where=denom != 0)
+
+
+def ad_profit_ratio(ad_cost, profit):
+    # 广告/毛利比 = 产品总广告费 / 产品总利润 (利润为 0 时记 0)
+    return pd.Series(safe_ratio(ad_cost, profit), index=ad_cost.index)
+
+
+def natural_sales_share(natural_qty, total_qty):
+    # 自然销量占比 = 自然销量 / 产品总销量 (总销量为 0 时记 0)
+    return pd.Series(safe_ratio(natural_qty, total_qty), index=natural_qty.index)
+
+
+def restock_qty(total_stock, safe_stock):
+    # 待补数量: 总库存低于安全库存时补足差额, 否则 0
+    return pd.Series(np.where(total_stock < safe_stock, safe_stock - total_stock, 0), index=total_stock.index)
+
+
+def dead_stock_value(total_stock, redundant_std, stock_value):
+    # 滞销库存货值: 总库存达到冗余标准 (且两者不同时为 0) 时计入库存货值
+    is_dead = (total_stock >= redundant_std) & ~((total_stock == 0) & (redundant_std == 0))
+    return pd.Series(np.where(is_dead, stock_value, 0.0), index=total_stock.index)
+
+
+# 经营概览 KPI: 名称 -> (表, 列), 各列直接求和
+REPORT_KPIS = {
+    '最终净利润': ('sheet2', 'S列_最终净利润'),
+    '总销售数量': ('sheet2', '产品总销量'),
+    '库存总货值': ('sheet3', '库存货值'),
+    '滞销资金占用': ('sheet3', '滞销库存货值'),
+    '建议补货量': ('sheet3', '待补数量'),
+}
+
+
+def report_kpis(df_sheet2, df_sheet3):
+    """业务报表/库存分析 -> {KPI 名称: 合计}。"""
+    sheets = {'sheet2': df_sheet2, 'sheet3': df_sheet3}
+    return {name: sheets[sheet][col].sum() for name, (sheet, col) in REPORT_KPIS.items()}
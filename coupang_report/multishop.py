@@ -0,0 +1,157 @@
+import io
+import os
+import time
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+from .engine import ReportInputs, compute_report
+from .ingest import POOL_ERRORS, discard_pool, get_pool, ingest_inputs, pool_map
+from .instrumentation import RunTracker, track
+from .metrics import REPORT_KPIS, report_kpis
+
+# ==========================================
+# 多店铺合并: 每个店铺一组文件, 各店铺的 Step 1~7 在独立子进程中并行
+#   - 总耗时接近最慢的单个店铺, 而不是各店铺之和
+#   - 汇总业务报表/库存分析 = 各店铺表上下拼接 (首列为店铺), KPI 按店铺汇总并给出合计
+# ==========================================
+SHOP_COLUMN = '店铺'
+TOTAL_LABEL = '合计'
+
+
+class ShopError(Exception):
+    """某个店铺计算失败 (子进程中的异常, 带店铺名和出错阶段)。"""
+
+    def __init__(self, shop, stage, message):
+        super().__init__(shop, stage, message)
+        self.shop = shop
+        self.stage = stage
+        self.message = message
+
+    def __str__(self):
+        stage = f' [{self.stage}]' if self.stage else ''
+        return f'{self.shop}{stage}: {self.message}'
+
+
+@dataclass
+class ShopReport:
+    """一个店铺的计算结果, frames 为未筛选的 (利润分析, 业务报表, 库存分析)。"""
+    name: str
+    frames: tuple
+    seconds: float
+    timings: list = field(default_factory=list)
+    stages: list = field(default_factory=list)
+
+
+def _pack(file):
+    # 文件对象 -> (文件名, 字节), 可传给子进程
+    file.seek(0)
+    data = file.getvalue() if hasattr(file, 'getvalue') else file.read()
+    file.seek(0)
+    return file.name, data
+
+
+def _unpack(packed):
+    name, data = packed
+    buf = io.BytesIO(data)
+    buf.name = name
+    buf.size = len(data)
+    return buf
+
+
+def _pack_inputs(inputs):
+    return {
+        'master': _pack(inputs.master),
+        'sales': [_pack(f) for f in inputs.sales],
+        'ads': [_pack(f) for f in inputs.ads],
+        'rocket': [_pack(f) for f in inputs.rocket or []],
+        'jifeng': [_pack(f) for f in inputs.jifeng or []],
+    }
+
+
+def _build_shop(name, packed, trace_memory=False):
+    # 子进程入口: 一个店铺的 Step 1~7; 店铺之间已按进程并行, 店内文件串行解析
+    start = time.perf_counter()
+    tracker = RunTracker(name=name, trace_memory=trace_memory)
+    inputs = ReportInputs(
+        master=_unpack(packed['master']),
+        sales=[_unpack(p) for p in packed['sales']],
+        ads=[_unpack(p) for p in packed['ads']],
+        rocket=[_unpack(p) for p in packed['rocket']],
+        jifeng=[_unpack(p) for p in packed['jifeng']],
+    )
+    try:
+        loaded, timings = ingest_inputs(inputs, max_workers=1, tracker=tracker)
+        frames = compute_report(loaded, tracker=tracker)
+    except Exception as e:
+        raise ShopError(name, tracker.failed_stage, f'{type(e).__name__}: {e}') from None
+    return ShopReport(name, frames, time.perf_counter() - start, timings, tracker.to_dict()['stages'])
+
+
+def unique_shop_names(names):
+    """店铺名去重 (空名按序号命名, 重名追加序号)。"""
+    seen = set()
+    out = []
+    for i, name in enumerate(names, 1):
+        base = str(name or '').strip() or f'店铺{i}'
+        name, k = base, 2
+        while name in seen:
+            name, k = f'{base}_{k}', k + 1
+        seen.add(name)
+        out.append(name)
+    return out
+
+
+def run_shops(shops, max_workers=None, tracker=None, trace_memory=False):
+    """并行计算多个店铺 [(店铺名, ReportInputs), ...], 按输入顺序返回 ShopReport 列表。
+
+    每个店铺一个子进程 (与文件解析共用进程池); max_workers=1 时在本进程串行计算。
+    任一店铺失败时抛出 ShopError。
+    """
+    packed = [(name, _pack_inputs(inputs)) for name, inputs in shops]
+    workers = min(len(packed), max_workers or os.cpu_count() or 1)
+    with track(tracker, 'Step 1~7 多店铺并行', rows_in=len(packed)) as s:
+        reports = []
+        if workers > 1:
+            pool = get_pool()
+            try:
+                for report in pool_map(pool, _build_shop, [(name, p, trace_memory) for name, p in packed], workers):
+                    reports.append(report)
+            except POOL_ERRORS as e:
+                # 子进程异常退出 (如内存不足) 时丢弃进程池; 池不可用时剩余店铺改为串行
+                if isinstance(e, BrokenProcessPool):
+                    discard_pool(pool)
+        reports += [_build_shop(name, p, trace_memory) for name, p in packed[len(reports):]]
+        s.rows_out = sum(len(r.frames[0]) for r in reports)
+
+    if tracker is not None:
+        tracker.extra['shops'] = [{'name': r.name, 'seconds': round(r.seconds, 4), 'stages': r.stages} for r in reports]
+    return reports
+
+
+def _stack(frames_by_shop):
+    # 各店铺基础表表头可能不同 (列位置相同): 按列位置对齐到第一个店铺的列名
+    columns = frames_by_shop[0][1].columns
+    parts = []
+    for name, df in frames_by_shop:
+        df = df.copy(deep=False)
+        if len(df.columns) == len(columns):
+            df.columns = columns
+        df.insert(0, SHOP_COLUMN, name)
+        parts.append(df)
+    return pd.concat(parts, ignore_index=True)
+
+
+def consolidate(shop_frames):
+    """[(店铺名, (利润分析, 业务报表, 库存分析)), ...] -> (KPI 汇总, 汇总业务报表, 汇总库存分析)。
+
+    KPI 汇总每个店铺一行, 末行为合计; 汇总表的首列为店铺。
+    """
+    kpi_rows = [{SHOP_COLUMN: name, **report_kpis(s2, s3)} for name, (_, s2, s3) in shop_frames]
+    kpi_rows.append({SHOP_COLUMN: TOTAL_LABEL, **{k: sum(row[k] for row in kpi_rows) for k in REPORT_KPIS}})
+    df_kpi = pd.DataFrame(kpi_rows, columns=[SHOP_COLUMN, *REPORT_KPIS])
+
+    df_sheet2 = _stack([(name, frames[1]) for name, frames in shop_frames])
+    df_sheet3 = _stack([(name, frames[2]) for name, frames in shop_frames])
+    return df_kpi, df_sheet2, df_sheet3
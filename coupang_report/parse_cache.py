@@ -0,0 +1,113 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+from .cleaning import SOURCE_PREPARERS
+from .readers import read_source
+
+# ==========================================
+# 解析缓存 (按文件内容哈希 + 读取设置, LRU 按内存上限淘汰)
+# ==========================================
+# 读取/清洗逻辑变化时递增, 使旧缓存自动失效
+READER_VERSION = 4
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024   # 512 MB
+DEFAULT_MAX_ENTRIES = 256
+
+
+def file_digest(file):
+    """返回上传文件内容的 sha1 (读取后指针复位到开头)。"""
+    file.seek(0)
+    if hasattr(file, 'getbuffer'):
+        digest = hashlib.sha1(file.getbuffer()).hexdigest()
+    else:
+        h = hashlib.sha1()
+        for chunk in iter(lambda: file.read(1024 * 1024), b''):
+            h.update(chunk)
+        digest = h.hexdigest()
+    file.seek(0)
+    return digest
+
+
+def frame_nbytes(df):
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+class ParseCache:
+    """已清洗数据帧的 LRU 缓存, 线程安全 (Streamlit 多会话共用一个进程)。"""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries = OrderedDict()   # key -> (df, nbytes)
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, df):
+        nbytes = frame_nbytes(df)
+        with self._lock:
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key)[1]
+            # 单个帧超过上限时不缓存, 避免把其他条目全部挤掉
+            if nbytes > self.max_bytes:
+                return
+            self._entries[key] = (df, nbytes)
+            self.current_bytes += nbytes
+            while self._entries and (self.current_bytes > self.max_bytes or len(self._entries) > self.max_entries):
+                _, (_, old_bytes) = self._entries.popitem(last=False)
+                self.current_bytes -= old_bytes
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+def cache_key(file, kind, digest=None):
+    # 格式/编码按文件内容探测, 与文件名无关: 同样的字节换个文件名也命中
+    return (digest or file_digest(file), kind, READER_VERSION)
+
+
+def load_source(file, kind, cache=None):
+    """读取并清洗单个文件; 命中缓存时直接返回缓存帧的浅拷贝。"""
+    prepare = SOURCE_PREPARERS[kind]
+    if cache is None:
+        return prepare(read_source(file, kind))
+
+    key = cache_key(file, kind)
+    df = cache.get(key)
+    if df is None:
+        df = prepare(read_source(file, kind))
+        cache.put(key, df)
+    # 浅拷贝: 调用方新增列不会污染缓存
+    return df.copy(deep=False)
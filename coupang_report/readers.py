@@ -0,0 +1,248 @@
+import codecs
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+
+from .cleaning import clean_num
+from .columns import (
+    IDX_S_ID, IDX_S_QTY,
+    IDX_A_CAMPAIGN, IDX_A_GROUP, IDX_A_SPEND, IDX_A_SALES,
+    IDX_I_R_ID, IDX_I_R_QTY,
+    IDX_I_J_BAR, IDX_I_J_QTY,
+)
+
+# ==========================================
+# 格式/编码探测 (按文件内容, 不看扩展名): 每个文件只解析一次
+#   - 开头为 zip 签名 -> xlsx/xlsm, 否则按文本 (CSV) 读取
+#   - 文本编码由开头一段字节判断: utf-8 / utf-8-sig / gbk / cp949 (韩文导出)
+# ==========================================
+ZIP_MAGIC = b'PK\x03\x04'
+OLE_MAGIC = b'\xd0\xcf\x11\xe0'   # 旧版 .xls
+SNIFF_BYTES = 64 * 1024
+
+# cp949 的韩文音节与 gbk 的常用汉字 (GB2312 一级字) 占用同一段字节, 两种解码往往都合法:
+#   gbk 解不开时才直接判为 cp949; 都能解开时, cp949 须以韩文音节为主,
+#   且常用韩文音节的占比高于 gbk 解码结果中常用汉字的占比
+HANGUL_MIN_RATIO = 0.5
+COMMON_HANZI = frozenset(
+    '的一是不了人在有这中大来上个到们为和地出也时年得就要下以生会自着去过家对可里后小么心多天能好都然没日于起还'
+    '发成事只作当想看文无开手用主行方又如前所本见经头面公同已从动两长知民样现分外但些与高意进把法此实回理点月明其'
+    '种全工己部正名定女问力机给等几很业最间新打位因重被走电第门相次东海口使西再平真世气信北少关并内加化由代产入先'
+    '山太水万市体别处总才场书比员性通目报立马命张活难数件安表原车白应路期常提金何更反合放做系计或司利受光王果界及'
+    '今务制解各任至清物台记边共风特直服林题建南度统色字请交让认算论百义科元术结功指思非流每管连远资带花快条变联言'
+    '权往展该传近留红治决周保达办运半候必城强步完区即求品转量空技轻程告语英基满式息写识极收钱未持取设始版双历越史'
+    '商片容像找站广改议形早音际则首单据导影失网似专石若校读观争究包组造落视离兴列号按价格款标库存销售费额订编码规'
+    '尺寸颜鞋衣装称备注男童袋杯盒套黑蓝灰粉绿'
+)
+COMMON_HANGUL = frozenset(
+    '이다는가의에하고을를지사서기한로도리자시대어정아나수으해인부거게그보스제주전만상오요일여소까내라마장비우들니적'
+    '원경구성세선용동면말방신무관물위공저히연분금실영할문개업계있없했것데터품명량판매광재출캠페룹바코드옵션격합배송'
+    '쿠팡켓태번호총액블랙화트남녀발운컵박'
+)
+
+
+@dataclass(frozen=True)
+class SniffResult:
+    """format: xlsx / csv; encoding 仅 csv 有。"""
+    format: str
+    encoding: str = None
+
+
+def _decode_prefix(data, encoding):
+    # 前缀可能截断在多字节字符中间: 增量解码 (final=False) 不把末尾的半个字符当错误
+    try:
+        return codecs.getincrementaldecoder(encoding)().decode(data, final=False)
+    except UnicodeDecodeError:
+        return None
+
+
+def _hangul_ratio(text):
+    chars = [c for c in text if ord(c) > 127 and not c.isspace()]
+    if not chars:
+        return 0.0
+    return sum('\uac00' <= c <= '\ud7a3' for c in chars) / len(chars)
+
+
+def _common_ratio(text, common):
+    chars = [c for c in text if ord(c) > 127 and not c.isspace()]
+    if not chars:
+        return 0.0
+    return sum(c in common for c in chars) / len(chars)
+
+
+def detect_encoding(sample):
+    """由一段字节判断文本编码 (utf-8-sig / utf-8 / cp949 / gbk), 都无法解码时抛出 ValueError。"""
+    if sample.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    if sample.isascii() or _decode_prefix(sample, 'utf-8') is not None:
+        return 'utf-8'
+    korean = _decode_prefix(sample, 'cp949')
+    chinese = _decode_prefix(sample, 'gbk')
+    if chinese is None:
+        if korean is None:
+            raise ValueError('无法识别文本编码 (支持 utf-8 / gbk / cp949)')
+        return 'cp949'
+    if (korean is not None and _hangul_ratio(korean) >= HANGUL_MIN_RATIO
+            and _common_ratio(korean, COMMON_HANGUL) > _common_ratio(chinese, COMMON_HANZI)):
+        return 'cp949'
+    return 'gbk'
+
+
+def sniff_file(file):
+    """按文件内容判断格式和编码 (读取后指针复位到开头)。"""
+    file.seek(0)
+    try:
+        sample = file.read(SNIFF_BYTES)
+        if sample.startswith(ZIP_MAGIC):
+            return SniffResult('xlsx')
+        if sample.startswith(OLE_MAGIC):
+            raise ValueError(f'{file.name}: 不支持旧版 Excel (.xls), 请另存为 .xlsx 或 .csv')
+        # 只看开头一段: 开头全是 ASCII 时按 utf-8, 后面出现解不开的字节由 _read_text 换备选编码重读
+        return SniffResult('csv', detect_encoding(sample))
+    finally:
+        file.seek(0)
+
+# 只探测了开头一段: 后面出现该编码解不开的字节时换用备选编码 (gbk/cp949 互为备选, utf-8 退回 gbk)
+ENCODING_FALLBACKS = {'utf-8': 'gbk', 'utf-8-sig': 'gbk', 'gbk': 'cp949', 'cp949': 'gbk'}
+
+
+def _read_text(file, sniffed, read):
+    """read(file, encoding) 读 CSV; 解码失败时用备选编码重读一次, 返回 (结果, 实际使用的 SniffResult)。"""
+    file.seek(0)
+    try:
+        return read(file, sniffed.encoding), sniffed
+    except UnicodeDecodeError:
+        fallback = ENCODING_FALLBACKS.get(sniffed.encoding)
+        if fallback is None:
+            raise
+        file.seek(0)
+        return read(file, fallback), SniffResult('csv', fallback)
+
+# ==========================================
+# 文件读取
+# ==========================================
+def _read_csv_full(file, encoding):
+    return pd.read_csv(file, dtype=str, encoding=encoding)
+
+
+def _read_full(file, sniffed):
+    if sniffed.format == 'csv':
+        return _read_text(file, sniffed, _read_csv_full)
+    file.seek(0)
+    return pd.read_excel(file, dtype=str, engine='openpyxl'), sniffed
+
+
+def read_file_strict(file):
+    """读取全部列 (按内容判断格式/编码, 只解析一次)。"""
+    return _read_full(file, sniff_file(file))[0]
+
+# ==========================================
+# 按数据源裁剪列的读取 (只读用到的列, 数量列读取时即转数值)
+# ==========================================
+
+@dataclass(frozen=True)
+class ReaderSpec:
+    """usecols 为 None 时读取全部列 (列名保持原表头);
+    否则只读取这些列号, 结果列名即原列号 (int), numeric 中的列直接转为数值。"""
+    usecols: tuple = None
+    numeric: tuple = ()
+
+
+READER_SPECS = {
+    'master': ReaderSpec(),   # Master 全部列都要展示
+    'sales': ReaderSpec(usecols=(IDX_S_ID, IDX_S_QTY), numeric=(IDX_S_QTY,)),
+    'ads': ReaderSpec(usecols=(IDX_A_CAMPAIGN, IDX_A_GROUP, IDX_A_SPEND, IDX_A_SALES), numeric=(IDX_A_SPEND, IDX_A_SALES)),
+    'rocket': ReaderSpec(usecols=(IDX_I_R_ID, IDX_I_R_QTY), numeric=(IDX_I_R_QTY,)),
+    'jifeng': ReaderSpec(usecols=(IDX_I_J_BAR, IDX_I_J_QTY), numeric=(IDX_I_J_QTY,)),
+}
+
+
+def _excel_cell(v):
+    # 与 pandas 的 openpyxl 读取一致: 整数值的浮点数按整数处理 (避免 "123.0")
+    if isinstance(v, float) and v.is_integer():
+        return int(v)
+    return v
+
+
+def _excel_number(v):
+    # 与 clean_num 一致: 文本去掉千分位逗号, 数字单元格原样交给 to_numeric
+    if isinstance(v, str):
+        return v.replace(',', '')
+    return _excel_cell(v)
+
+
+def _read_xlsx_columns(file, spec):
+    # 只读模式逐行流式读取, 只保留需要的列
+    wb = load_workbook(file, read_only=True, data_only=True)
+    try:
+        ws = wb.worksheets[0]
+        # 只读模式默认信任表内记录的 <dimension> 范围, 不少导出工具写错/没更新, 会少读行 (pandas 也这样处理)
+        ws.reset_dimensions()
+        rows = ws.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            raise ValueError('空工作表')
+        width = len(header)
+        for idx in spec.usecols:
+            if idx >= width:
+                raise IndexError(f'第 {idx + 1} 列不存在 (共 {width} 列)')
+
+        converters = [(idx, _excel_number if idx in spec.numeric else _excel_cell) for idx in spec.usecols]
+        values = {idx: [] for idx in spec.usecols}
+        n_rows = 0
+        n_kept = 0
+        for row in rows:
+            n_rows += 1
+            n = len(row)
+            for idx, convert in converters:
+                values[idx].append(convert(row[idx]) if idx < n else None)
+            if any(v is not None for v in row):
+                n_kept = n_rows
+    finally:
+        wb.close()
+
+    # 与 read_excel 一致: 去掉末尾的空行
+    columns = {}
+    for idx in spec.usecols:
+        vals = values[idx][:n_kept]
+        if idx in spec.numeric:
+            columns[idx] = pd.to_numeric(pd.Series(vals, dtype=object), errors='coerce').fillna(0)
+        else:
+            # 与 read_excel(dtype=str) 一致: 缺失保持 NaN, 其余转为字符串
+            columns[idx] = pd.Series([np.nan if v is None else str(v) for v in vals], dtype=object)
+    return columns
+
+
+def _read_csv_columns(file, spec, encoding=None):
+    df = pd.read_csv(file, dtype=str, usecols=list(spec.usecols), encoding=encoding)
+    # usecols 返回的列按文件中的顺序排列
+    columns = {}
+    for pos, idx in enumerate(sorted(spec.usecols)):
+        col = df.iloc[:, pos].reset_index(drop=True)
+        columns[idx] = clean_num(col) if idx in spec.numeric else col
+    return columns
+
+
+def read_source_info(file, kind):
+    """按数据源的 ReaderSpec 读取文件, 返回 (数据帧, SniffResult)。
+
+    格式/编码先由内容判断, 再只用对应的解析器读一次 (不再失败后整份按 gbk CSV 重读);
+    仅当 CSV 在探测范围之后出现解不开的字节时, 换备选编码重读, 返回的 SniffResult 为实际使用的编码。
+    """
+    spec = READER_SPECS[kind]
+    sniffed = sniff_file(file)
+    if spec.usecols is None:
+        return _read_full(file, sniffed)
+
+    if sniffed.format == 'csv':
+        columns, sniffed = _read_text(file, sniffed, lambda f, encoding: _read_csv_columns(f, spec, encoding=encoding))
+    else:
+        file.seek(0)
+        columns = _read_xlsx_columns(file, spec)
+    return pd.DataFrame({idx: columns[idx] for idx in spec.usecols}), sniffed
+
+
+def read_source(file, kind):
+    return read_source_info(file, kind)[0]
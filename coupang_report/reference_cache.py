@@ -0,0 +1,129 @@
+import datetime
+import threading
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+from .parse_cache import READER_VERSION, frame_nbytes
+
+# ==========================================
+# 参考数据共享缓存 (进程级, 所有会话共用)
+#   - 基础表 (Master) 很少变化: 按内容哈希常驻, 不参与解析缓存的 LRU 淘汰
+#   - 记录每类最近一次载入的文件, 其他会话不上传也可直接使用
+#   - 可查看占用内存, 手动移除单个文件或整体失效
+# ==========================================
+REFERENCE_KINDS = ('master',)
+
+# 每类保留的版本数 (最近一次载入的版本始终保留)
+DEFAULT_MAX_PER_KIND = 4
+
+
+@dataclass
+class ReferenceEntry:
+    kind: str
+    name: str
+    digest: str
+    df: pd.DataFrame = field(repr=False)
+    nbytes: int
+    loaded_at: datetime.datetime
+    last_used: datetime.datetime
+    hits: int = 0
+
+
+class ReferenceCache:
+    """已清洗参考数据帧的缓存, 键为 (类型, 内容 sha1, 读取版本)。线程安全。"""
+
+    def __init__(self, max_per_kind=DEFAULT_MAX_PER_KIND):
+        self.max_per_kind = max_per_kind
+        self._entries = {}
+        self._latest = {}
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    @staticmethod
+    def _key(kind, digest):
+        return (kind, digest, READER_VERSION)
+
+    def get(self, kind, digest):
+        """命中时返回缓存帧的浅拷贝 (调用方新增列不会污染缓存), 否则返回 None。"""
+        found = self.lookup(kind, digest)
+        return found[1] if found else None
+
+    def lookup(self, kind, digest):
+        """同 get, 命中时返回 (文件名, 数据帧浅拷贝), 两者取自同一次加锁读取。"""
+        with self._lock:
+            entry = self._entries.get(self._key(kind, digest))
+            if entry is None:
+                return None
+            entry.hits += 1
+            entry.last_used = datetime.datetime.now()
+            self._latest[kind] = entry.digest
+            return entry.name, entry.df.copy(deep=False)
+
+    def put(self, kind, name, digest, df):
+        now = datetime.datetime.now()
+        entry = ReferenceEntry(kind, name, digest, df, frame_nbytes(df), now, now)
+        with self._lock:
+            self._entries[self._key(kind, digest)] = entry
+            self._latest[kind] = digest
+            self._trim(kind)
+        return entry
+
+    def _trim(self, kind):
+        entries = sorted(
+            (e for e in self._entries.values() if e.kind == kind and e.digest != self._latest.get(kind)),
+            key=lambda e: e.last_used,
+        )
+        for e in entries[:max(0, len(entries) + 1 - self.max_per_kind)]:
+            del self._entries[self._key(kind, e.digest)]
+            self.evictions += 1
+
+    def latest(self, kind='master'):
+        """该类最近一次载入/使用的条目 (无则 None)。"""
+        with self._lock:
+            digest = self._latest.get(kind)
+            return self._entries.get(self._key(kind, digest)) if digest else None
+
+    def evict(self, kind, digest):
+        """移除单个文件; 移除的是最近版本时, 改由剩余版本中最近使用的一个接替。"""
+        with self._lock:
+            if self._entries.pop(self._key(kind, digest), None) is None:
+                return False
+            self.evictions += 1
+            if self._latest.get(kind) == digest:
+                rest = [e for e in self._entries.values() if e.kind == kind]
+                if rest:
+                    self._latest[kind] = max(rest, key=lambda e: e.last_used).digest
+                else:
+                    del self._latest[kind]
+            return True
+
+    def invalidate(self, kind=None):
+        """清空全部 (或某一类) 参考数据, 之后需重新上传。"""
+        with self._lock:
+            for key in [k for k in self._entries if kind is None or k[0] == kind]:
+                del self._entries[key]
+                self.evictions += 1
+            for k in [k for k in self._latest if kind is None or k == kind]:
+                del self._latest[k]
+
+    def entries(self):
+        with self._lock:
+            entries = sorted(self._entries.values(), key=lambda e: e.loaded_at, reverse=True)
+            latest = dict(self._latest)
+        return [{
+            'kind': e.kind, 'name': e.name, 'digest': e.digest, 'rows': len(e.df), 'bytes': e.nbytes,
+            'loaded_at': e.loaded_at, 'last_used': e.last_used, 'hits': e.hits,
+            'latest': latest.get(e.kind) == e.digest,
+        } for e in entries]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': sum(e.nbytes for e in self._entries.values()),
+                'evictions': self.evictions,
+            }
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+
+from .table_render import inventory_style_plan, visual_style_plan
+
+# ==========================================
+# 产品编号索引 (未筛选报表常驻, 筛选只做切片)
+# ==========================================
+class ReportIndex:
+    """持有一次生成的三张表, 按 _MATCH_CODE 建索引。
+
+    筛选时只在去重后的编码上做一次向量化子串匹配 (编码数远少于行数),
+    再按每行的编码 id 取命中的行号切片, 不再对整表做字符串匹配; 索引只多占两个整数数组。
+
+    with_styles=True 时同时为三张表算好看板样式 (斑马纹分组、高亮), 筛选时按同样的行号取子集。
+    """
+
+    def __init__(self, df_final, df_sheet2, df_sheet3, with_styles=False):
+        self.df_final = df_final
+        self.df_sheet2 = df_sheet2
+        self.df_sheet3 = df_sheet3
+
+        row_ids, uniques = pd.factorize(df_final['_MATCH_CODE'], sort=False)
+        self.codes = pd.Series(uniques).astype('str')
+
+        # Sheet1/Sheet3 行一一对应; Sheet2 保留了 df_final 的行标签, 借此取编码 (缺失为 -1)
+        self._final_ids = row_ids
+        s2_rows = df_final.index.get_indexer(df_sheet2.index)
+        self._s2_ids = np.where(s2_rows >= 0, row_ids[s2_rows], -1)
+
+        self.style_plans = None
+        if with_styles:
+            self.style_plans = (visual_style_plan(df_final), visual_style_plan(df_sheet2), inventory_style_plan(df_sheet3))
+
+    def match_codes(self, query):
+        """返回包含 query (大写字面子串) 的编码 id, 升序。"""
+        query = query.strip().upper()
+        return np.flatnonzero(self.codes.str.contains(query, regex=False).to_numpy(dtype=bool))
+
+    def _positions(self, ids, row_ids):
+        # 命中标记末尾多留一位给缺失编码 (-1), 恒为 False
+        hit = np.zeros(len(self.codes) + 1, dtype=bool)
+        hit[ids] = True
+        return np.flatnonzero(hit[row_ids])
+
+    def filter(self, filter_code):
+        """按产品编号筛选, 返回 (df_final, df_sheet2, df_sheet3); 为空时返回全表。"""
+        return self.select(filter_code)[0]
+
+    def select(self, filter_code):
+        """同 filter, 另返回三张表筛选结果对应的 StylePlan (未建样式时为 None)。"""
+        frames = (self.df_final, self.df_sheet2, self.df_sheet3)
+        if not filter_code:
+            return frames, self.style_plans
+        ids = self.match_codes(filter_code)
+        rows = self._positions(ids, self._final_ids)
+        rows_s2 = self._positions(ids, self._s2_ids)
+        frames = (self.df_final.iloc[rows], self.df_sheet2.iloc[rows_s2], self.df_sheet3.iloc[rows])
+        plans = None
+        if self.style_plans is not None:
+            plan_final, plan_sheet2, plan_sheet3 = self.style_plans
+            plans = (plan_final.take(rows), plan_sheet2.take(rows_s2), plan_sheet3.take(rows))
+        return frames, plans
@@ -0,0 +1,161 @@
+import datetime
+import json
+import os
+import shutil
+import threading
+
+import numpy as np
+import pandas as pd
+
+from .columns import IDX_M_CODE
+
+# ==========================================
+# 报表快照 (按周期保存业务报表/库存分析, Parquet 列式存储) + 周环比
+#   - 每次生成的报表存一份快照, 对比上周时直接读快照, 不再解析上周的原始 Excel
+#   - 环比按产品编码 (_MATCH_CODE) 关联本期与上期, 只读取需要的列
+# ==========================================
+DEFAULT_SNAPSHOT_DIR = 'coupang_snapshots'
+SNAPSHOT_VERSION = 1
+
+CODE_COLUMN = '_MATCH_CODE'
+_SHEETS = ('sheet2', 'sheet3')
+_META_FILE = 'meta.json'
+
+# 环比指标: 名称 -> (表, 列, 可加); 可加指标按编码合计, 一侧缺失时按 0 计算变化
+DELTA_METRICS = {
+    '最终净利润': ('sheet2', 'S列_最终净利润', True),
+    '广告/毛利比': ('sheet2', '广告/毛利比', False),
+    '自然销量占比': ('sheet2', '自然销量占比', False),
+    '总库存': ('sheet2', '总库存', True),
+    '待补数量': ('sheet3', '待补数量', True),
+}
+DELTA_STATUS_NEW = '本期新增'
+DELTA_STATUS_GONE = '本期无'
+
+
+def snapshot_frames(df_final, df_sheet2, df_sheet3):
+    """业务报表/库存分析各加一列产品编码 (_MATCH_CODE, 取自 df_final 的同一行), 作为快照内容。"""
+    codes = df_final[CODE_COLUMN]
+    sheet2 = df_sheet2.assign(**{CODE_COLUMN: codes.reindex(df_sheet2.index).to_numpy()})
+    sheet3 = df_sheet3.assign(**{CODE_COLUMN: codes.reindex(df_sheet3.index).to_numpy()})
+    return sheet2, sheet3
+
+
+class SnapshotStore:
+    """快照目录: <root>/<周期 YYYY-MM-DD>/{sheet2,sheet3}.parquet + meta.json。线程安全。"""
+
+    def __init__(self, root=DEFAULT_SNAPSHOT_DIR):
+        self.root = root
+        self._lock = threading.Lock()
+
+    def _dir(self, period):
+        return os.path.join(self.root, _period(period).isoformat())
+
+    def save(self, period, df_final, df_sheet2, df_sheet3, name=None):
+        """保存 (覆盖) 该周期的快照, 返回快照目录。"""
+        sheet2, sheet3 = snapshot_frames(df_final, df_sheet2, df_sheet3)
+        path = self._dir(period)
+        meta = {
+            'version': SNAPSHOT_VERSION, 'period': _period(period).isoformat(), 'name': name,
+            'saved_at': datetime.datetime.now().isoformat(timespec='seconds'),
+            'rows': {'sheet2': len(sheet2), 'sheet3': len(sheet3)},
+        }
+        with self._lock:
+            os.makedirs(path, exist_ok=True)
+            # 先写临时文件再替换, 读取方不会读到写了一半的文件; meta.json 最后写, 有它才算完整快照
+            for sheet, df in zip(_SHEETS, (sheet2, sheet3)):
+                target = os.path.join(path, f'{sheet}.parquet')
+                df.reset_index(drop=True).to_parquet(target + '.tmp', index=False)
+                os.replace(target + '.tmp', target)
+            with open(os.path.join(path, _META_FILE + '.tmp'), 'w', encoding='utf-8') as f:
+                json.dump(meta, f, ensure_ascii=False)
+            os.replace(os.path.join(path, _META_FILE + '.tmp'), os.path.join(path, _META_FILE))
+        return path
+
+    def periods(self):
+        """已保存快照的周期, 升序。"""
+        if not os.path.isdir(self.root):
+            return []
+        out = []
+        for entry in os.listdir(self.root):
+            try:
+                period = datetime.date.fromisoformat(entry)
+            except ValueError:
+                continue
+            if os.path.exists(os.path.join(self.root, entry, _META_FILE)):
+                out.append(period)
+        return sorted(out)
+
+    def meta(self, period):
+        with open(os.path.join(self._dir(period), _META_FILE), encoding='utf-8') as f:
+            return json.load(f)
+
+    def previous(self, period):
+        """period 之前最近的快照周期 (无则 None)。"""
+        earlier = [p for p in self.periods() if p < _period(period)]
+        return earlier[-1] if earlier else None
+
+    def load(self, period, sheet, columns=None):
+        """读取快照中的一张表 (sheet2 / sheet3); columns 只读指定列 (含编码列)。"""
+        if columns is not None:
+            columns = list(dict.fromkeys([CODE_COLUMN, *columns]))
+        return pd.read_parquet(os.path.join(self._dir(period), f'{sheet}.parquet'), columns=columns)
+
+    def load_delta_basis(self, period):
+        """环比所需的列: (业务报表: 产品编号 + 指标列, 库存分析: 指标列)。"""
+        sheet2 = self.load(period, 'sheet2')
+        sheet2 = sheet2[[sheet2.columns[IDX_M_CODE], CODE_COLUMN, *_metric_columns('sheet2')]]
+        sheet3 = self.load(period, 'sheet3', columns=_metric_columns('sheet3'))
+        return sheet2, sheet3
+
+    def delete(self, period):
+        with self._lock:
+            shutil.rmtree(self._dir(period), ignore_errors=True)
+
+
+def _period(period):
+    return period if isinstance(period, datetime.date) else datetime.date.fromisoformat(str(period))
+
+
+def _metric_columns(sheet):
+    return [col for s, col, _ in DELTA_METRICS.values() if s == sheet]
+
+
+def product_metrics(sheet2, sheet3):
+    """按产品编码的环比指标: 业务报表取该产品的行, 库存分析的指标按编码合计。索引为编码。"""
+    sheet2 = sheet2.dropna(subset=[CODE_COLUMN]).drop_duplicates(CODE_COLUMN)
+    out = pd.DataFrame({'产品编号': sheet2[sheet2.columns[IDX_M_CODE]].to_numpy()}, index=pd.Index(sheet2[CODE_COLUMN].astype(str), name=CODE_COLUMN))
+    for name, (sheet, col, _) in DELTA_METRICS.items():
+        if sheet == 'sheet2':
+            out[name] = sheet2[col].to_numpy()
+        else:
+            sums = sheet3.groupby(sheet3[CODE_COLUMN].astype(str), sort=False)[col].sum()
+            out[name] = sums.reindex(out.index).to_numpy()
+    return out
+
+
+def delta_report(current, prior):
+    """本期/上期 (sheet2, sheet3) -> 环比表: 每个指标 本期/上期/变化 三列, 按净利润变化绝对值降序。
+
+    只在一侧出现的产品标记状态; 可加指标缺失的一侧按 0 计, 比率指标缺失时变化为空。
+    """
+    cur = product_metrics(*current)
+    pre = product_metrics(*prior)
+    codes = cur.index.union(pre.index, sort=False)
+    cur_rows = cur.reindex(codes)
+    pre_rows = pre.reindex(codes)
+
+    in_cur = codes.isin(cur.index)
+    in_pre = codes.isin(pre.index)
+    out = pd.DataFrame(index=codes)
+    out['产品编号'] = cur_rows['产品编号'].where(in_cur, pre_rows['产品编号'])
+    out['状态'] = np.select([~in_pre, ~in_cur], [DELTA_STATUS_NEW, DELTA_STATUS_GONE], '')
+    for name, (_, _, additive) in DELTA_METRICS.items():
+        now, before = cur_rows[name], pre_rows[name]
+        if additive:
+            now, before = now.fillna(0), before.fillna(0)
+        out[f'{name}(本期)'] = now
+        out[f'{name}(上期)'] = before
+        out[f'{name}变化'] = now - before
+    order = out['最终净利润变化'].abs().sort_values(ascending=False, kind='stable').index
+    return out.loc[order]
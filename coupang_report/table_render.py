@@ -0,0 +1,181 @@
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+# ==========================================
+# 看板表格渲染: 斑马纹/高亮在报表生成时对整表向量化算一次, 筛选后按行号取子集;
+# 渐变色只依赖单元格的值, 翻页时只为当前页计算, 再交给 Styler
+# (不再对整表逐行 apply, 每次交互的渲染耗时只与每页行数有关)
+# ==========================================
+PAGE_SIZE = 500
+
+ZEBRA_CSS = 'background-color: #f0f2f6'
+
+CSS_RESTOCK = 'background-color: #fff3cd; color: #e65100; font-weight: bold;'
+CSS_DEAD_STOCK = 'color: #880e4f; font-weight: bold;'
+CSS_STOCK_LOW = 'background-color: #ffcccc; color: #cc0000; font-weight: bold;'
+CSS_STOCK_HIGH = 'background-color: #e1bee7; color: #4a148c; font-weight: bold;'
+
+# 库存分析表的条形图列 -> 颜色 (用 column_config 进度条代替 Styler.bar)
+INVENTORY_BARS = {'总库存': '#800080', '库存货值': '#2ca02c', '滞销库存货值': '#880e4f'}
+
+
+# 定义格式：安全函数 (修复 Unknown format code '%' error)
+def safe_pct(x):
+    try:
+        # 尝试转浮点再格式化
+        return "{:.1%}".format(float(x))
+    except:
+        # 失败则返回原值(如是文字)
+        return str(x)
+
+fmt_money_int = "{:,.0f}"
+
+# 动态生成格式化规则
+def get_format_dict(df):
+    format_dict = {}
+    for col in df.columns:
+        c_str = str(col)
+        if any(x in c_str for x in ['利润', '费用', '货值', '金额', '毛利']):
+            if '率' not in c_str and '比' not in c_str:
+                format_dict[col] = fmt_money_int
+        elif any(x in c_str for x in ['销量', '库存', '数量', '标准', '待补']):
+            if '比' not in c_str:
+                format_dict[col] = fmt_money_int
+        elif any(x in c_str for x in ['比', '率', '占比']):
+            # 使用安全百分比函数，而不是直接字符串
+            format_dict[col] = safe_pct
+    return format_dict
+
+
+@dataclass
+class StylePlan:
+    """表格的样式, 与 df 行一一对应。
+
+    zebra_keys: 首列编码的整数 id, 相邻行 id 不同即换一组斑马底色 (筛选后按子集重新分组)
+    cell_classes: 列 -> (每行的样式编号 int8, 编号 -> CSS), 0 号为无样式
+    gradient_cols: 按数值渐变上色的列, 只为当前页计算
+    """
+    zebra_keys: np.ndarray
+    cell_classes: dict = field(default_factory=dict)
+    gradient_cols: tuple = ()
+
+    def take(self, rows):
+        """筛选结果 (行号 rows) 对应的样式。"""
+        return StylePlan(
+            self.zebra_keys[rows],
+            {c: (codes[rows], css) for c, (codes, css) in self.cell_classes.items()},
+            self.gradient_cols,
+        )
+
+    def zebra(self):
+        # 首列编码每变化一次切换一次底色 (第一组带底色)
+        keys = self.zebra_keys
+        if not len(keys):
+            return np.zeros(0, dtype=bool)
+        groups = np.cumsum(np.concatenate(([True], keys[1:] != keys[:-1])))
+        return groups % 2 != 0
+
+    def css_frame(self, df, start, stop):
+        """[start, stop) 这一页的 CSS 表 (df 为整张表, 渐变色只对这一页计算)。"""
+        page_df = df.iloc[start:stop]
+        # 与原 Styler 叠加顺序一致: 先斑马纹, 再单元格高亮 (后者覆盖同名属性)
+        base = np.where(self.zebra()[start:stop], ZEBRA_CSS, '').astype(object)
+        data = {}
+        for col in page_df.columns:
+            if col in self.cell_classes:
+                codes, choices = self.cell_classes[col]
+                css = np.asarray(choices, dtype=object)[codes[start:stop]]
+            elif col in self.gradient_cols and len(page_df):
+                css = gradient_css(page_df[col])
+            else:
+                data[col] = base
+                continue
+            combined = np.where(base == '', css, base + '; ' + css)
+            data[col] = np.where(css == '', base, combined)
+        return pd.DataFrame(data, index=page_df.index, columns=page_df.columns)
+
+
+def zebra_keys(df):
+    # 首列按字符串比较 (与原逐行比较一致, 缺失值彼此相等)
+    return pd.factorize(df.iloc[:, 0].astype(str))[0].astype(np.int32)
+
+
+def _relative_luminance(rgb):
+    rgb = np.where(rgb <= 0.04045, rgb / 12.92, ((rgb + 0.055) / 1.055) ** 2.4)
+    return rgb @ np.array([0.2126, 0.7152, 0.0722])
+
+
+def gradient_css(values, vmin=-10000, vmax=10000, cmap='RdYlGn', text_color_threshold=0.408):
+    """与 Styler.background_gradient 相同的配色, 向量化生成每行 CSS; 未安装 matplotlib 时不上色。"""
+    try:
+        from matplotlib import colormaps
+        from matplotlib.colors import Normalize
+    except ImportError:
+        return np.full(len(values), '', dtype=object)
+
+    data = np.asarray(values, dtype='float64')
+    rgba = colormaps[cmap](Normalize(vmin, vmax)(data))
+    rgb = rgba[:, :3]
+    hex_codes = np.round(rgb * 255).astype(int)
+    text = np.where(_relative_luminance(rgb) < text_color_threshold, '#f1f1f1', '#000000')
+    # 缺失值与 Styler 相同, 取色表的 bad 颜色
+    return np.array([
+        f'background-color: #{r:02x}{g:02x}{b:02x};color: {t};'
+        for (r, g, b), t in zip(hex_codes.tolist(), text.tolist())
+    ], dtype=object)
+
+
+def visual_style_plan(df):
+    """利润分析 / 业务报表: 斑马纹 + 最终净利润红黄绿渐变。"""
+    gradient_cols = ('S列_最终净利润',) if 'S列_最终净利润' in df.columns else ()
+    return StylePlan(zebra_keys(df), gradient_cols=gradient_cols)
+
+
+def _flag(mask):
+    return np.asarray(mask, dtype=np.int8)
+
+
+def inventory_style_plan(df):
+    """库存分析: 斑马纹 + 待补/滞销/库存水位高亮。"""
+    plan = StylePlan(zebra_keys(df))
+    if '待补数量' in df.columns:
+        plan.cell_classes['待补数量'] = (_flag(df['待补数量'] > 0), ('', CSS_RESTOCK))
+    if '滞销库存货值' in df.columns:
+        plan.cell_classes['滞销库存货值'] = (_flag(df['滞销库存货值'] > 0), ('', CSS_DEAD_STOCK))
+    if {'总库存', '安全库存', '冗余标准'} <= set(df.columns):
+        total, safe, redundant = df['总库存'], df['安全库存'], df['冗余标准']
+        both_zero = (total == 0) & (redundant == 0)
+        levels = np.select([both_zero, total < safe, total >= redundant], [0, 1, 2], default=0)
+        plan.cell_classes['总库存'] = (levels.astype(np.int8), ('', CSS_STOCK_LOW, CSS_STOCK_HIGH))
+    return plan
+
+
+def page_count(n_rows, page_size=PAGE_SIZE):
+    return max(1, -(-n_rows // page_size))
+
+
+def page_slice(n_rows, page, page_size=PAGE_SIZE):
+    """第 page 页 (从 1 开始) 的 [start, stop) 行号。"""
+    page = min(max(1, page), page_count(n_rows, page_size))
+    start = (page - 1) * page_size
+    return start, min(start + page_size, n_rows)
+
+
+def styled_page(df, plan, start, stop, plain_cols=()):
+    """只为 [start, stop) 这一页生成 Styler; plain_cols 中的列保持原始数值 (交给 column_config 显示)。"""
+    page_df = df.iloc[start:stop]
+    fmt = {c: f for c, f in get_format_dict(page_df).items() if c not in plain_cols}
+    css = plan.css_frame(df, start, stop)
+    return page_df.style.format(fmt).apply(lambda _: css, axis=None)
+
+
+def bar_ranges(df, bars=INVENTORY_BARS):
+    """条形图列 -> (颜色, 最大值); 范围按整表 (而不是当前页) 计算, 翻页时长度可比。"""
+    ranges = {}
+    for col, color in bars.items():
+        if col in df.columns:
+            col_max = float(df[col].max()) if len(df) else 0.0
+            ranges[col] = (color, max(col_max, 1.0))
+    return ranges
@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+
+from coupang_report.compact import compact_frame, compact_report, frames_nbytes
+
+
+def _final():
+    n = 1000
+    rng = np.random.default_rng(0)
+    stock = rng.integers(0, 100, n)
+    return pd.DataFrame({
+        '_MATCH_CODE': [f'C{i % 50}' for i in range(n)],
+        '火箭仓库存': stock,
+        '火箭仓库存数量': stock.copy(),
+        'SKU销量': rng.integers(0, 30, n),
+        '库存货值': rng.normal(100, 20, n),
+    })
+
+
+def test_duplicate_columns_share_memory():
+    df = compact_frame(_final())
+    assert df['火箭仓库存'].dtype == np.int32
+    assert np.shares_memory(df['火箭仓库存'].to_numpy(), df['火箭仓库存数量'].to_numpy())
+    # 写时复制: 改其中一列不影响另一列
+    df.loc[0, '火箭仓库存'] = -1
+    assert df.loc[0, '火箭仓库存数量'] != -1
+
+
+def test_sheet3_is_view_of_final():
+    df_final = _final()
+    df_sheet2 = df_final[['_MATCH_CODE', 'SKU销量']].drop_duplicates('_MATCH_CODE')
+    df_sheet3 = df_final[['火箭仓库存数量', 'SKU销量', '库存货值']].copy()
+    (final, _, sheet3), report = compact_report(df_final, df_sheet2, df_sheet3)
+    for col in sheet3.columns:
+        assert np.shares_memory(sheet3[col].to_numpy(), final[col].to_numpy()), col
+    assert report.after_bytes == frames_nbytes((final, _, sheet3))
+    assert report.after_bytes < report.before_bytes
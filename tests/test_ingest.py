@@ -0,0 +1,50 @@
+import io
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pandas as pd
+
+from coupang_report import ingest
+
+
+def _upload(df, name):
+    data = df.to_csv(index=False).encode('utf-8')
+    buf = io.BytesIO(data)
+    buf.name = name
+    buf.size = len(data)
+    return buf
+
+
+def _sales(n):
+    return pd.DataFrame({i: [f'S{r}' if i == 0 else r for r in range(n)] for i in range(9)})
+
+
+def test_pool_map_limits_parallelism_and_keeps_order():
+    lock = threading.Lock()
+    state = {'running': 0, 'peak': 0}
+
+    def work(x):
+        with lock:
+            state['running'] += 1
+            state['peak'] = max(state['peak'], state['running'])
+        time.sleep(0.01)
+        with lock:
+            state['running'] -= 1
+        return x * 2
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(ingest.pool_map(pool, work, [(i,) for i in range(10)], workers=3))
+    assert results == [i * 2 for i in range(10)]
+    assert state['peak'] <= 3
+
+
+def test_shut_down_pool_falls_back_to_serial(monkeypatch):
+    # 其他线程的任务把共享池关掉/替换后, 本次读取不应失败, 剩余文件改为串行
+    dead = ProcessPoolExecutor(max_workers=1)
+    dead.shutdown()
+    monkeypatch.setattr(ingest, 'get_pool', lambda: dead)
+    jobs = [('sales', _upload(_sales(5), 'a.csv')), ('sales', _upload(_sales(7), 'b.csv'))]
+    frames, timings = ingest.ingest_files(jobs, max_workers=2)
+    assert [len(df) for df in frames] == [5, 7]
+    assert [t['name'] for t in timings] == ['a.csv', 'b.csv']
@@ -0,0 +1,29 @@
+import json
+
+from coupang_report import instrumentation
+from coupang_report.instrumentation import append_run_log, read_run_log
+
+
+def test_read_run_log_tail(tmp_path, monkeypatch):
+    path = str(tmp_path / 'runs.jsonl')
+    monkeypatch.setattr(instrumentation, '_TAIL_BLOCK', 64)   # 小块, 确保跨块读取
+    for i in range(300):
+        append_run_log(path, {'i': i, 'pad': 'x' * (i % 7)})
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{broken\n')
+    append_run_log(path, {'i': 300})
+
+    assert [e['i'] for e in read_run_log(path, limit=5)] == [297, 298, 299, 300]
+    assert [e['i'] for e in read_run_log(path, limit=200)] == list(range(102, 301))
+    assert len(read_run_log(path)) == 301
+    assert read_run_log(str(tmp_path / 'missing.jsonl'), limit=10) == []
+
+
+def test_run_log_rotates(tmp_path):
+    path = str(tmp_path / 'runs.jsonl')
+    entry_bytes = len(json.dumps({'i': 0})) + 1
+    for i in range(10):
+        append_run_log(path, {'i': i}, max_bytes=entry_bytes * 4)
+    # 轮转后当前文件从空开始, 最近的记录仍可从 .1 补齐
+    assert (tmp_path / 'runs.jsonl.1').exists()
+    assert [e['i'] for e in read_run_log(path, limit=6)] == [4, 5, 6, 7, 8, 9]
@@ -0,0 +1,135 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from coupang_report.columns import IDX_M_CODE
+from coupang_report.engine import build_sheet2, merge_report, report_catalog
+from coupang_report.key_catalog import KeyCatalog
+from coupang_report.metrics import ad_profit_ratio, natural_sales_share
+
+# ==========================================
+# 参考实现: 键目录之前的 pd.merge + groupby.transform (保持原样, 用来对照新实现)
+# ==========================================
+def merge_report_reference(df_master, sales_agg, ads_agg, inv_agg, inv_j_agg):
+    df_final = pd.merge(df_master, sales_agg, on='_MATCH_SKU', how='left', sort=False)
+    df_final['SKU销量'] = df_final['SKU销量'].fillna(0).astype(int)
+    df_final = pd.merge(df_final, inv_agg, on='_MATCH_SKU', how='left', sort=False)
+    df_final['火箭仓库存'] = df_final['火箭仓库存'].fillna(0).astype(int)
+    df_final = pd.merge(df_final, inv_j_agg, on='_MATCH_BAR', how='left', sort=False)
+    df_final['极风库存'] = df_final['极风库存'].fillna(0).astype(int)
+    df_final['P列_SKU总毛利'] = df_final['SKU销量'] * df_final['_VAL_PROFIT']
+    df_final['Q列_产品总利润'] = df_final.groupby('_MATCH_CODE', sort=False)['P列_SKU总毛利'].transform('sum')
+    df_final['产品总销量'] = df_final.groupby('_MATCH_CODE', sort=False)['SKU销量'].transform('sum')
+    df_final = pd.merge(df_final, ads_agg, on='_MATCH_CODE', how='left', sort=False)
+    df_final['R列_产品总广告费'] = df_final['R列_产品总广告费'].fillna(0)
+    df_final['产品广告销量'] = df_final['产品广告销量'].fillna(0)
+    df_final['S列_最终净利润'] = df_final['Q列_产品总利润'] - df_final['R列_产品总广告费']
+    return df_final
+
+
+def build_sheet2_reference(df_final):
+    col_code_name = df_final.columns[IDX_M_CODE]
+    df_final['产品_火箭仓库存'] = df_final.groupby('_MATCH_CODE', sort=False)['火箭仓库存'].transform('sum')
+    df_final['产品_极风库存'] = df_final.groupby('_MATCH_CODE', sort=False)['极风库存'].transform('sum')
+    df_final['产品_总库存'] = df_final['产品_火箭仓库存'] + df_final['产品_极风库存']
+    df_sheet2 = df_final[[col_code_name, 'Q列_产品总利润', 'R列_产品总广告费', 'S列_最终净利润', '产品总销量', '产品广告销量', '产品_火箭仓库存', '产品_极风库存', '产品_总库存']].copy()
+    df_sheet2 = df_sheet2.drop_duplicates(subset=[col_code_name], keep='first')
+    df_sheet2.rename(columns={'产品_火箭仓库存': '火箭仓库存', '产品_极风库存': '极风库存', '产品_总库存': '总库存'}, inplace=True)
+    df_sheet2['广告/毛利比'] = ad_profit_ratio(df_sheet2['R列_产品总广告费'], df_sheet2['Q列_产品总利润'])
+    df_sheet2['自然销量'] = df_sheet2['产品总销量'] - df_sheet2['产品广告销量']
+    df_sheet2['自然销量占比'] = natural_sales_share(df_sheet2['自然销量'], df_sheet2['产品总销量'])
+    return df_sheet2[[
+        col_code_name, 'Q列_产品总利润', 'R列_产品总广告费', 'S列_最终净利润',
+        '广告/毛利比', '产品总销量', '产品广告销量', '自然销量', '自然销量占比',
+        '火箭仓库存', '极风库存', '总库存',
+    ]]
+
+
+# 浮点合计 (及由其派生的列): bincount 逐项相加, pandas 用补偿求和, 末几位可能不同;
+# 误差上限约 组内行数 × 2**-53 × Σ|值|, 这里的数据规模下远小于该容差
+FLOAT_SUM_COLUMNS = {'P列_SKU总毛利', 'Q列_产品总利润', 'S列_最终净利润', '广告/毛利比'}
+FLOAT_RTOL = 1e-9
+FLOAT_ATOL = 1e-6
+
+
+def _assert_frames_match(new, old):
+    assert list(new.columns) == list(old.columns)
+    assert new.index.equals(old.index)
+    for col in new.columns:
+        if col in FLOAT_SUM_COLUMNS:
+            assert new[col].dtype == old[col].dtype, col
+            np.testing.assert_allclose(new[col].to_numpy(), old[col].to_numpy(), rtol=FLOAT_RTOL, atol=FLOAT_ATOL, err_msg=col)
+        else:
+            # 整数/计数列、查表得到的列、文本列: 完全一致 (含 dtype)
+            pd.testing.assert_series_equal(new[col], old[col], obj=col)
+
+
+def _make_inputs(seed, n_skus=2000, n_products=300, with_inventory=True, nan_codes=False):
+    rng = np.random.default_rng(seed)
+    codes = np.array([f'C{i}' for i in rng.integers(0, n_products, n_skus)], dtype=object)
+    if nan_codes:
+        codes[rng.random(n_skus) < 0.05] = np.nan
+    skus = np.array([f'S{i}' for i in range(n_skus)], dtype=object)
+    bars = np.array([f'B{i}' for i in range(n_skus)], dtype=object)
+    df_master = pd.DataFrame({i: [f'v{i}'] * n_skus for i in range(13)})
+    df_master[0] = codes
+    df_master['_MATCH_SKU'] = skus
+    df_master['_MATCH_BAR'] = bars
+    df_master['_MATCH_CODE'] = codes
+    df_master['_VAL_PROFIT'] = np.round(rng.normal(12, 30, n_skus), 2)
+    df_master['_VAL_COST'] = np.round(rng.uniform(1, 90, n_skus), 2)
+
+    sold = rng.choice(n_skus + 200, int(n_skus * 0.7), replace=False)   # 含 Master 中没有的 SKU
+    sales_agg = pd.DataFrame({'_MATCH_SKU': [f'S{i}' for i in sold], 'SKU销量': rng.integers(0, 50, len(sold))})
+    advertised = rng.choice(n_products + 50, int(n_products * 0.6), replace=False)
+    ads_agg = pd.DataFrame({
+        '_MATCH_CODE': [f'C{i}' for i in advertised],
+        'R列_产品总广告费': np.round(rng.uniform(0, 900, len(advertised)) * 1.1, 4),
+        '产品广告销量': rng.integers(0, 20, len(advertised)).astype(float),
+    })
+    if with_inventory:
+        stocked = rng.choice(n_skus, int(n_skus * 0.8), replace=False)
+        inv_agg = pd.DataFrame({'_MATCH_SKU': [f'S{i}' for i in stocked], '火箭仓库存': rng.integers(0, 100, len(stocked))})
+        jf = rng.choice(n_skus, int(n_skus * 0.4), replace=False)
+        inv_j_agg = pd.DataFrame({'_MATCH_BAR': [f'B{i}' for i in jf], '极风库存': rng.integers(0, 60, len(jf))})
+    else:
+        inv_agg = pd.DataFrame(columns=['_MATCH_SKU', '火箭仓库存'])
+        inv_j_agg = pd.DataFrame(columns=['_MATCH_BAR', '极风库存'])
+    return df_master, sales_agg, ads_agg, inv_agg, inv_j_agg
+
+
+@pytest.mark.parametrize('kwargs', [
+    dict(seed=0),
+    dict(seed=1, with_inventory=False),
+    dict(seed=2, nan_codes=True),
+    dict(seed=3, n_skus=50, n_products=5),
+])
+def test_merge_and_sheet2_match_reference(kwargs):
+    df_master, *aggs = _make_inputs(**kwargs)
+    old_final = merge_report_reference(df_master.copy(), *aggs)
+    old_sheet2 = build_sheet2_reference(old_final)
+
+    catalog = report_catalog(df_master, *aggs)
+    new_final = merge_report(df_master.copy(), *aggs, catalog)
+    new_sheet2 = build_sheet2(new_final, catalog)
+
+    _assert_frames_match(new_final, old_final)
+    _assert_frames_match(new_sheet2, old_sheet2)
+
+
+def test_group_sum_integers_exact_floats_within_tolerance():
+    rng = np.random.default_rng(7)
+    n = 200_000
+    keys = pd.Series([f'C{i}' for i in rng.integers(0, 50, n)])
+    catalog = KeyCatalog(pd.DataFrame({'_MATCH_SKU': keys, '_MATCH_BAR': keys, '_MATCH_CODE': keys}))
+    by_key = pd.DataFrame({'k': keys})
+
+    ints = rng.integers(-1000, 1000, n)
+    by_key['v'] = ints
+    expected = by_key.groupby('k', sort=False)['v'].transform('sum')
+    np.testing.assert_array_equal(catalog.group_sum('code', ints), expected.to_numpy())
+
+    floats = rng.normal(0, 100, n)
+    by_key['v'] = floats
+    expected = by_key.groupby('k', sort=False)['v'].transform('sum')
+    np.testing.assert_allclose(catalog.group_sum('code', floats), expected.to_numpy(), rtol=FLOAT_RTOL, atol=FLOAT_ATOL)
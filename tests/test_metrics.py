@@ -0,0 +1,101 @@
+import re
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from coupang_report.cleaning import extract_codes
+from coupang_report.metrics import ad_profit_ratio, dead_stock_value, natural_sales_share, restock_qty
+
+# ==========================================
+# 参考实现: 向量化之前的逐行 apply / 正则 (保持原样, 用来对照新实现)
+# ==========================================
+def extract_code_from_text(text):
+    if pd.isna(text): return None
+    match = re.search(r'([Cc]\d+)', str(text))
+    if match: return match.group(1).upper()
+    return None
+
+
+def calc_dead_stock_value(row):
+    total = row['总库存']
+    redundant_std = row['冗余标准']
+    if total == 0 and redundant_std == 0: return 0
+    if total >= redundant_std: return row['库存货值']
+    return 0
+
+
+def _assert_same(new, old):
+    # 原实现全部走 0 分支时结果为 int, 新实现为 float: 只比较数值
+    assert new.index.equals(old.index)
+    np.testing.assert_array_equal(new.to_numpy(dtype='float64'), old.to_numpy(dtype='float64'))
+
+
+@pytest.fixture
+def sheet2():
+    rng = np.random.default_rng(0)
+    n = 500
+    df = pd.DataFrame({
+        'R列_产品总广告费': rng.choice([0, 0.0, 5.5, 110.0, -3.0], n),
+        'Q列_产品总利润': rng.choice([0, 0, -3, 7, 100.5], n),
+        '产品总销量': rng.choice([0, 0, 3, 10], n),
+        '自然销量': rng.choice([0, 0, -1, 2.0], n),
+    })
+    # 利润为 0 / 销量为 0 的行必须出现
+    df.loc[:4, ['Q列_产品总利润', '产品总销量']] = 0
+    return df
+
+
+@pytest.fixture
+def stock():
+    rng = np.random.default_rng(1)
+    n = 500
+    df = pd.DataFrame({'总库存': rng.choice([0, 1, 5, 24, 40], n), 'SKU销量': rng.choice([0, 0, 1, 3, 5], n)})
+    df['安全库存'] = df['SKU销量'] * 3
+    df['冗余标准'] = df['SKU销量'] * 8
+    df['库存货值'] = df['总库存'] * 1.2 * rng.choice([0, 1, 2.5], n)
+    # 总库存与冗余标准同时为 0 的行必须出现
+    df.loc[:4, ['总库存', 'SKU销量', '安全库存', '冗余标准', '库存货值']] = 0
+    return df
+
+
+def test_ad_profit_ratio_matches_rowwise(sheet2):
+    old = sheet2.apply(
+        lambda x: x['R列_产品总广告费'] / x['Q列_产品总利润'] if x['Q列_产品总利润'] != 0 else 0, axis=1
+    )
+    _assert_same(ad_profit_ratio(sheet2['R列_产品总广告费'], sheet2['Q列_产品总利润']), old)
+
+
+def test_natural_sales_share_matches_rowwise(sheet2):
+    old = sheet2.apply(lambda x: x['自然销量'] / x['产品总销量'] if x['产品总销量'] != 0 else 0, axis=1)
+    _assert_same(natural_sales_share(sheet2['自然销量'], sheet2['产品总销量']), old)
+
+
+def test_restock_qty_matches_rowwise(stock):
+    old = stock.apply(lambda x: (x['安全库存'] - x['总库存']) if x['总库存'] < x['安全库存'] else 0, axis=1)
+    _assert_same(restock_qty(stock['总库存'], stock['安全库存']), old)
+
+
+def test_dead_stock_value_matches_rowwise(stock):
+    old = stock.apply(calc_dead_stock_value, axis=1)
+    _assert_same(dead_stock_value(stock['总库存'], stock['冗余标准'], stock['库存货值']), old)
+
+
+def test_all_zero_rows():
+    zeros = pd.Series([0, 0, 0])
+    _assert_same(ad_profit_ratio(zeros, zeros), pd.Series([0, 0, 0]))
+    _assert_same(natural_sales_share(zeros, zeros), pd.Series([0, 0, 0]))
+    _assert_same(restock_qty(zeros, zeros), pd.Series([0, 0, 0]))
+    _assert_same(dead_stock_value(zeros, zeros, pd.Series([5.0, 6.0, 7.0])), pd.Series([0, 0, 0]))
+
+
+def test_extract_codes_matches_regex():
+    names = pd.Series([
+        'C123 运动鞋', 'c123', '新品_c45_促销', 'AC9 套装', '无编码', '', np.nan, None,
+        'C1 C2', '广告组 C0007', 'cc12', 12.0, 'C', '(c88)',
+    ], dtype=object)
+    old = names.apply(extract_code_from_text)
+    new = extract_codes(names)
+    assert new.isna().tolist() == old.isna().tolist()
+    assert new[new.notna()].tolist() == old[old.notna()].tolist()
+    assert new[1] == 'C123'
@@ -0,0 +1,118 @@
+import io
+import re
+import zipfile
+
+import pandas as pd
+import pytest
+
+from coupang_report import readers
+from coupang_report.readers import (
+    SNIFF_BYTES, SniffResult, detect_encoding, read_file_strict, read_source_info, sniff_file,
+)
+
+
+def _upload(data, name='x.csv'):
+    buf = io.BytesIO(data)
+    buf.name = name
+    buf.size = len(data)
+    return buf
+
+
+GBK_HEADER = '产品编号,产品名称,数量\nC1,女士运动鞋,3\nC2,儿童保温杯,5\n'
+KOREAN_TEXT = '상품명,옵션ID,판매수량,광고비\n여성 운동화 블랙,1001,3,1200\n쿠팡 로켓배송 상품,1002,5,800\n'
+
+
+@pytest.mark.parametrize('text, encoding, expected', [
+    (GBK_HEADER, 'gbk', 'gbk'),
+    ('商品名称,销售数量,广告费,库存\n', 'gbk', 'gbk'),
+    (KOREAN_TEXT, 'cp949', 'cp949'),
+    ('캠페인명,광고그룹,바코드,재고수량\n', 'cp949', 'cp949'),
+    (GBK_HEADER, 'utf-8', 'utf-8'),
+    (GBK_HEADER, 'utf-8-sig', 'utf-8-sig'),
+])
+def test_detect_encoding(text, encoding, expected):
+    assert detect_encoding(text.encode(encoding)) == expected
+
+
+def test_short_gbk_header_reads_back_as_chinese():
+    df = read_file_strict(_upload(GBK_HEADER.encode('gbk')))
+    assert list(df.columns) == ['产品编号', '产品名称', '数量']
+    assert df['产品名称'].tolist() == ['女士运动鞋', '儿童保温杯']
+
+
+def test_korean_csv_reads_back_as_korean():
+    df, sniffed = read_source_info(_upload(KOREAN_TEXT.encode('cp949')), 'master')
+    assert sniffed == SniffResult('csv', 'cp949')
+    assert df.columns[0] == '상품명'
+    assert df.iloc[1, 0] == '쿠팡 로켓배송 상품'
+
+
+def test_gbk_only_character_after_sniffed_prefix():
+    # 探测范围内的字节 cp949 也能解码; 之后出现 gbk 独有的字 (丂, 0x81 开头), 应换编码重读而不是报错
+    filler = '产品编号,产品名称,数量\n' + '\n'.join(f'C{i},女士运动鞋,{i}' for i in range(SNIFF_BYTES // 10))
+    data = (filler + '\nC0,丂字款,1\n').encode('gbk')
+    file = _upload(data)
+    df, sniffed = read_source_info(file, 'master')
+    assert sniffed.encoding == 'gbk'
+    assert df.columns[0] == '产品编号'
+    assert df.iloc[-1, 1] == '丂字款'
+    assert read_file_strict(file).iloc[-1, 1] == '丂字款'
+
+
+def test_ascii_prefix_then_gbk_reads_via_fallback():
+    # 开头一整段都是 ASCII, 探测只看这一段 (判为 utf-8), 后面的 gbk 中文靠换编码重读
+    filler = 'code,name,qty\n' + '\n'.join(f'C{i},shoes,{i}' for i in range(SNIFF_BYTES // 10))
+    data = (filler + '\nC0,女士运动鞋,1\n').encode('gbk')
+    file = _upload(data)
+    assert sniff_file(file) == SniffResult('csv', 'utf-8')
+    assert file.tell() == 0
+    df, sniffed = read_source_info(file, 'master')
+    assert sniffed.encoding == 'gbk'
+    assert df.iloc[-1, 1] == '女士运动鞋'
+
+
+def test_format_from_content_not_extension():
+    csv = KOREAN_TEXT.encode('cp949')
+    assert sniff_file(_upload(csv, 'x.xlsx')) == SniffResult('csv', 'cp949')
+
+    buf = io.BytesIO()
+    pd.DataFrame({'a': ['1'], 'b': ['x']}).to_excel(buf, index=False)
+    assert sniff_file(_upload(buf.getvalue(), 'x.csv')) == SniffResult('xlsx')
+
+
+def test_legacy_xls_is_rejected():
+    with pytest.raises(ValueError, match='.xls'):
+        sniff_file(_upload(b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1' + b'\0' * 64, 'x.xls'))
+
+
+def test_decode_error_falls_back_to_other_encoding(monkeypatch):
+    # 探测结果为 cp949 时, 后面出现 cp949 解不开的字节则改用 gbk 重读, 返回实际使用的编码
+    monkeypatch.setattr(readers, 'sniff_file', lambda file: SniffResult('csv', 'cp949'))
+    df, sniffed = read_source_info(_upload((GBK_HEADER + 'C3,丂字款,1\n').encode('gbk')), 'master')
+    assert sniffed == SniffResult('csv', 'gbk')
+    assert df.iloc[-1, 1] == '丂字款'
+
+
+def _xlsx_with_dimension(df, ref):
+    # 写出 xlsx 后把工作表的 <dimension ref> 改成错误的范围 (模拟导出工具写错)
+    buf = io.BytesIO()
+    df.to_excel(buf, index=False)
+    out = io.BytesIO()
+    with zipfile.ZipFile(buf) as src, zipfile.ZipFile(out, 'w', zipfile.ZIP_DEFLATED) as dst:
+        for item in src.infolist():
+            data = src.read(item.filename)
+            if item.filename == 'xl/worksheets/sheet1.xml':
+                data, n = re.subn(rb'<dimension ref="[^"]*"', f'<dimension ref="{ref}"'.encode(), data)
+                assert n == 1
+            dst.writestr(item, data)
+    return out.getvalue()
+
+
+def test_xlsx_with_stale_dimension_reads_all_rows():
+    n = 1500
+    df = pd.DataFrame({f'c{i}': [f'S{r}' if i == 0 else r for r in range(n)] for i in range(9)})
+    data = _xlsx_with_dimension(df, 'A1:I10')
+    expected = pd.read_excel(io.BytesIO(data), dtype=str)
+    sales, _ = read_source_info(_upload(data, 'sales.xlsx'), 'sales')
+    assert len(sales) == len(expected) == n
+    assert sales[8].sum() == sum(range(n))
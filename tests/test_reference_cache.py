@@ -0,0 +1,31 @@
+import pandas as pd
+import pytest
+
+from coupang_report.ingest import ingest_files
+from coupang_report.reference_cache import ReferenceCache
+
+
+def _cache_with_two_masters():
+    reference = ReferenceCache()
+    reference.put('master', 'x.xlsx', 'x' * 40, pd.DataFrame({'a': [1]}))
+    reference.put('master', 'y.xlsx', 'y' * 40, pd.DataFrame({'a': [2, 3]}))
+    return reference
+
+
+def test_shared_master_uses_selected_digest_not_latest():
+    reference = _cache_with_two_masters()
+    assert reference.latest('master').digest == 'y' * 40
+
+    frames, timings = ingest_files([('master', 'x' * 40)], reference=reference, max_workers=1)
+    assert frames[0]['a'].tolist() == [1]
+    assert timings[0]['name'] == 'x.xlsx'
+    assert timings[0]['digest'] == 'x' * 40
+
+
+def test_evicted_shared_master_raises_clear_error():
+    reference = _cache_with_two_masters()
+    reference.evict('master', 'x' * 40)
+    with pytest.raises(ValueError, match='已被移除'):
+        ingest_files([('master', 'x' * 40)], reference=reference, max_workers=1)
+    with pytest.raises(ValueError, match='已被移除'):
+        ingest_files([('master', None)], reference=reference, max_workers=1)
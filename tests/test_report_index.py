@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from coupang_report.report_index import ReportIndex
+
+
+def _frames(categorical=False):
+    codes = pd.Series(['C1', 'C12', 'C123', np.nan, 'C12', 'AC1', 'C9', 'C1'], dtype=object)
+    df_final = pd.DataFrame({'产品编号': codes, '_MATCH_CODE': codes, 'v': range(len(codes))})
+    if categorical:
+        df_final['_MATCH_CODE'] = df_final['_MATCH_CODE'].astype('category')
+    df_sheet2 = df_final.drop_duplicates('产品编号')
+    return df_final, df_sheet2, df_final[['v']]
+
+
+@pytest.mark.parametrize('categorical', [False, True])
+@pytest.mark.parametrize('query', ['C1', 'c12', ' 123 ', 'C9', 'ZZZ', '1'])
+def test_filter_matches_substring_scan(categorical, query):
+    df_final, df_sheet2, df_sheet3 = _frames(categorical)
+    index = ReportIndex(df_final, df_sheet2, df_sheet3)
+    final, sheet2, sheet3 = index.filter(query)
+
+    q = query.strip().upper()
+    expected = df_final['_MATCH_CODE'].astype(object).str.contains(q, regex=False, na=False)
+    assert final.index.tolist() == df_final.index[expected.to_numpy()].tolist()
+    assert sheet3.index.tolist() == final.index.tolist()
+    expected_s2 = df_sheet2['_MATCH_CODE'].astype(object).str.contains(q, regex=False, na=False)
+    assert sheet2.index.tolist() == df_sheet2.index[expected_s2.to_numpy()].tolist()
+
+
+def test_empty_filter_returns_full_frames():
+    frames = _frames()
+    index = ReportIndex(*frames)
+    assert all(a is b for a, b in zip(index.filter(''), frames))
+    assert len(index.codes) == 5
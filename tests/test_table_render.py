@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from coupang_report.report_index import ReportIndex
+from coupang_report.table_render import inventory_style_plan, page_count, page_slice, styled_page, visual_style_plan
+
+
+def _frames():
+    rng = np.random.default_rng(0)
+    n = 1200
+    codes = np.array([f'C{i}' for i in np.sort(rng.integers(0, 300, n))], dtype=object)
+    rng.shuffle(codes[:100])   # 部分编码不连续, 筛选后相邻行的分组会变化
+    stock = rng.integers(0, 40, n)
+    sku = rng.integers(0, 5, n)
+    df_final = pd.DataFrame({
+        '产品编号': codes, '_MATCH_CODE': codes,
+        'S列_最终净利润': rng.normal(0, 8000, n),
+        '总库存': stock, '安全库存': sku * 3, '冗余标准': sku * 8,
+        '待补数量': np.maximum(sku * 3 - stock, 0), '滞销库存货值': rng.choice([0.0, 12.5], n),
+    })
+    df_sheet2 = df_final.drop_duplicates('产品编号')[['产品编号', 'S列_最终净利润']]
+    df_sheet3 = df_final[['产品编号', '总库存', '安全库存', '冗余标准', '待补数量', '滞销库存货值']]
+    return df_final, df_sheet2, df_sheet3
+
+
+@pytest.mark.parametrize('query', ['', 'C1', 'C29', 'C2'])
+def test_sliced_styles_match_styles_of_filtered_frames(query):
+    index = ReportIndex(*_frames(), with_styles=True)
+    frames, plans = index.select(query)
+    for df, plan, build in zip(frames, plans, (visual_style_plan, visual_style_plan, inventory_style_plan)):
+        # 按行号取子集的样式 == 直接对筛选结果算样式
+        expected = build(df)
+        for page in range(1, page_count(len(df), 200) + 1):
+            start, stop = page_slice(len(df), page, 200)
+            pd.testing.assert_frame_equal(plan.css_frame(df, start, stop), expected.css_frame(df, start, stop))
+
+
+def test_index_without_styles():
+    index = ReportIndex(*_frames())
+    frames, plans = index.select('C1')
+    assert plans is None
+    assert len(frames[0]) == len(index.filter('C1')[0])
+
+
+# ---- 原看板的 Styler 写法 (逐行 apply + background_gradient), 作为样式的对照基准 ----
+def _zebra_rows(x):
+    codes = x.iloc[:, 0].astype(str)
+    groups = (codes != codes.shift()).cumsum()
+    is_odd = groups % 2 != 0
+    styles = pd.DataFrame('', index=x.index, columns=x.columns)
+    styles.loc[is_odd, :] = 'background-color: #f0f2f6'
+    return styles
+
+
+def _highlight_logic(x):
+    styles = []
+    for col in x.index:
+        style = ''
+        if col == '待补数量' and x['待补数量'] > 0:
+            style += 'background-color: #fff3cd; color: #e65100; font-weight: bold;'
+        if col == '滞销库存货值' and x['滞销库存货值'] > 0:
+            style += 'color: #880e4f; font-weight: bold;'
+        if col == '总库存':
+            total, safe, redundant = x['总库存'], x['安全库存'], x['冗余标准']
+            if total == 0 and redundant == 0:
+                pass
+            elif total < safe:
+                style += 'background-color: #ffcccc; color: #cc0000; font-weight: bold;'
+            elif total >= redundant:
+                style += 'background-color: #e1bee7; color: #4a148c; font-weight: bold;'
+        styles.append(style)
+    return styles
+
+
+def _ctx(styler):
+    # 单元格 -> CSS 属性列表 (去掉无样式的单元格)
+    return {cell: props for cell, props in styler._compute().ctx.items() if props}
+
+
+def _small_frames():
+    df_final, df_sheet2, df_sheet3 = (df.head(120).reset_index(drop=True) for df in _frames())
+    df_final.loc[[3, 50], 'S列_最终净利润'] = np.nan   # 缺失值
+    df_final.loc[7, 'S列_最终净利润'] = 25000.0        # 超出 vmin/vmax 的取端点颜色
+    return df_final, df_sheet2, df_sheet3
+
+
+def test_visual_plan_matches_styler_chain():
+    pytest.importorskip('matplotlib')
+    df = _small_frames()[0]
+    old = df.style.apply(_zebra_rows, axis=None).background_gradient(
+        subset=['S列_最终净利润'], cmap='RdYlGn', vmin=-10000, vmax=10000)
+    new = styled_page(df, visual_style_plan(df), 0, len(df))
+    assert _ctx(new) == _ctx(old)
+
+
+def test_inventory_plan_matches_styler_chain():
+    df = _small_frames()[2]
+    old = df.style.apply(_zebra_rows, axis=None).apply(_highlight_logic, axis=1)
+    new = styled_page(df, inventory_style_plan(df), 0, len(df))
+    assert _ctx(new) == _ctx(old)